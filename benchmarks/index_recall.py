@@ -0,0 +1,143 @@
+"""
+Recall / latency / memory benchmark of approximate FAISS indexes.
+
+Compares IVF-Flat, HNSW and IVF-PQ against the exact flat index, either on
+the vectors of an existing flat index or on synthetic embedding-like data:
+
+    python -m benchmarks.index_recall --index-path faiss_index
+    python -m benchmarks.index_recall --num-vectors 200000 --output recall.json
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from src.storage.index_types import apply_search_params, build_index, reconstruct_all
+
+NPROBE_SWEEP = [1, 4, 8, 16, 32, 64]
+EF_SEARCH_SWEEP = [16, 32, 64, 128, 256]
+
+
+def synthetic_vectors(num_vectors: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit-norm vectors drawn around random cluster centres, like text embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(1, num_vectors // 100), dim), dtype=np.float32)
+    vectors = centres[rng.integers(0, len(centres), num_vectors)]
+    # Add the noise in blocks so a million vectors need no full-size temporary
+    for start in range(0, num_vectors, 100_000):
+        block = vectors[start:start + 100_000]
+        block += 0.5 * rng.standard_normal(block.shape, dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, num_queries: int, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of corpus vectors, so queries have near neighbours."""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), num_queries)].copy()
+    queries += 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbours that were returned."""
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+    """Search one query at a time, as the retriever does, and time each call."""
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+
+    return {
+        f"recall@{k}": round(recall_at_k(np.array(found), truth), 4),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 4),
+    }
+
+
+def run(vectors: np.ndarray, num_queries: int, k: int, params: Dict) -> List[Dict]:
+    """Benchmark every index type and search setting against the flat baseline."""
+    queries = make_queries(vectors, num_queries)
+    results = []
+
+    for index_type, build_params, sweep_name, sweep in [
+        ("flat", {}, None, [None]),
+        ("ivf_flat", {"nlist": params["nlist"]}, "nprobe", NPROBE_SWEEP),
+        ("hnsw", {"M": params["M"]}, "ef_search", EF_SEARCH_SWEEP),
+        ("ivf_pq", {"nlist": params["nlist"], "pq_m": params["pq_m"]}, "nprobe", NPROBE_SWEEP),
+    ]:
+        start = time.perf_counter()
+        index = build_index(index_type, vectors, build_params)
+        build_seconds = time.perf_counter() - start
+        memory_mb = faiss.serialize_index(index).nbytes / 2 ** 20
+
+        if index_type == "flat":
+            _, truth = index.search(queries, k)
+
+        for value in sweep:
+            if sweep_name:
+                apply_search_params(index, **{sweep_name: value})
+            row = {
+                "index_type": index_type,
+                "build_params": build_params,
+                "search_params": {sweep_name: value} if sweep_name else {},
+                "build_seconds": round(build_seconds, 3),
+                "memory_mb": round(memory_mb, 2),
+                **measure(index, queries, truth, k),
+            }
+            results.append(row)
+            print(
+                f"{index_type:9s} {str(row['search_params']):22s} "
+                f"recall@{k}={row[f'recall@{k}']:.3f}  "
+                f"p50={row['latency_p50_ms']:.3f}ms  p95={row['latency_p95_ms']:.3f}ms  "
+                f"mem={row['memory_mb']:.1f}MB  build={row['build_seconds']:.1f}s"
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-path", help="Benchmark on the vectors of this flat index")
+    parser.add_argument("--num-vectors", type=int, default=50_000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=1536, help="Synthetic vector dimension")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: ~4*sqrt(n))")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.index_path:
+        vectors = reconstruct_all(faiss.read_index(str(Path(args.index_path) / "index.faiss")))
+    else:
+        vectors = synthetic_vectors(args.num_vectors, args.dim)
+    print(f"Benchmarking {len(vectors)} vectors of dim {vectors.shape[1]}, "
+          f"{args.num_queries} queries, k={args.k}")
+
+    results = run(
+        vectors, args.num_queries, args.k,
+        {"nlist": args.nlist, "M": args.hnsw_m, "pq_m": args.pq_m},
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"num_vectors": len(vectors), "dim": int(vectors.shape[1]), "k": args.k,
+                       "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
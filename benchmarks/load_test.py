@@ -0,0 +1,195 @@
+"""
+Load generator for `/api/chat`: a fixed number of concurrent clients, each
+sending its next question as soon as the previous answer arrives.
+
+Reports throughput, error rate, latency percentiles of the successful
+requests and, with `--debug`, the server's mean per-stage timings. Run it
+against an API backed by the stub server for an offline capacity test:
+
+    python -m benchmarks.openai_stub --port 8001 &
+    export OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=sk-stub INDEX_PATH=stub_index
+    python run_ingestion.py
+    hypercorn src.api.async_app:app --bind 127.0.0.1:5001 &
+    python -m benchmarks.load_test --url http://127.0.0.1:5001 --concurrency 32 --duration 60 --output load.json
+
+Questions repeat, so the API's caches and request coalescing serve many of
+them; start the API with RETRIEVAL_CACHE_SIZE=0 ANSWER_CACHE_SIZE=0
+COALESCE_CHAT_REQUESTS=false to load the full pipeline on every request.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.pipeline import git_commit, latency_stats
+
+DEFAULT_QUERIES = [
+    "Who built the Nurburgring?",
+    "Who won the 2021 Formula One World Championship?",
+    "When and where was the first Lombank Trophy held?",
+    "Which engine did the Mercedes-Benz W196 use?",
+    "How many races were in the 1954 Formula One season?",
+    "Who is Lewis Hamilton?",
+    "What is the Monaco Grand Prix?",
+    "Which team did Juan Manuel Fangio drive for in 1955?",
+]
+
+# Error messages kept in the report
+MAX_ERROR_SAMPLES = 5
+
+
+async def run_load(
+        url: str,
+        queries: List[str],
+        concurrency: int,
+        num_requests: Optional[int] = None,
+        duration: Optional[float] = None,
+        k: Optional[int] = None,
+        debug: bool = False,
+        timeout: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+) -> Dict[str, Any]:
+    """
+    Drive `/api/chat` with `concurrency` clients until a request count or duration is reached.
+
+    Args:
+        url: Base URL of the API
+        queries: Questions, sent round-robin
+        concurrency: Number of clients with a request in flight
+        num_requests: Stop after this many requests
+        duration: Stop starting requests after this many seconds
+        k: Documents to retrieve per question (API default if None)
+        debug: Ask for per-stage timings and report their means
+        timeout: Seconds before a request counts as failed
+        transport: httpx transport (tests use a mock one)
+
+    Returns:
+        Request and error counts, throughput, latency percentiles and status codes
+
+    Raises:
+        ValueError: If neither `num_requests` nor `duration` is set
+    """
+    if num_requests is None and duration is None:
+        raise ValueError("Set a number of requests or a duration")
+
+    counter = itertools.count()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors: List[str] = []
+    stages: Dict[str, float] = {}
+    stage_counts: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration if duration is not None else float("inf")
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        while time.perf_counter() < deadline:
+            i = next(counter)
+            if num_requests is not None and i >= num_requests:
+                return
+            body: Dict[str, Any] = {"query": queries[i % len(queries)]}
+            if k is not None:
+                body["k"] = k
+            if debug:
+                body["debug"] = True
+
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/chat", json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            statuses[status] = statuses.get(status, 0) + 1
+
+            if response is None or response.status_code != 200:
+                if len(errors) < MAX_ERROR_SAMPLES:
+                    errors.append(status if response is None else f"{status}: {response.text[:200]}")
+                continue
+            latencies.append(elapsed_ms)
+            for stage, ms in response.json().get("timings", {}).items():
+                stages[stage] = stages.get(stage, 0.0) + ms
+                stage_counts[stage] = stage_counts.get(stage, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout, transport=transport) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    total = sum(statuses.values())
+    num_errors = total - len(latencies)
+    results = {
+        "requests": total,
+        "errors": num_errors,
+        "error_rate": round(num_errors / total, 4) if total else 0.0,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "successful_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency": latency_stats(latencies) if latencies else {},
+        "status_codes": dict(sorted(statuses.items())),
+        "error_samples": errors,
+    }
+    if debug:
+        results["stages_mean_ms"] = {
+            stage: round(ms / stage_counts[stage], 4) for stage, ms in sorted(stages.items())
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5001", help="Base URL of the API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clients with a request in flight")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds (default 30 without --requests)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed requests sent first (loads the index)")
+    parser.add_argument("--queries", help="File with one question per line (default: built-in F1 questions)")
+    parser.add_argument("--k", type=int, help="Documents to retrieve per question")
+    parser.add_argument("--debug", action="store_true", help="Also report the server's mean stage timings")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a request fails")
+    parser.add_argument("--output", default="load_test_results.json")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    duration = args.duration if args.duration is not None or args.requests is not None else 30.0
+
+    if args.warmup:
+        asyncio.run(run_load(args.url, queries, 1, num_requests=args.warmup, timeout=args.timeout))
+    print(f"Sending /api/chat requests to {args.url} from {args.concurrency} clients...")
+    load = asyncio.run(run_load(
+        args.url, queries, args.concurrency,
+        num_requests=args.requests, duration=duration, k=args.k, debug=args.debug, timeout=args.timeout,
+    ))
+
+    stats = load["latency"]
+    print(f"  {load['requests']} requests in {load['seconds']}s: {load['throughput_rps']} req/s, "
+          f"error rate {load['error_rate']:.2%}")
+    if stats:
+        print(f"  p50={stats['p50_ms']:.1f}ms  p95={stats['p95_ms']:.1f}ms  p99={stats['p99_ms']:.1f}ms")
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "load": load,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Offline OpenAI-compatible stub server: embeddings and chat completions.
+
+Serves the two endpoints the pipeline uses, so ingestion, the API and load
+tests run without network access, API key or cost:
+
+* `POST /v1/embeddings`: the feature-hashed vectors of `HashingEmbeddings`,
+  so texts sharing words get similar vectors and every run returns the same
+* `POST /v1/chat/completions`: a fixed-length answer citing the prompt's
+  first source, as a JSON completion or as a stream of token chunks
+
+Latency is simulated: a fixed delay per embedding request, a delay before
+the first answer token, then tokens at a fixed rate. Point the components at
+the server with `OPENAI_BASE_URL`:
+
+    python -m benchmarks.openai_stub --port 8001 --chat-latency-ms 400 --tokens-per-second 60
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=sk-stub INDEX_PATH=stub_index python run_ingestion.py
+"""
+import argparse
+import asyncio
+import base64
+import codecs
+import itertools
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import numpy as np
+import tiktoken
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from quart import Quart, Response, jsonify, request
+
+from benchmarks.stubs import HashingEmbeddings, cite_first_source
+
+# Tokenizer of the pre-tokenized embedding inputs and of the token counts
+ENCODING_NAME = "cl100k_base"
+
+_FILLER = (
+    "According to the retrieved sources, this is a deterministic stub answer whose length and "
+    "pace mimic a real completion. "
+)
+
+
+@dataclass
+class StubSettings:
+    """Simulated behaviour of the stub API."""
+
+    # Seconds added to every embeddings request
+    embedding_latency: float = 0.05
+    # Seconds before the first token of a chat completion
+    chat_latency: float = 0.4
+    # Completion tokens produced per second after the first (0 for no delay)
+    tokens_per_second: float = 60.0
+    # Tokens of every answer, before the Sources section
+    answer_tokens: int = 80
+    # Embedding dimension when the request does not set `dimensions`
+    dim: int = 1536
+
+
+def _decode_input(data: Union[str, List], encoding: tiktoken.Encoding) -> List[str]:
+    """Texts of an embeddings request; LangChain sends pre-tokenized inputs."""
+    if isinstance(data, str):
+        return [data]
+    if data and isinstance(data[0], int):
+        return [encoding.decode(data)]
+    return [item if isinstance(item, str) else encoding.decode(item) for item in data]
+
+
+def _encode_vector(vector: List[float], encoding_format: str) -> Union[List[float], str]:
+    """A vector as a float list, or base64 float32 bytes (the openai client's default)."""
+    if encoding_format == "base64":
+        return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+    return vector
+
+
+def create_app(settings: StubSettings) -> Quart:
+    """
+    Build the stub API.
+
+    Args:
+        settings: Latency, token rate and answer length to simulate
+
+    Returns:
+        ASGI app serving `/v1/embeddings`, `/v1/chat/completions` and `/v1/models`
+    """
+    app = Quart(__name__)
+    encoding = tiktoken.get_encoding(ENCODING_NAME)
+    answer_ids = encoding.encode(_FILLER * (settings.answer_tokens // 16 + 1))[:settings.answer_tokens]
+    answer = encoding.decode(answer_ids).strip()
+    embedders: Dict[int, HashingEmbeddings] = {}
+    completion_ids = itertools.count()
+
+    @app.route("/v1/models", methods=["GET"])
+    async def models():
+        return jsonify({"object": "list", "data": [
+            {"id": model, "object": "model", "owned_by": "stub"}
+            for model in ("text-embedding-3-small", "gpt-4o-mini")
+        ]})
+
+    @app.route("/v1/embeddings", methods=["POST"])
+    async def embeddings():
+        data = await request.get_json()
+        texts = _decode_input(data["input"], encoding)
+        dim = data.get("dimensions") or settings.dim
+        embedder = embedders.setdefault(dim, HashingEmbeddings(dim))
+
+        await asyncio.sleep(settings.embedding_latency)
+        vectors = embedder.embed_documents(texts)
+        encoding_format = data.get("encoding_format", "float")
+        num_tokens = sum(len(encoding.encode(text, disallowed_special=())) for text in texts)
+        return jsonify({
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _encode_vector(vector, encoding_format)}
+                for i, vector in enumerate(vectors)
+            ],
+            "model": data.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": num_tokens, "total_tokens": num_tokens},
+        })
+
+    @app.route("/v1/chat/completions", methods=["POST"])
+    async def chat_completions():
+        data = await request.get_json()
+        prompt = "\n".join(_message_text(message) for message in data.get("messages", []))
+        max_tokens = data.get("max_completion_tokens") or data.get("max_tokens")
+        tokens = encoding.encode(cite_first_source(answer, prompt), disallowed_special=())[:max_tokens]
+        usage = {
+            "prompt_tokens": len(encoding.encode(prompt, disallowed_special=())),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion = {
+            "id": f"chatcmpl-stub-{next(completion_ids)}",
+            "created": int(time.time()),
+            "model": data.get("model", "gpt-4o-mini"),
+        }
+
+        if data.get("stream"):
+            include_usage = (data.get("stream_options") or {}).get("include_usage", False)
+            return Response(
+                _stream_tokens(completion, tokens, usage if include_usage else None),
+                mimetype="text/event-stream",
+            )
+
+        await asyncio.sleep(settings.chat_latency + _generation_time(len(tokens)))
+        return jsonify({
+            **completion,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": encoding.decode(tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _generation_time(num_tokens: int) -> float:
+        """Seconds to produce the tokens after the first one."""
+        if settings.tokens_per_second <= 0:
+            return 0.0
+        return max(num_tokens - 1, 0) / settings.tokens_per_second
+
+    async def _stream_tokens(
+            completion: Dict[str, Any],
+            tokens: List[int],
+            usage: Optional[Dict[str, int]]
+    ) -> AsyncIterator[bytes]:
+        """Server-sent chunks: one per token, the finish reason, then usage if requested."""
+
+        def chunk(choices: List[Dict], **extra: Any) -> bytes:
+            payload = {**completion, "object": "chat.completion.chunk", "choices": choices, **extra}
+            return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+        # A character may span tokens; hold its bytes back until complete
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        await asyncio.sleep(settings.chat_latency)
+        for i, token in enumerate(tokens):
+            if i and settings.tokens_per_second > 0:
+                await asyncio.sleep(1 / settings.tokens_per_second)
+            delta = {"content": decoder.decode(encoding.decode_single_token_bytes(token))}
+            if i == 0:
+                delta["role"] = "assistant"
+            yield chunk([{"index": 0, "delta": delta, "finish_reason": None}])
+        yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if usage is not None:
+            yield chunk([], usage=usage)
+        yield b"data: [DONE]\n\n"
+
+    return app
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    """Text of a chat message, whose content may be a list of parts."""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50, help="Delay of every embeddings request")
+    parser.add_argument("--chat-latency-ms", type=float, default=400, help="Delay before the first answer token")
+    parser.add_argument("--tokens-per-second", type=float, default=60,
+                        help="Answer token rate after the first token (0 for instant)")
+    parser.add_argument("--answer-tokens", type=int, default=80, help="Answer length, before the Sources section")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    args = parser.parse_args()
+
+    app = create_app(StubSettings(
+        embedding_latency=args.embedding_latency_ms / 1000,
+        chat_latency=args.chat_latency_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        dim=args.dim,
+    ))
+    config = Config()
+    config.bind = [f"{args.host}:{args.port}"]
+    print(f"OpenAI stub API on http://{args.host}:{args.port}/v1")
+    asyncio.run(serve(app, config))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Offline performance benchmark of the ingestion and retrieval pipeline.
+
+The OpenAI models are replaced by deterministic stand-ins (`stubs.py`), so
+no API key or network is needed and every run does the same work. Measures:
+
+* `load_documents` files/s and MB/s on the real docs corpus, parsing the
+  HTML and reading back the parsed-corpus artifact
+* `chunk_documents` chunks/s, for the section-aware and the recursive chunker
+* index build time and memory over the corpus chunks
+* `retrieve` and `generate` latency percentiles over the corpus index
+* `retrieve` latency percentiles over synthetic indexes of 10k to 1M vectors,
+  optionally also split into shards searched by local worker processes
+
+Results are written as JSON; pass an earlier result to `--compare` to see
+what changed between commits:
+
+    python -m benchmarks.pipeline --output bench.json
+    python -m benchmarks.pipeline --max-files 100 --sizes 10000 --output new.json --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+import psutil
+import tiktoken
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from benchmarks.index_recall import synthetic_vectors
+from benchmarks.stubs import HashingEmbeddings, StubChatModel
+from src.config import get_docs_path
+from src.generation.generator import AnswerGenerator
+from src.ingestion.ingest import CHUNKERS, DocumentIngestion
+from src.ingestion.metadata import page_name
+from src.monitoring.metrics import collect_timings
+from src.retrieval.relevance import ScoreCutoffs
+from src.retrieval.retriever import DocumentRetriever
+from src.storage.index_types import INDEX_TYPES, build_index
+from src.storage.mmap_store import write_mmap_index
+from src.storage.shards import write_shards
+
+DEFAULT_SIZES = "10000,100000,1000000"
+
+
+def latency_stats(latencies_ms: List[float]) -> Dict[str, float]:
+    """Mean and tail percentiles of a list of latencies."""
+    return {
+        "mean_ms": round(float(np.mean(latencies_ms)), 4),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+    }
+
+
+def rss_mb() -> float:
+    """Resident memory of this process."""
+    return psutil.Process().memory_info().rss / 2 ** 20
+
+
+def dir_size_mb(path: Path) -> float:
+    """Total size of the files in a directory."""
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 2 ** 20
+
+
+def open_retriever(
+        index_path: Path,
+        embeddings: HashingEmbeddings,
+        mode: str,
+        sharded: bool = False
+) -> DocumentRetriever:
+    """Load a fresh retriever with caching and relevance cutoffs off, so every query does the full work."""
+    DocumentRetriever._instance = None
+    DocumentRetriever._vectorstore = None
+    retriever = DocumentRetriever(
+        index_path=str(index_path), mode=mode, cache_size=0, sharded=sharded, cutoffs=ScoreCutoffs()
+    )
+    retriever._vectorstore.embedding_function = embeddings
+    return retriever
+
+
+def time_queries(run, queries: List[str]) -> Dict[str, Any]:
+    """
+    Run `run(query)` for each query, timing it and its pipeline stages.
+
+    Returns:
+        Latency percentiles plus the mean time of each stage
+    """
+    # Untimed first call: page in the index, load tokenizers
+    run(queries[0])
+
+    latencies = []
+    stages: Dict[str, float] = {}
+    for query in queries:
+        with collect_timings() as timings:
+            start = time.perf_counter()
+            run(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        for stage, ms in timings.items():
+            stages[stage] = stages.get(stage, 0.0) + ms
+
+    return {
+        "num_queries": len(queries),
+        **latency_stats(latencies),
+        "stages_mean_ms": {stage: round(ms / len(queries), 4) for stage, ms in sorted(stages.items())},
+    }
+
+
+def corpus_queries(docs: List[Document], num_queries: int) -> List[str]:
+    """Questions about pages spread evenly over the corpus."""
+    step = max(1, len(docs) // num_queries)
+    names = [page_name(doc.metadata.get("title", ""), doc.metadata["source"]) for doc in docs[::step]]
+    templates = ["What is {}?", "When did {} take place?", "Who was involved in {}?", "History of {}"]
+    return [templates[i % len(templates)].format(name) for i, name in enumerate(names[:num_queries])]
+
+
+def bench_chunkers(ingestion: DocumentIngestion, docs: List[Document]) -> Dict[str, Any]:
+    """Time every chunker on the same parsed documents."""
+    encoding = tiktoken.get_encoding("cl100k_base")
+    results = {}
+    for chunker in CHUNKERS:
+        ingestion.chunker = chunker
+        start = time.perf_counter()
+        chunks = ingestion.chunk_documents(docs)
+        seconds = time.perf_counter() - start
+        tokens = [len(encoding.encode(chunk.page_content, disallowed_special=())) for chunk in chunks]
+        results[chunker] = {
+            "chunks": len(chunks),
+            "seconds": round(seconds, 3),
+            "chunks_per_second": round(len(chunks) / seconds, 2),
+            "mean_tokens": round(float(np.mean(tokens)), 1),
+        }
+    ingestion.chunker = "section"
+    results["speedup"] = round(results["recursive"]["seconds"] / results["section"]["seconds"], 2)
+    return results
+
+
+def bench_corpus(args, work_dir: Path) -> Dict[str, Any]:
+    """Benchmark loading, chunking, indexing and querying the real corpus."""
+    index_path = work_dir / "corpus_index"
+    ingestion = DocumentIngestion(
+        docs_path=args.docs_path, index_path=str(index_path), index_type=args.index_type,
+        parsed_corpus_path=str(work_dir / "parsed_corpus"), reparse=True
+    )
+    file_paths = ingestion._loader().file_paths_to_load()
+    if args.max_files:
+        file_paths = file_paths[:args.max_files]
+    total_mb = sum(os.path.getsize(p) for p in file_paths) / 2 ** 20
+
+    start = time.perf_counter()
+    docs = ingestion.load_documents(file_paths)
+    load_seconds = time.perf_counter() - start
+
+    ingestion.reparse = False
+    start = time.perf_counter()
+    ingestion.load_documents(file_paths)
+    reload_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = ingestion.chunk_documents(docs)
+    chunk_seconds = time.perf_counter() - start
+    chunkers = bench_chunkers(ingestion, docs)
+
+    embeddings = HashingEmbeddings(args.dim)
+    texts = [chunk.page_content for chunk in chunks]
+    start = time.perf_counter()
+    vectors = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+    embed_seconds = time.perf_counter() - start
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    vectorstore = FAISS.from_embeddings(
+        zip(texts, vectors), embeddings,
+        metadatas=[chunk.metadata for chunk in chunks], ids=[chunk.id for chunk in chunks],
+    )
+    ingestion.convert_index(vectorstore)
+    ingestion.save_index(vectorstore)
+    build_seconds = time.perf_counter() - start
+    build = {
+        "index_type": args.index_type,
+        "num_vectors": len(chunks),
+        "dim": args.dim,
+        "seconds": round(build_seconds, 3),
+        "index_memory_mb": round(faiss.serialize_index(vectorstore.index).nbytes / 2 ** 20, 2),
+        "on_disk_mb": round(dir_size_mb(index_path), 2),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+    }
+    del vectorstore, vectors
+
+    queries = corpus_queries(docs, args.num_queries)
+    retriever = open_retriever(index_path, embeddings, args.mode)
+    generator = AnswerGenerator()
+    generator.llm = StubChatModel()
+    retrieved = {}
+
+    def retrieve(query):
+        retrieved[query] = retriever.retrieve(query)
+
+    retrieve_stats = time_queries(retrieve, queries)
+    generate_stats = time_queries(lambda query: generator.generate(query, retrieved[query]), queries)
+
+    return {
+        "load_documents": {
+            "files": len(file_paths),
+            "mb": round(total_mb, 2),
+            "seconds": round(load_seconds, 3),
+            "files_per_second": round(len(file_paths) / load_seconds, 2),
+            "mb_per_second": round(total_mb / load_seconds, 2),
+        },
+        "load_parsed_corpus": {
+            "seconds": round(reload_seconds, 3),
+            "files_per_second": round(len(file_paths) / reload_seconds, 2),
+            "speedup": round(load_seconds / reload_seconds, 2),
+        },
+        "chunk_documents": {
+            "chunks": len(chunks),
+            "seconds": round(chunk_seconds, 3),
+            "chunks_per_second": round(len(chunks) / chunk_seconds, 2),
+        },
+        "chunkers": chunkers,
+        "embed_stub": {
+            "seconds": round(embed_seconds, 3),
+            "chunks_per_second": round(len(chunks) / embed_seconds, 2),
+        },
+        "build_index": build,
+        "retrieve": {"mode": args.mode, "k": retriever.k, **retrieve_stats},
+        "generate_stub_llm": generate_stats,
+    }
+
+
+def bench_synthetic(num_vectors: int, args, work_dir: Path) -> Dict[str, Any]:
+    """Benchmark `retrieve` over a synthetic index of `num_vectors` vectors."""
+    index_path = work_dir / f"synthetic_{num_vectors}"
+    print(f"Building synthetic {args.index_type} index of {num_vectors} vectors (dim {args.synthetic_dim})...")
+
+    vectors = synthetic_vectors(num_vectors, args.synthetic_dim)
+    start = time.perf_counter()
+    index = build_index(args.index_type, vectors)
+    build_seconds = time.perf_counter() - start
+    if args.shards > 1:
+        write_shards(str(index_path), vectors, args.index_type, None, args.shards)
+    del vectors
+
+    docs = (
+        Document(
+            id=f"synthetic-{i}",
+            page_content=f"Synthetic chunk {i} of page {i // 20}.",
+            metadata={"source": f"synthetic/page-{i // 20}.html", "title": f"Page {i // 20}"},
+        )
+        for i in range(num_vectors)
+    )
+    write_mmap_index(str(index_path), index, docs)
+    index_memory_mb = faiss.serialize_index(index).nbytes / 2 ** 20
+    del index
+
+    retriever = open_retriever(index_path, HashingEmbeddings(args.synthetic_dim), "vector")
+    queries = [f"synthetic query {i} about page {i * 7 % 1000}" for i in range(args.num_queries)]
+    stats = time_queries(retriever.retrieve, queries)
+    result = {
+        "num_vectors": num_vectors,
+        "dim": args.synthetic_dim,
+        "index_type": args.index_type,
+        "build_seconds": round(build_seconds, 3),
+        "index_memory_mb": round(index_memory_mb, 2),
+        "retrieve": stats,
+    }
+    print(f"  p50={stats['p50_ms']:.3f}ms  p95={stats['p95_ms']:.3f}ms  p99={stats['p99_ms']:.3f}ms")
+
+    if args.shards > 1:
+        retriever = open_retriever(index_path, HashingEmbeddings(args.synthetic_dim), "vector", sharded=True)
+        try:
+            stats = time_queries(retriever.retrieve, queries)
+        finally:
+            retriever._shards.close()
+        result["sharded_retrieve"] = {"shards": args.shards, **stats}
+        print(f"  {args.shards} shards: p50={stats['p50_ms']:.3f}ms  p95={stats['p95_ms']:.3f}ms")
+    return result
+
+
+def _flatten(value: Any, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a result, keyed by path (synthetic runs keyed by size)."""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}{key}."))
+        return flat
+    if isinstance(value, list):
+        flat = {}
+        for i, item in enumerate(value):
+            key = item.get("num_vectors", i) if isinstance(item, dict) else i
+            flat.update(_flatten(item, f"{prefix}{key}."))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix.rstrip("."): value}
+    return {}
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Relative change of every metric present in both results.
+
+    Args:
+        previous: Earlier benchmark output
+        current: New benchmark output
+
+    Returns:
+        Rows of {"metric", "previous", "current", "change"}, change as a fraction
+    """
+    old = _flatten({key: previous.get(key) for key in ("corpus", "synthetic")})
+    new = _flatten({key: current.get(key) for key in ("corpus", "synthetic")})
+    rows = []
+    for metric in sorted(old.keys() & new.keys()):
+        change = (new[metric] - old[metric]) / old[metric] if old[metric] else None
+        rows.append({"metric": metric, "previous": old[metric], "current": new[metric], "change": change})
+    return rows
+
+
+def git_commit() -> Optional[str]:
+    """Commit the benchmark ran on, if run from a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs-path", default=str(get_docs_path()))
+    parser.add_argument("--max-files", type=int, default=None, help="Only use the first N corpus files")
+    parser.add_argument("--skip-corpus", action="store_true", help="Only run the synthetic benchmarks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="Comma-separated synthetic index sizes ('' to skip)")
+    parser.add_argument("--dim", type=int, default=1536, help="Corpus embedding dimension")
+    parser.add_argument("--synthetic-dim", type=int, default=384,
+                        help="Synthetic vector dimension (1M x 1536 floats needs ~6 GB)")
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Also time synthetic indexes split into this many shard worker processes")
+    parser.add_argument("--mode", default="hybrid", help="Retrieval mode of the corpus benchmark")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--work-dir", help="Keep the built indexes here (default: a temp directory)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier output to compare against")
+    args = parser.parse_args()
+
+    # Nothing calls OpenAI, but the pipeline classes insist on a key
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "faiss": faiss.__version__,
+            "args": vars(args),
+        },
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(args.work_dir or tmp)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        if not args.skip_corpus:
+            results["corpus"] = bench_corpus(args, work_dir)
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        results["synthetic"] = [bench_synthetic(size, args, work_dir) for size in sizes]
+        DocumentRetriever._instance = None
+        DocumentRetriever._vectorstore = None
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        for row in compare(previous, results):
+            change = f"{row['change']:+.1%}" if row["change"] is not None else "n/a"
+            print(f"{row['metric']:60s} {row['previous']:>12} -> {row['current']:>12}  {change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Deterministic, offline stand-ins for the OpenAI embedding and chat models.
+
+They let the benchmarks exercise the real ingestion, retrieval and generation
+code without network calls, so timings only reflect this repository's code
+and repeat across runs and machines.
+"""
+import hashlib
+import re
+from functools import lru_cache
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_TOKEN = re.compile(r"\w+")
+_SOURCE_HEADER = re.compile(r"\[SOURCE \d+: ([^\]]+)\]")
+
+
+@lru_cache(maxsize=1 << 20)
+def _token_bucket(token: str, dim: int) -> Tuple[int, float]:
+    """Dimension and sign a token is hashed to."""
+    digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+def cite_first_source(text: str, prompt: str) -> str:
+    """Append the `Sources` section the system prompt asks for, naming the prompt's first source."""
+    sources = _SOURCE_HEADER.findall(prompt)
+    if sources:
+        text += f"\n\nSources:\n- {sources[0]}"
+    return text
+
+
+class HashingEmbeddings(Embeddings):
+    """Feature-hashed bag of words: texts sharing words get similar unit vectors."""
+
+    def __init__(self, dim: int = 1536):
+        """
+        Initialize embedder.
+
+        Args:
+            dim: Vector dimension (1536 matches text-embedding-3-small)
+        """
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN.findall(text.lower()):
+            bucket, sign = _token_bucket(token, self.dim)
+            vector[bucket] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that answers instantly from the prompt, citing its first source."""
+
+    answer: str = "This is a stub answer built from the retrieved sources."
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> Tuple[str, dict]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = cite_first_source(self.answer, prompt)
+        # Roughly 4 characters per token, as for English with cl100k_base
+        usage = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        }
+        return text, usage
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any
+    ) -> ChatResult:
+        text, usage = self._reply(messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _stream(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        text, usage = self._reply(messages)
+        for word in re.findall(r"\S+\s*", text):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
@@ -1,18 +1,69 @@
 """Standalone script to run document ingestion."""
 
+import argparse
 import sys
 
-from src.ingestion.ingest import DocumentIngestion
+from src.ingestion.ingest import CHUNKERS, DocumentIngestion
+from src.storage.index_types import INDEX_TYPES
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-embed added or changed files and drop removed ones",
+    )
+    parser.add_argument(
+        "--reparse",
+        action="store_true",
+        help="Parse every HTML page again instead of reusing the parsed-corpus artifact",
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=INDEX_TYPES,
+        default="flat",
+        help="FAISS index to build (default: exact flat index)",
+    )
+    parser.add_argument(
+        "--chunker",
+        choices=CHUNKERS,
+        default="section",
+        help="Chunk at section headings in one tokenizer pass, or with the recursive splitter (default: section)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Also split the index into this many shards for parallel search (default: 1, unsharded)",
+    )
+    parser.add_argument("--nlist", type=int, help="IVF list count (ivf_flat, ivf_pq)")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW graph degree M (hnsw)")
+    parser.add_argument("--ef-construction", type=int, help="HNSW build-time efConstruction (hnsw)")
+    parser.add_argument("--pq-m", type=int, help="PQ sub-quantizer count (ivf_pq)")
+    parser.add_argument("--pq-nbits", type=int, help="Bits per PQ code (ivf_pq)")
+    args = parser.parse_args()
+
+    index_params = {
+        name: value for name, value in [
+            ("nlist", args.nlist),
+            ("M", args.hnsw_m),
+            ("ef_construction", args.ef_construction),
+            ("pq_m", args.pq_m),
+            ("pq_nbits", args.pq_nbits),
+        ] if value is not None
+    }
+
     print("=" * 60)
     print("F1 RAG Chatbot - Document Ingestion")
     print("=" * 60)
 
     try:
         # Run ingestion (config is loaded automatically)
-        ingestion = DocumentIngestion()
-        ingestion.run_ingestion()
+        ingestion = DocumentIngestion(
+            index_type=args.index_type, index_params=index_params, chunker=args.chunker,
+            num_shards=args.shards, reparse=args.reparse
+        )
+        ingestion.run_ingestion(incremental=args.incremental)
     except Exception as e:
         print(f"Ingestion failed: {e}")
         sys.exit(1)
@@ -0,0 +1,163 @@
+"""Semantic answer cache: reuse the answer of an earlier, similarly worded question."""
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence
+
+import numpy as np
+
+from src.monitoring.metrics import record_cache_lookups
+
+
+@dataclass
+class _CachedAnswer:
+    answer: str
+    sources: FrozenSet[str]
+    expires_at: Optional[float]
+    last_used: int
+
+
+class SemanticAnswerCache:
+    """
+    Answers of past questions, found again by query embedding similarity.
+
+    A question reuses a cached answer when its embedding is within the cosine
+    similarity threshold of the cached question's and it retrieved the same
+    chunks, i.e. the LLM would be given the same sources. The embeddings sit
+    in a small matrix searched by brute force, which for a few hundred
+    entries takes well under a millisecond.
+
+    Entries expire after a TTL, the least recently used one is evicted when
+    full, and everything is dropped when the index version changes.
+    """
+
+    def __init__(
+            self,
+            max_size: int = 256,
+            ttl: Optional[float] = 3600,
+            threshold: float = 0.92,
+            name: Optional[str] = "answer"
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            max_size: Maximum number of answers (0 disables the cache)
+            ttl: Seconds an answer stays valid (None for no expiry)
+            threshold: Minimum cosine similarity between query embeddings
+            name: Label of the cache's hit/miss metrics (None to not export)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.index_version: Optional[str] = None
+        # Unit-length query embeddings, one row per slot (allocated on first put)
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[_CachedAnswer]] = [None] * max(max_size, 0)
+        self._clock = itertools.count()
+        self._lock = threading.Lock()
+
+    def chunk_ids(self, docs: Sequence) -> Optional[List[str]]:
+        """IDs of the retrieved chunks, or None if the answer cannot be cached."""
+        if self.max_size <= 0 or not docs:
+            return None
+        ids = [getattr(doc, "id", None) for doc in docs]
+        # Without chunk IDs there is no telling whether the sources match
+        return ids if all(ids) else None
+
+    def _check_version(self, index_version: str, dim: int) -> None:
+        """Drop every answer once the index (or the embedding size) changed."""
+        if index_version != self.index_version or (self._vectors is not None and self._vectors.shape[1] != dim):
+            self._vectors = None
+            self._entries = [None] * self.max_size
+            self.index_version = index_version
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, embedding: Sequence[float], chunk_ids: List[str], index_version: str) -> Optional[str]:
+        """
+        Find the answer of a similar question that retrieved the same chunks.
+
+        Args:
+            embedding: Query embedding
+            chunk_ids: IDs of the chunks retrieved for the query
+            index_version: Version of the index the chunks came from
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        query = self._unit(embedding)
+        sources = frozenset(chunk_ids)
+        with self._lock:
+            self._check_version(index_version, len(query))
+            answer = None
+            if self._vectors is not None:
+                similarities = self._vectors @ query
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                now = time.monotonic()
+                for slot in candidates[np.argsort(-similarities[candidates])]:
+                    entry = self._entries[slot]
+                    if entry is None:
+                        continue
+                    if entry.expires_at is not None and entry.expires_at <= now:
+                        self._entries[slot] = None
+                        self._vectors[slot] = 0
+                        continue
+                    if entry.sources == sources:
+                        entry.last_used = next(self._clock)
+                        answer = entry.answer
+                        break
+
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if self.name:
+            record_cache_lookups(self.name, int(answer is not None), int(answer is None))
+        return answer
+
+    def put(self, embedding: Sequence[float], chunk_ids: List[str], answer: str, index_version: str) -> None:
+        """Store an answer, replacing an expired or the least recently used one if full."""
+        if self.max_size <= 0:
+            return
+
+        query = self._unit(embedding)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._check_version(index_version, len(query))
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(query)), dtype=np.float32)
+
+            now = time.monotonic()
+            free = [
+                slot for slot, entry in enumerate(self._entries)
+                if entry is None or (entry.expires_at is not None and entry.expires_at <= now)
+            ]
+            if free:
+                slot = free[0]
+            else:
+                slot = min(range(self.max_size), key=lambda s: self._entries[s].last_used)
+
+            self._vectors[slot] = query
+            self._entries[slot] = _CachedAnswer(answer, frozenset(chunk_ids), expires_at, next(self._clock))
+
+    def clear(self) -> None:
+        """Drop all answers."""
+        with self._lock:
+            self._vectors = None
+            self._entries = [None] * max(self.max_size, 0)
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
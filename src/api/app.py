@@ -1,10 +1,40 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 
-from src.generation.generator import AnswerGenerator
-from src.retrieval.retriever import DocumentRetriever
+from src.config import (
+    get_answer_cache_similarity,
+    get_answer_cache_size,
+    get_answer_cache_ttl,
+    get_chat_batch_concurrency,
+    get_coalesce_chat_requests,
+    get_eager_warmup,
+)
+from src.api.answer_cache import SemanticAnswerCache
+from src.api.common import (
+    RequestError,
+    answer_without_llm,
+    batch_error,
+    batch_item,
+    batch_response,
+    chat_response,
+    load_components,
+    parse_batch_request,
+    parse_chat_request,
+    ready_response,
+    remember_answer,
+    retrieval_errors,
+    server_error,
+    split_batch,
+)
+from src.api.singleflight import SingleFlight, chat_key
+from src.api.streaming import SSE_HEADERS, StreamTimer, metadata_event, sse_event
+from src.api.warmup import ColdStart, warm_components
+from src.monitoring.metrics import collect_timings, observe_request, render_metrics
 
 app = Flask(__name__)
 
@@ -14,21 +44,45 @@ load_dotenv()
 # Initialize components (singleton pattern ensures single load)
 retriever = None
 generator = None
+cold_start = ColdStart()
+_init_lock = threading.Lock()
+# Identical /api/chat requests in flight at the same time share one answer
+chat_flight = SingleFlight("chat")
+# Differently worded questions that retrieve the same chunks share an answer
+answer_cache = SemanticAnswerCache(
+    get_answer_cache_size(), get_answer_cache_ttl(), get_answer_cache_similarity()
+)
 
 
 def initialize_components():
     """Lazy initialization of retriever and generator."""
     global retriever, generator
 
-    if retriever is None:
-        print("Initializing DocumentRetriever...")
-        retriever = DocumentRetriever()
-        print("DocumentRetriever initialized")
+    if retriever is not None and generator is not None:
+        return
 
-    if generator is None:
-        print("Initializing AnswerGenerator...")
-        generator = AnswerGenerator()
-        print("AnswerGenerator initialized")
+    with _init_lock:
+        if retriever is not None and generator is not None:
+            return
+        retriever, generator = load_components(retriever, generator, cold_start)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    observe_request(endpoint, response.status_code, time.perf_counter() - g.request_start)
+    return response
+
+
+def warm_up():
+    """Load the components and warm their clients before serving (EAGER_WARMUP)."""
+    initialize_components()
+    warm_components(retriever, generator, cold_start)
 
 
 @app.route("/api/health", methods=["GET"])
@@ -40,6 +94,26 @@ def health_check():
     }), 200
 
 
+@app.route("/api/ready", methods=["GET"])
+def ready_check():
+    """
+    Readiness probe: 200 once the index is loaded, 503 before.
+
+    Unlike `/api/health` (the process is alive), this tells a load balancer
+    when the replica can take traffic. The response carries the cold-start
+    phase durations.
+    """
+    body, status = ready_response(retriever is not None and generator is not None, cold_start)
+    return jsonify(body), status
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metrics: stage latencies, tokens, cache hits, request counts."""
+    body, content_type = render_metrics()
+    return Response(body, mimetype=content_type)
+
+
 @app.route("/api/chat", methods=["POST"])
 def chat():
     """
@@ -48,50 +122,172 @@ def chat():
     Expected JSON body:
     {
         "query": "Who won the 2023 F1 championship?",
-        "k": 5  // optional, number of docs to retrieve
+        "k": 5,  // optional, number of docs to retrieve
+        "filters": {"year": 2023, "category": "race"},  // optional
+        "debug": true  // optional, adds a per-stage timing breakdown
     }
 
     Returns:
     {
         "query": "...",
         "answer": "...",
-        "num_sources": 5
+        "num_sources": 5,
+        "timings": {"retrieve_ms": ..., "llm_ms": ..., ...},  // with debug
+        "coalesced": false,  // with debug, true if the answer came from an identical in-flight request
+        "answer_cached": false,  // with debug, true if the answer of a similar question was reused
+        "scores": [0.61, ...],  // relevance score of each source
+        "candidate_scores": [0.12, ...]  // when no source passed the relevance cutoffs
     }
+
+    When no retrieved chunk is relevant enough, the "I don't know" answer is
+    returned at once, without an LLM call.
     """
+    try:
+        chat_request = parse_chat_request(request.get_json(silent=True))
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         # Initialize components if needed
         initialize_components()
+        query, k, filters = chat_request.query, chat_request.k, chat_request.filters
 
-        # Validate request
-        if not request.is_json:
-            return jsonify({"error": "Request must be JSON"}), 400
+        def answer_query():
+            with collect_timings() as timings:
+                # Retrieve relevant documents
+                with retrieval_errors():
+                    docs = retriever.retrieve(query, k=k, filters=filters)
 
-        data = request.get_json()
-        query = data.get("query")
+                # No relevant source, or a similar question already answered
+                answer, cached = answer_without_llm(answer_cache, retriever, docs)
+                if answer is None:
+                    # Generate answer
+                    answer = generator.generate(query, docs)
+                    remember_answer(answer_cache, retriever, docs, answer)
+            return docs, answer, timings, cached
 
-        if not query or not query.strip():
-            return jsonify({"error": "Query cannot be empty"}), 400
+        if get_coalesce_chat_requests():
+            # Concurrent requests for the same (query, k, filters) wait for
+            # the first one and share its answer
+            (docs, answer, timings, cached), coalesced = chat_flight.do(
+                chat_key(query, k, filters), answer_query
+            )
+        else:
+            (docs, answer, timings, cached), coalesced = answer_query(), False
 
-        # Optional: custom k value
-        k = data.get("k", 5)
+        return jsonify(chat_response(
+            chat_request, docs, answer, timings, g.request_start, coalesced, cached
+        )), 200
 
-        # Retrieve relevant documents
-        docs = retriever.retrieve(query, k=k)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify(server_error(e)), 500
 
-        # Generate answer
-        answer = generator.generate(query, docs)
 
-        return jsonify({
-            "query": query,
-            "answer": answer,
-            "num_sources": len(docs)
-        }), 200
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    Streaming chat endpoint (Server-Sent Events).
 
+    Takes the same JSON body as `/api/chat` and streams:
+
+        event: metadata  {"query", "num_sources", "documents", "cache_hit", "scores"}
+        event: token     {"text": "..."}   (repeated)
+        event: done      {"answer", "sources", "ttft_ms", "total_ms"}
+
+    An `error` event replaces `done` if generation fails mid-stream.
+    """
+    try:
+        chat_request = parse_chat_request(request.get_json(silent=True))
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        initialize_components()
+        query = chat_request.query
+        timer = StreamTimer()
+        with retrieval_errors():
+            docs = retriever.retrieve(query, k=chat_request.k, filters=chat_request.filters)
+
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({
-            "error": "Internal server error",
-            "message": str(e)
-        }), 500
+        return jsonify(server_error(e)), 500
+
+    def events():
+        yield metadata_event(query, docs)
+        parts = []
+        try:
+            for text in generator.stream(query, docs):
+                timer.token()
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            yield sse_event("error", {"error": "Internal server error", "message": str(e)})
+            return
+        yield timer.done_event("".join(parts))
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.route("/api/chat/batch", methods=["POST"])
+def chat_batch():
+    """
+    Answer many questions in one request.
+
+    Retrieval for all queries shares one embedding request and one FAISS
+    search; answers are generated in parallel with bounded concurrency.
+    A failing item does not fail the batch.
+
+    Expected JSON body:
+    {
+        "queries": ["Who won the 2023 F1 championship?", ...],
+        "k": 5,  // optional, number of docs to retrieve per query
+        "filters": {"category": "season"}  // optional, applied to every query
+    }
+
+    Returns:
+    {
+        "results": [
+            {"query": "...", "answer": "...", "num_sources": 5},
+            {"query": "...", "error": "..."}
+        ],
+        "num_errors": 1
+    }
+    """
+    try:
+        batch_request = parse_batch_request(request.get_json(silent=True))
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        initialize_components()
+        queries = batch_request.queries
+        results, valid = split_batch(queries)
+
+        if valid:
+            with retrieval_errors():
+                batch_docs = retriever.retrieve_batch(
+                    [queries[i] for i in valid], k=batch_request.k, filters=batch_request.filters
+                )
+
+            def answer(i, docs):
+                try:
+                    return batch_item(queries[i], docs, generator.generate(queries[i], docs))
+                except Exception as e:
+                    return batch_error(queries[i], e)
+
+            with ThreadPoolExecutor(max_workers=get_chat_batch_concurrency()) as executor:
+                for i, result in zip(valid, executor.map(answer, valid, batch_docs)):
+                    results[i] = result
+
+        return jsonify(batch_response(results)), 200
+
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify(server_error(e)), 500
 
 
 @app.errorhandler(404)
@@ -106,6 +302,12 @@ def internal_error(e):
     return jsonify({"error": "Internal server error"}), 500
 
 
+# Servers import this module before accepting connections, so no request
+# ever waits for the index to load
+if get_eager_warmup():
+    warm_up()
+
+
 if __name__ == "__main__":
     # Validate API key is set
     if not os.getenv("OPENAI_API_KEY"):
@@ -0,0 +1,260 @@
+"""
+Asyncio (ASGI) serving mode with the same endpoints and responses as `app.py`.
+
+While a request waits on the embedding API, the FAISS search (run in a
+worker thread) or the LLM, the event loop keeps serving other requests, so a
+single process can hold hundreds of chats in flight. Run with:
+
+    hypercorn src.api.async_app:app --bind 0.0.0.0:5001
+"""
+import asyncio
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from quart import Quart, Response, g, request, jsonify
+
+from src.api.answer_cache import SemanticAnswerCache
+from src.api.common import (
+    RequestError,
+    answer_without_llm,
+    batch_error,
+    batch_item,
+    batch_response,
+    chat_response,
+    load_components,
+    parse_batch_request,
+    parse_chat_request,
+    ready_response,
+    remember_answer,
+    retrieval_errors,
+    server_error,
+    split_batch,
+)
+from src.api.streaming import SSE_HEADERS, StreamTimer, metadata_event, sse_event
+from src.api.warmup import ColdStart, awarm_components
+from src.api.singleflight import AsyncSingleFlight, chat_key
+from src.config import (
+    get_answer_cache_similarity,
+    get_answer_cache_size,
+    get_answer_cache_ttl,
+    get_chat_batch_concurrency,
+    get_coalesce_chat_requests,
+    get_eager_warmup,
+)
+from src.monitoring.metrics import collect_timings, observe_request, render_metrics
+
+app = Quart(__name__)
+
+# Load environment variables first
+load_dotenv()
+
+# Initialize components (singleton pattern ensures single load)
+retriever = None
+generator = None
+cold_start = ColdStart()
+_init_lock = threading.Lock()
+# Identical /api/chat requests in flight at the same time share one answer
+chat_flight = AsyncSingleFlight("chat")
+# Differently worded questions that retrieve the same chunks share an answer
+answer_cache = SemanticAnswerCache(
+    get_answer_cache_size(), get_answer_cache_ttl(), get_answer_cache_similarity()
+)
+
+
+def initialize_components():
+    """Lazy initialization of retriever and generator."""
+    global retriever, generator
+
+    if retriever is not None and generator is not None:
+        return
+
+    with _init_lock:
+        if retriever is not None and generator is not None:
+            return
+        retriever, generator = load_components(retriever, generator, cold_start)
+
+
+@app.before_request
+async def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+async def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    observe_request(endpoint, response.status_code, time.perf_counter() - g.request_start)
+    return response
+
+
+@app.before_serving
+async def eager_warm_up():
+    """With EAGER_WARMUP, load and warm everything before accepting connections."""
+    if get_eager_warmup():
+        await asyncio.to_thread(initialize_components)
+        await awarm_components(retriever, generator, cold_start)
+
+
+@app.route("/api/health", methods=["GET"])
+async def health_check():
+    """Health check endpoint."""
+    return jsonify({
+        "status": "healthy",
+        "service": "f1-rag-chatbot"
+    }), 200
+
+
+@app.route("/api/ready", methods=["GET"])
+async def ready_check():
+    """
+    Readiness probe: 200 once the index is loaded, 503 before.
+
+    Unlike `/api/health` (the process is alive), this tells a load balancer
+    when the replica can take traffic. The response carries the cold-start
+    phase durations.
+    """
+    body, status = ready_response(retriever is not None and generator is not None, cold_start)
+    return jsonify(body), status
+
+
+@app.route("/api/metrics", methods=["GET"])
+async def metrics():
+    """Prometheus metrics: stage latencies, tokens, cache hits, request counts."""
+    body, content_type = render_metrics()
+    return Response(body, mimetype=content_type)
+
+
+@app.route("/api/chat", methods=["POST"])
+async def chat():
+    """Main chat endpoint; same contract as the Flask `/api/chat`."""
+    try:
+        chat_request = parse_chat_request(await request.get_json(silent=True))
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        await asyncio.to_thread(initialize_components)
+        query, k, filters = chat_request.query, chat_request.k, chat_request.filters
+
+        async def answer_query():
+            with collect_timings() as timings:
+                with retrieval_errors():
+                    docs = await retriever.aretrieve(query, k=k, filters=filters)
+
+                answer, cached = answer_without_llm(answer_cache, retriever, docs)
+                if answer is None:
+                    answer = await generator.agenerate(query, docs)
+                    remember_answer(answer_cache, retriever, docs, answer)
+            return docs, answer, timings, cached
+
+        if get_coalesce_chat_requests():
+            (docs, answer, timings, cached), coalesced = await chat_flight.do(
+                chat_key(query, k, filters), answer_query
+            )
+        else:
+            (docs, answer, timings, cached), coalesced = await answer_query(), False
+
+        return jsonify(chat_response(
+            chat_request, docs, answer, timings, g.request_start, coalesced, cached
+        )), 200
+
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify(server_error(e)), 500
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+async def chat_stream():
+    """Streaming chat endpoint; same events as the Flask `/api/chat/stream`."""
+    try:
+        chat_request = parse_chat_request(await request.get_json(silent=True))
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        await asyncio.to_thread(initialize_components)
+        query = chat_request.query
+        timer = StreamTimer()
+        with retrieval_errors():
+            docs = await retriever.aretrieve(query, k=chat_request.k, filters=chat_request.filters)
+
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify(server_error(e)), 500
+
+    async def events():
+        yield metadata_event(query, docs)
+        parts = []
+        try:
+            async for text in generator.astream(query, docs):
+                timer.token()
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            yield sse_event("error", {"error": "Internal server error", "message": str(e)})
+            return
+        yield timer.done_event("".join(parts))
+
+    return Response(events(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.route("/api/chat/batch", methods=["POST"])
+async def chat_batch():
+    """Batch chat endpoint; same contract as the Flask `/api/chat/batch`."""
+    try:
+        batch_request = parse_batch_request(await request.get_json(silent=True))
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        await asyncio.to_thread(initialize_components)
+        queries = batch_request.queries
+        results, valid = split_batch(queries)
+
+        if valid:
+            with retrieval_errors():
+                batch_docs = await retriever.aretrieve_batch(
+                    [queries[i] for i in valid], k=batch_request.k, filters=batch_request.filters
+                )
+            semaphore = asyncio.Semaphore(get_chat_batch_concurrency())
+
+            async def answer(i, docs):
+                async with semaphore:
+                    try:
+                        return batch_item(queries[i], docs, await generator.agenerate(queries[i], docs))
+                    except Exception as e:
+                        return batch_error(queries[i], e)
+
+            answers = await asyncio.gather(*(answer(i, docs) for i, docs in zip(valid, batch_docs)))
+            for i, result in zip(valid, answers):
+                results[i] = result
+
+        return jsonify(batch_response(results)), 200
+
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify(server_error(e)), 500
+
+
+@app.errorhandler(404)
+async def not_found(e):
+    """Handle 404 errors."""
+    return jsonify({"error": "Endpoint not found"}), 404
+
+
+@app.errorhandler(500)
+async def internal_error(e):
+    """Handle 500 errors."""
+    return jsonify({"error": "Internal server error"}), 500
+
+
+if __name__ == "__main__":
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("OPENAI_API_KEY not set")
+
+    print("Starting F1 RAG Chatbot API (async)...")
+    app.run(host="0.0.0.0", port=5001, debug=False)
@@ -0,0 +1,251 @@
+"""
+Request handling shared by the Flask (`app.py`) and asyncio (`async_app.py`) apps.
+
+Parsing and validation of the chat bodies, component loading, the answers
+that need no LLM call and the response bodies live here, so both serving
+modes keep the same contract; each app only keeps its sync or async calls.
+"""
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.api.answer_cache import SemanticAnswerCache
+from src.api.warmup import ColdStart
+from src.config import get_chat_batch_max_queries
+from src.monitoring.metrics import format_timings, stage_timer
+from src.retrieval.partitions import validate_filters
+from src.retrieval.relevance import score_fields
+
+
+class RequestError(ValueError):
+    """A malformed request, answered with 400 and its message."""
+
+
+@dataclass
+class ChatRequest:
+    """Validated body of `/api/chat` and `/api/chat/stream`."""
+
+    query: str
+    k: int
+    filters: Optional[Dict[str, List[Any]]]
+    debug: bool = False
+
+
+@dataclass
+class BatchRequest:
+    """Validated body of `/api/chat/batch`."""
+
+    queries: List[Any]
+    k: int
+    filters: Optional[Dict[str, List[Any]]]
+
+
+def _body(data: Any) -> Dict[str, Any]:
+    if data is None:
+        raise RequestError("Request must be JSON")
+    if not isinstance(data, dict):
+        raise RequestError("Request body must be a JSON object")
+    return data
+
+
+def _filters(data: Dict[str, Any]) -> Optional[Dict[str, List[Any]]]:
+    try:
+        return validate_filters(data.get("filters"))
+    except ValueError as e:
+        raise RequestError(str(e)) from None
+
+
+def parse_chat_request(data: Any) -> ChatRequest:
+    """
+    Validate a chat request body.
+
+    Args:
+        data: Parsed JSON body, None if the request was not JSON
+
+    Raises:
+        RequestError: If the body is not JSON, the query is empty or the
+            filters are invalid
+    """
+    data = _body(data)
+    query = data.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise RequestError("Query cannot be empty")
+    return ChatRequest(query, data.get("k", 5), _filters(data), bool(data.get("debug")))
+
+
+def parse_batch_request(data: Any) -> BatchRequest:
+    """
+    Validate a batch request body; empty queries are reported per item later.
+
+    Raises:
+        RequestError: If the body is not JSON, `queries` is not a non-empty
+            list within the batch limit or the filters are invalid
+    """
+    data = _body(data)
+    queries = data.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise RequestError("Queries must be a non-empty list")
+
+    max_queries = get_chat_batch_max_queries()
+    if len(queries) > max_queries:
+        raise RequestError(f"At most {max_queries} queries per batch")
+    return BatchRequest(queries, data.get("k", 5), _filters(data))
+
+
+def split_batch(queries: List[Any]) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+    """
+    Pre-fill the results of empty queries.
+
+    Returns:
+        (results with errors for empty queries and None elsewhere, indices
+        of the queries to answer)
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    valid = []
+    for i, query in enumerate(queries):
+        if isinstance(query, str) and query.strip():
+            valid.append(i)
+        else:
+            results[i] = batch_error(query, "Query cannot be empty")
+    return results, valid
+
+
+@contextmanager
+def retrieval_errors() -> Iterator[None]:
+    """
+    Turn a ValueError raised by retrieval into a RequestError.
+
+    Retrieval rejects requests the index cannot serve, such as filters on
+    an index built without metadata partitions; that is the client's
+    request, not a server fault.
+    """
+    try:
+        yield
+    except ValueError as e:
+        raise RequestError(str(e)) from None
+
+
+def load_components(retriever: Any, generator: Any, cold_start: ColdStart) -> Tuple[Any, Any]:
+    """
+    Create whichever of the retriever and generator is still missing.
+
+    The retrieval and generation modules (FAISS, LangChain, OpenAI clients)
+    are imported here rather than at module load, so importing an app stays
+    cheap; their load time is recorded as part of the cold start.
+
+    Returns:
+        (retriever, generator)
+    """
+    with cold_start.phase("imports"):
+        from src.generation.generator import AnswerGenerator
+        from src.retrieval.retriever import DocumentRetriever
+
+    if retriever is None:
+        print("Initializing DocumentRetriever...")
+        with cold_start.phase("load_index"):
+            retriever = DocumentRetriever()
+        print("DocumentRetriever initialized")
+
+    if generator is None:
+        print("Initializing AnswerGenerator...")
+        with cold_start.phase("load_generator"):
+            generator = AnswerGenerator()
+        print("AnswerGenerator initialized")
+    return retriever, generator
+
+
+def ready_response(ready: bool, cold_start: ColdStart) -> Tuple[Dict[str, Any], int]:
+    """Body and status of `/api/ready`: 503 until the components are loaded."""
+    if not ready:
+        return {"status": "starting"}, 503
+    return {"status": "ready", "cold_start": cold_start.report()}, 200
+
+
+def _cacheable(answer_cache: SemanticAnswerCache, docs: Sequence) -> Optional[Tuple[List[float], List[str]]]:
+    """Query embedding and chunk IDs keying the answer, None if it cannot be cached."""
+    # Only the vector retrieval computed; BM25 matches are never embedded
+    embedding = getattr(docs, "query_embedding", None)
+    chunk_ids = answer_cache.chunk_ids(docs) if embedding is not None else None
+    return None if chunk_ids is None else (embedding, chunk_ids)
+
+
+def answer_without_llm(
+        answer_cache: SemanticAnswerCache,
+        retriever: Any,
+        docs: Sequence
+) -> Tuple[Optional[str], bool]:
+    """
+    Answer a question without the LLM where possible.
+
+    Returns:
+        (answer, from the answer cache): the "I don't know" answer when no
+        document is relevant enough, the answer of a similar question with
+        the same sources, or (None, False) when the LLM must answer
+    """
+    if not docs:
+        from src.generation.generator import FALLBACK_ANSWER
+        return FALLBACK_ANSWER, False
+
+    key = _cacheable(answer_cache, docs)
+    if key is None:
+        return None, False
+    with stage_timer("answer_cache"):
+        answer = answer_cache.get(*key, retriever.index_version)
+    return answer, answer is not None
+
+
+def remember_answer(answer_cache: SemanticAnswerCache, retriever: Any, docs: Sequence, answer: str) -> None:
+    """Store a generated answer for similar questions with the same sources."""
+    key = _cacheable(answer_cache, docs)
+    if key is not None:
+        answer_cache.put(*key, answer, retriever.index_version)
+
+
+def chat_response(
+        chat_request: ChatRequest,
+        docs: Sequence,
+        answer: str,
+        timings: Dict[str, float],
+        request_start: float,
+        coalesced: bool,
+        cached: bool
+) -> Dict[str, Any]:
+    """Body of a `/api/chat` response; debug requests add timings and cache flags."""
+    response = {
+        "query": chat_request.query,
+        "answer": answer,
+        "num_sources": len(docs),
+        **score_fields(docs)
+    }
+    if chat_request.debug:
+        response["timings"] = format_timings(timings, time.perf_counter() - request_start)
+        response["coalesced"] = coalesced
+        response["answer_cached"] = cached
+    return response
+
+
+def batch_item(query: str, docs: Sequence, answer: str) -> Dict[str, Any]:
+    """One answered item of a batch response."""
+    return {"query": query, "answer": answer, "num_sources": len(docs)}
+
+
+def batch_error(query: Any, error: Any) -> Dict[str, Any]:
+    """One failed item of a batch response; the others still get answered."""
+    return {"query": query, "error": str(error)}
+
+
+def batch_response(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Body of a `/api/chat/batch` response."""
+    return {
+        "results": results,
+        "num_errors": sum("error" in result for result in results)
+    }
+
+
+def server_error(e: Exception) -> Dict[str, str]:
+    """Body of a 500 response."""
+    return {
+        "error": "Internal server error",
+        "message": str(e)
+    }
@@ -0,0 +1,114 @@
+"""Single-flight coalescing: concurrent identical requests share one execution."""
+import asyncio
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from src.utils.text import normalize_text
+from src.monitoring.metrics import COALESCED_REQUESTS
+
+
+def chat_key(query: str, k: Any, filters: Optional[Dict[str, Any]]) -> tuple:
+    """Requests with the same key get the same answer (the LLM runs at temperature 0)."""
+    return normalize_text(query), k, json.dumps(filters, sort_keys=True, default=str)
+
+
+class _Call:
+    """One in-flight execution and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Thread-based single flight.
+
+    The first caller of a key runs the function; callers arriving while it
+    runs wait for it and receive the same result, or the same exception.
+    Nothing is cached: once the call finishes, the next caller runs it again.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize group.
+
+        Args:
+            name: Label of the coalesced-request metric
+        """
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run `fn` once for all concurrent callers of `key`.
+
+        Returns:
+            Tuple of (result, whether it was shared from another caller's run)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED_REQUESTS.labels(self.name).inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """
+    Asyncio single flight, for use from one event loop.
+
+    The shared work runs as its own task, so a caller that disconnects and
+    is cancelled does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize group.
+
+        Args:
+            name: Label of the coalesced-request metric
+        """
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await `fn()` once for all concurrent callers of `key`.
+
+        Returns:
+            Tuple of (result, whether it was shared from another caller's run)
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            COALESCED_REQUESTS.labels(self.name).inc()
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
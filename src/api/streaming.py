@@ -0,0 +1,63 @@
+"""Server-Sent Events framing shared by the Flask and async chat stream endpoints."""
+import json
+import time
+from typing import TYPE_CHECKING, List
+
+from src.monitoring.metrics import TIME_TO_FIRST_TOKEN
+from src.retrieval.relevance import score_fields
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop reverse proxies (nginx) from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def metadata_event(query: str, docs: List['Document']) -> str:
+    """First event of a stream: what was retrieved, before any token."""
+    return sse_event("metadata", {
+        "query": query,
+        "num_sources": len(docs),
+        "documents": [
+            {"source": doc.metadata.get("source", "unknown"), "title": doc.metadata.get("title", "")}
+            for doc in docs
+        ],
+        "cache_hit": getattr(docs, "cache_hit", False),
+        **score_fields(docs),
+    })
+
+
+class StreamTimer:
+    """Tracks time to first token and total time of one streamed answer."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ttft_ms = None
+
+    def token(self) -> None:
+        """Record a token; the first one fixes time to first token."""
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self.start) * 1000
+            TIME_TO_FIRST_TOKEN.observe(self.ttft_ms / 1000)
+            print(f"Time to first token: {self.ttft_ms:.0f} ms")
+
+    def done_event(self, answer: str) -> str:
+        """Final event: the full answer, its parsed sources and timings."""
+        # Imported here so that importing the app does not load the LLM client
+        from src.generation.generator import parse_sources
+
+        total_ms = (time.perf_counter() - self.start) * 1000
+        return sse_event("done", {
+            "answer": answer,
+            "sources": parse_sources(answer),
+            "ttft_ms": round(self.ttft_ms, 1) if self.ttft_ms is not None else None,
+            "total_ms": round(total_ms, 1),
+        })
@@ -0,0 +1,94 @@
+"""Start-up warm-up of the retriever and generator, and cold-start timing."""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+import psutil
+
+from src.config import get_warmup_llm
+from src.monitoring.metrics import COLD_START
+
+# Embedded once per deployment: later starts read it from the embedding cache
+WARMUP_QUERY = "Who won the first Formula One World Championship?"
+
+
+class ColdStart:
+    """Durations of the start-up phases of this process."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time one start-up phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Store a phase duration and export it as a gauge."""
+        self.phases[name] = seconds
+        COLD_START.labels(name).set(seconds)
+
+    def finish(self) -> None:
+        """Record the time from process start to ready, and print the breakdown."""
+        self.record("since_process_start", time.time() - psutil.Process().create_time())
+        print("Cold start: " + ", ".join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items()
+        ))
+
+    def report(self) -> Dict[str, float]:
+        """Phase durations in milliseconds, for a JSON response."""
+        return {f"{name}_ms": round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+
+
+def warm_components(retriever, generator, cold_start: ColdStart) -> None:
+    """
+    Run every component once so the first real request finds them warm.
+
+    Retrieval embeds and searches a fixed query, which opens the embedding
+    client's connection, pages in the index and loads the BM25 arrays.
+    Generation loads the tokenizer and, unless disabled, sends a 1-token LLM
+    request. Network failures are reported but do not stop the start-up.
+
+    Args:
+        retriever: Loaded `DocumentRetriever`
+        generator: Loaded `AnswerGenerator`
+        cold_start: Where the phase durations are recorded
+    """
+    with cold_start.phase("warm_retrieval"):
+        try:
+            retriever.retrieve(WARMUP_QUERY)
+        except Exception as e:
+            print(f"Retrieval warm-up failed: {e}")
+
+    with cold_start.phase("warm_generation"):
+        generator.assembler.count_tokens(WARMUP_QUERY)
+        if get_warmup_llm():
+            try:
+                generator.llm.invoke(WARMUP_QUERY, max_tokens=1)
+            except Exception as e:
+                print(f"LLM warm-up failed: {e}")
+
+    cold_start.finish()
+
+
+async def awarm_components(retriever, generator, cold_start: ColdStart) -> None:
+    """Async `warm_components`: warms the async clients the async app uses."""
+    with cold_start.phase("warm_retrieval"):
+        try:
+            await retriever.aretrieve(WARMUP_QUERY)
+        except Exception as e:
+            print(f"Retrieval warm-up failed: {e}")
+
+    with cold_start.phase("warm_generation"):
+        generator.assembler.count_tokens(WARMUP_QUERY)
+        if get_warmup_llm():
+            try:
+                await generator.llm.ainvoke(WARMUP_QUERY, max_tokens=1)
+            except Exception as e:
+                print(f"LLM warm-up failed: {e}")
+
+    cold_start.finish()
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import List, Optional
 
 # Project root directory
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -7,6 +8,71 @@ PROJECT_ROOT = Path(__file__).parent.parent
 # Path configurations
 DOCS_PATH = PROJECT_ROOT / os.getenv("DOCS_PATH", "docs")
 INDEX_PATH = PROJECT_ROOT / os.getenv("INDEX_PATH", "faiss_index")
+EMBEDDING_CACHE_PATH = PROJECT_ROOT / os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+PARSED_CORPUS_PATH = PROJECT_ROOT / os.getenv("PARSED_CORPUS_PATH", ".cache/parsed_corpus")
+
+# Embedding cache configuration
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# Retrieval cache configuration
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "3600"))
+
+# Approximate index search configuration (unset keeps the index defaults)
+SEARCH_NPROBE = os.getenv("SEARCH_NPROBE")
+SEARCH_EF_SEARCH = os.getenv("SEARCH_EF_SEARCH")
+
+# Retrieval strategy: "vector" (the default), "hybrid" (BM25 + vector) or "lexical" (BM25 only)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+LEXICAL_CONFIDENCE = float(os.getenv("LEXICAL_CONFIDENCE", "0.6"))
+
+# Opt-in relevance cutoffs on the cosine similarity of vector results (BM25
+# matches are not scored); when no chunk passes, /api/chat answers "I don't
+# know" without calling the LLM. 0.25, 0.75 and 0.1 suit text-embedding-3-small
+RELEVANCE_MIN_SCORE = os.getenv("RELEVANCE_MIN_SCORE")
+RELEVANCE_RELATIVE_SCORE = os.getenv("RELEVANCE_RELATIVE_SCORE")
+RELEVANCE_MAX_DROP = os.getenv("RELEVANCE_MAX_DROP")
+
+# Sharded search: fan vector searches out to one worker per index shard
+SHARDED_SEARCH = os.getenv("SHARDED_SEARCH", "false").lower() in ("1", "true", "yes")
+# Comma-separated host:port (or Unix socket path) of shard servers, in shard order;
+# unset starts a local worker process per shard
+SHARD_ADDRESSES = os.getenv("SHARD_ADDRESSES", "")
+SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "2.0"))
+# Shared secret of retrievers and shard servers; required to use shard servers
+SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY") or None
+# Searches in flight at once, each with its own connection to every shard
+SHARD_CONNECTIONS = int(os.getenv("SHARD_CONNECTIONS", "2"))
+
+# Token budget of the retrieved sources pasted into the prompt
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2500"))
+
+# Start-up: load the index and warm the API clients before serving traffic
+EAGER_WARMUP = os.getenv("EAGER_WARMUP", "false").lower() in ("1", "true", "yes")
+# Also send a 1-token LLM request during warm-up (opens the connection)
+WARMUP_LLM = os.getenv("WARMUP_LLM", "true").lower() in ("1", "true", "yes")
+
+# Concurrent identical /api/chat requests share one retrieval and generation
+COALESCE_CHAT_REQUESTS = os.getenv("COALESCE_CHAT_REQUESTS", "true").lower() in ("1", "true", "yes")
+
+# Semantic answer cache of /api/chat: similar questions with the same sources share an answer.
+# Off by default (0); set a size such as 256 to enable it
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "0"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+
+# OpenAI-compatible API endpoint (unset for api.openai.com), e.g. the offline
+# stub server of the load tests: http://localhost:8001/v1
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Connection pool shared by the OpenAI chat and embedding clients
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "16"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+# /api/chat/batch limits
+CHAT_BATCH_MAX_QUERIES = int(os.getenv("CHAT_BATCH_MAX_QUERIES", "256"))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
 
 
 def get_project_root() -> Path:
@@ -22,3 +88,153 @@ def get_docs_path() -> Path:
 def get_index_path() -> Path:
     """Get the FAISS index directory path."""
     return INDEX_PATH
+
+
+def get_embedding_cache_path() -> Path:
+    """Get the on-disk embedding cache file path."""
+    return EMBEDDING_CACHE_PATH
+
+
+def get_parsed_corpus_path() -> Path:
+    """Get the directory of the parsed-corpus artifact (cleaned page text and metadata)."""
+    return PARSED_CORPUS_PATH
+
+
+def get_embedding_cache_max_entries() -> int:
+    """Get the maximum number of vectors kept in the embedding cache."""
+    return EMBEDDING_CACHE_MAX_ENTRIES
+
+
+def get_retrieval_cache_size() -> int:
+    """Get the number of queries kept in the retriever's in-process caches."""
+    return RETRIEVAL_CACHE_SIZE
+
+
+def get_retrieval_cache_ttl() -> float:
+    """Get the retriever cache entry lifetime in seconds."""
+    return RETRIEVAL_CACHE_TTL
+
+
+def get_search_nprobe() -> Optional[int]:
+    """Get the number of IVF lists probed per query, if configured."""
+    return int(SEARCH_NPROBE) if SEARCH_NPROBE else None
+
+
+def get_search_ef_search() -> Optional[int]:
+    """Get the HNSW efSearch value, if configured."""
+    return int(SEARCH_EF_SEARCH) if SEARCH_EF_SEARCH else None
+
+
+def get_retrieval_mode() -> str:
+    """Get the retrieval strategy (vector, hybrid or lexical)."""
+    return RETRIEVAL_MODE
+
+
+def get_lexical_confidence() -> float:
+    """Get the BM25 confidence above which hybrid retrieval skips the vector search."""
+    return LEXICAL_CONFIDENCE
+
+
+def get_relevance_min_score() -> Optional[float]:
+    """Get the lowest cosine similarity a retrieved chunk may have, if configured."""
+    return float(RELEVANCE_MIN_SCORE) if RELEVANCE_MIN_SCORE else None
+
+
+def get_relevance_relative_score() -> Optional[float]:
+    """Get the lowest score of a retrieved chunk as a fraction of the best chunk's, if configured."""
+    return float(RELEVANCE_RELATIVE_SCORE) if RELEVANCE_RELATIVE_SCORE else None
+
+
+def get_relevance_max_drop() -> Optional[float]:
+    """Get the score drop between consecutive chunks at which retrieval stops adding chunks, if configured."""
+    return float(RELEVANCE_MAX_DROP) if RELEVANCE_MAX_DROP else None
+
+
+def get_sharded_search() -> bool:
+    """Get whether vector search is spread over the index shards, if the index has them."""
+    return SHARDED_SEARCH
+
+
+def get_shard_addresses() -> List[str]:
+    """Get the shard server addresses (empty: local shard workers)."""
+    return [address.strip() for address in SHARD_ADDRESSES.split(",") if address.strip()]
+
+
+def get_shard_timeout() -> float:
+    """Get the seconds a search waits for shards before leaving slow ones out."""
+    return SHARD_TIMEOUT
+
+
+def get_shard_authkey() -> Optional[bytes]:
+    """Get the shared secret between retrievers and shard servers, None if unset."""
+    return SHARD_AUTHKEY.encode("utf-8") if SHARD_AUTHKEY else None
+
+
+def get_shard_connections() -> int:
+    """Get the number of shard searches that may run at once."""
+    return SHARD_CONNECTIONS
+
+
+def get_chat_batch_max_queries() -> int:
+    """Get the maximum number of queries accepted by one batch request."""
+    return CHAT_BATCH_MAX_QUERIES
+
+
+def get_chat_batch_concurrency() -> int:
+    """Get the number of answers generated in parallel for a batch request."""
+    return CHAT_BATCH_CONCURRENCY
+
+
+def get_context_max_tokens() -> int:
+    """Get the token budget of the prompt context."""
+    return CONTEXT_MAX_TOKENS
+
+
+def get_eager_warmup() -> bool:
+    """Get whether the API warms up at start-up instead of on the first request."""
+    return EAGER_WARMUP
+
+
+def get_warmup_llm() -> bool:
+    """Get whether warm-up sends a 1-token request to the LLM."""
+    return WARMUP_LLM
+
+
+def get_coalesce_chat_requests() -> bool:
+    """Get whether identical in-flight /api/chat requests are coalesced."""
+    return COALESCE_CHAT_REQUESTS
+
+
+def get_answer_cache_size() -> int:
+    """Get the number of answers kept in the semantic answer cache (default 0: disabled)."""
+    return ANSWER_CACHE_SIZE
+
+
+def get_answer_cache_ttl() -> float:
+    """Get the answer cache entry lifetime in seconds."""
+    return ANSWER_CACHE_TTL
+
+
+def get_answer_cache_similarity() -> float:
+    """Get the query embedding cosine similarity at which a cached answer is reused."""
+    return ANSWER_CACHE_SIMILARITY
+
+
+def get_openai_base_url() -> Optional[str]:
+    """Get the base URL of the OpenAI-compatible API, if not the official one."""
+    return OPENAI_BASE_URL
+
+
+def get_http_max_connections() -> int:
+    """Get the maximum number of open connections to the OpenAI API."""
+    return HTTP_MAX_CONNECTIONS
+
+
+def get_http_max_keepalive_connections() -> int:
+    """Get the number of idle connections kept open for reuse."""
+    return HTTP_MAX_KEEPALIVE_CONNECTIONS
+
+
+def get_http_timeout() -> float:
+    """Get the OpenAI request timeout in seconds (also the wait for a free connection)."""
+    return HTTP_TIMEOUT
@@ -0,0 +1,225 @@
+"""Persistent on-disk cache for embedding vectors."""
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.monitoring.metrics import record_cache_lookups
+from src.utils.text import normalize_text
+
+
+def cache_model_name(model: str, base_url: Optional[str] = None) -> str:
+    """Name a model in cache keys; vectors from another endpoint than OpenAI's are kept apart."""
+    return f"{model}@{base_url}" if base_url else model
+
+
+def cache_key(model: str, text: str) -> str:
+    """Key a cache entry by embedding model and normalized text hash."""
+    payload = f"{model}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed vector store with LRU eviction and hit/miss counters."""
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        """
+        Initialize embedding cache.
+
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of vectors kept before the least
+                recently used ones are evicted
+        """
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        # Running row count, so inserts need no full-table COUNT(*); rows
+        # written by other processes are counted again on the next open
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Look up vectors by key, returning only the ones found."""
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        record_cache_lookups("embedding_store", len(found), len(set(keys)) - len(found))
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """Store vectors and evict the least recently used beyond the size cap."""
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            # Only new keys add rows; existing ones are overwritten
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            ).rowcount
+            if inserted < len(rows):
+                self._conn.executemany(
+                    "UPDATE embeddings SET vector = ?, last_used = ? WHERE key = ?",
+                    [(vector, last_used, key) for key, vector, last_used in rows]
+                )
+            self._count += inserted
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries above `max_entries`."""
+        excess = self._count - self.max_entries
+        if excess > 0:
+            deleted = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,)
+            ).rowcount
+            self._count -= deleted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": self._count}
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that reads through an `EmbeddingCache`."""
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache, model: str):
+        """
+        Initialize cached embeddings.
+
+        Args:
+            underlying: Embedding client called on cache misses
+            cache: Persistent vector cache
+            model: Embedding model name, part of every cache key
+        """
+        self.underlying = underlying
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, only sending cache misses to the underlying client."""
+        keys = [cache_key(self.model, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing a cached vector when available."""
+        key = cache_key(self.model, text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key]
+
+        vector = self.underlying.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async `embed_documents`; the SQLite cache is read and written in a worker thread."""
+        keys = [cache_key(self.model, text) for text in texts]
+        cached = await asyncio.to_thread(self.cache.get_many, keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = await self.underlying.aembed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self.cache.put_many, fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async `embed_query`."""
+        key = cache_key(self.model, text)
+        cached = await asyncio.to_thread(self.cache.get_many, [key])
+        if key in cached:
+            return cached[key]
+
+        vector = await self.underlying.aembed_query(text)
+        await asyncio.to_thread(self.cache.put_many, {key: vector})
+        return vector
+
+
+_shared_caches: Dict[str, EmbeddingCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache(path: str, max_entries: int) -> EmbeddingCache:
+    """Return the process-wide cache for a database file, opening it once."""
+    with _shared_lock:
+        cache: Optional[EmbeddingCache] = _shared_caches.get(str(path))
+        if cache is None:
+            cache = EmbeddingCache(path, max_entries=max_entries)
+            _shared_caches[str(path)] = cache
+        return cache
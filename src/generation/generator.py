@@ -1,14 +1,23 @@
 """LLM-based answer generation with RAG."""
 import os
-from typing import List
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
 
+import tiktoken
 from dotenv import load_dotenv
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 
+from src.config import get_context_max_tokens, get_http_timeout, get_openai_base_url
+from src.http_client import shared_async_http_client, shared_http_client
+from src.monitoring.metrics import CONTEXT_TOKENS, record_token_usage, stage_timer
+
 load_dotenv()
 
+FALLBACK_ANSWER = "I don't know based on the provided documents."
+
 # System prompt enforcing source-only responses
 SYSTEM_PROMPT = """You are an assistant for question-answering tasks.
 
@@ -32,13 +41,207 @@ Sources:
 Only list sources that were actually used to answer the question. Use the actual document filenames from the metadata."""
 
 
+_SOURCES_HEADER = re.compile(r"^\s*Sources:\s*$", re.MULTILINE)
+
+
+def parse_sources(answer: str) -> List[str]:
+    """
+    Extract the source filenames listed under the answer's "Sources:" header.
+
+    Args:
+        answer: Generated answer in the format requested by `SYSTEM_PROMPT`
+
+    Returns:
+        Source filenames in the order listed (empty if there is no list)
+    """
+    matches = list(_SOURCES_HEADER.finditer(answer))
+    if not matches:
+        return []
+
+    sources = []
+    for line in answer[matches[-1].end():].splitlines():
+        line = line.strip()
+        if line.startswith("-"):
+            sources.append(line.lstrip("- ").strip())
+        elif line:
+            break
+    return sources
+
+
+_CHUNK_POSITION = re.compile(r"-(\d+)$")
+
+# Shortest shared suffix/prefix (in characters) treated as chunk overlap
+MIN_OVERLAP_CHARS = 20
+
+# Approximate cost of a "[SOURCE n: ...]" / "Title:" / "Content:" header
+SOURCE_HEADER_TOKENS = 20
+
+
+def _chunk_position(doc: Document) -> Optional[int]:
+    """Position of a chunk within its page, from the stable chunk ID."""
+    match = _CHUNK_POSITION.search(doc.id or "")
+    return int(match.group(1)) if match else None
+
+
+def _shingles(text: str, size: int = 5) -> Set[Tuple[str, ...]]:
+    """Word n-grams used to detect near-duplicate passages."""
+    words = text.lower().split()
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+
+    start = left.find(probe)
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+@dataclass
+class _Passage:
+    """Contiguous text from one source, built from one or more chunks."""
+
+    text: str
+    rank: int
+    first: Optional[int]
+    last: Optional[int]
+
+
+@dataclass
+class _SourceSection:
+    """All passages taken from one source document."""
+
+    source: str
+    title: str
+    rank: int
+    passages: List[_Passage] = field(default_factory=list)
+
+
+class ContextAssembler:
+    """Turns ranked chunks into a compact, token-budgeted prompt context."""
+
+    def __init__(
+            self,
+            max_tokens: int = 2500,
+            duplicate_threshold: float = 0.8,
+            encoding_name: str = "cl100k_base"
+    ):
+        """
+        Initialize assembler.
+
+        Args:
+            max_tokens: Token budget of the assembled context
+            duplicate_threshold: Share of a passage's word 5-grams found in a
+                better-ranked passage above which it is dropped
+            encoding_name: tiktoken encoding used to count tokens
+        """
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def _drop_duplicates(self, docs: List[Document]) -> List[Tuple[int, Document]]:
+        """Keep (rank, doc) pairs whose text is not mostly in a better-ranked chunk."""
+        kept = []
+        seen: List[Set[Tuple[str, ...]]] = []
+        for rank, doc in enumerate(docs):
+            shingles = _shingles(doc.page_content)
+            if any(len(shingles & other) >= self.duplicate_threshold * len(shingles) for other in seen):
+                continue
+            kept.append((rank, doc))
+            seen.append(shingles)
+        return kept
+
+    def _merge(self, passages: List[_Passage]) -> List[_Passage]:
+        """Join passages of one source that are adjacent chunks or share overlapping text."""
+        passages = sorted(passages, key=lambda p: (p.first is None, p.first or 0, p.rank))
+        merged = [passages[0]]
+        for passage in passages[1:]:
+            previous = merged[-1]
+            overlap = _overlap(previous.text, passage.text)
+            adjacent = (
+                previous.last is not None and passage.first is not None
+                and passage.first <= previous.last + 1
+            )
+            if overlap or adjacent:
+                separator = "" if overlap else "\n"
+                previous.text += separator + passage.text[overlap:]
+                previous.rank = min(previous.rank, passage.rank)
+                if passage.last is not None:
+                    previous.last = passage.last if previous.last is None else max(previous.last, passage.last)
+            else:
+                merged.append(passage)
+        return merged
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in a text."""
+        return len(self.encoding.encode(text))
+
+    def assemble(self, docs: List[Document]) -> List[_SourceSection]:
+        """
+        Build the context sections for a list of retrieved chunks.
+
+        Near-duplicates are dropped, chunks of the same source are merged into
+        contiguous passages, and passages are taken best-ranked first until the
+        token budget is spent (the passage that crosses it is truncated).
+
+        Args:
+            docs: Retrieved chunks, most relevant first
+
+        Returns:
+            Source sections, most relevant first
+        """
+        sections: Dict[str, _SourceSection] = {}
+        for rank, doc in self._drop_duplicates(docs):
+            source = doc.metadata.get("source", "unknown")
+            section = sections.setdefault(
+                source, _SourceSection(source, doc.metadata.get("title", ""), rank)
+            )
+            position = _chunk_position(doc)
+            section.passages.append(_Passage(doc.page_content, rank, position, position))
+
+        candidates = []
+        for section in sections.values():
+            section.passages = self._merge(section.passages)
+            candidates.extend((passage.rank, section.source, passage) for passage in section.passages)
+
+        budget = self.max_tokens
+        selected: Dict[str, List[_Passage]] = {}
+        for _, source, passage in sorted(candidates, key=lambda c: c[0]):
+            # Each source's header is paid for once
+            header = 0 if source in selected else SOURCE_HEADER_TOKENS
+            cost = self.count_tokens(passage.text) + header
+            if cost > budget:
+                remaining = budget - header
+                if remaining > 0:
+                    tokens = self.encoding.encode(passage.text)[:remaining]
+                    passage.text = self.encoding.decode(tokens)
+                    selected.setdefault(source, []).append(passage)
+                break
+            budget -= cost
+            selected.setdefault(source, []).append(passage)
+
+        result = []
+        for source, passages in selected.items():
+            section = sections[source]
+            section.passages = sorted(passages, key=lambda p: (p.first is None, p.first or 0, p.rank))
+            result.append(section)
+        return sorted(result, key=lambda s: s.rank)
+
+
 class AnswerGenerator:
     """Generates answers using retrieved context and LLM."""
 
     def __init__(
             self,
             model: str = "gpt-4o-mini",
-            temperature: float = 0.0
+            temperature: float = 0.0,
+            max_context_tokens: Optional[int] = None
     ):
         """
         Initialize answer generator.
@@ -46,21 +249,36 @@ class AnswerGenerator:
         Args:
             model: OpenAI model name
             temperature: LLM temperature (0 for deterministic)
+            max_context_tokens: Token budget of the sources in the prompt
+                (defaults to config)
         """
         if not os.getenv("OPENAI_API_KEY"):
             raise ValueError("OPENAI_API_KEY environment variable not set")
 
         self.model = model
         self.temperature = temperature
+        self.assembler = ContextAssembler(
+            max_tokens=get_context_max_tokens() if max_context_tokens is None else max_context_tokens
+        )
         self.llm = ChatOpenAI(
             model=self.model,
-            temperature=self.temperature
+            temperature=self.temperature,
+            base_url=get_openai_base_url(),
+            # Report token usage on streamed responses too
+            stream_usage=True,
+            # One bounded, keep-alive pool per process instead of per client
+            http_client=shared_http_client(),
+            http_async_client=shared_async_http_client(),
+            timeout=get_http_timeout()
         )
 
     def _build_context(self, docs: List[Document]) -> str:
         """
         Format retrieved documents into context string.
 
+        Chunks are compacted by `ContextAssembler`: one header per source,
+        overlapping chunks merged, near-duplicates dropped, token budget kept.
+
         Args:
             docs: Retrieved documents
 
@@ -69,17 +287,19 @@ class AnswerGenerator:
         """
         formatted_sources = []
 
-        for i, doc in enumerate(docs):
-            source = doc.metadata.get("source", "unknown")
-            title = doc.metadata.get("title", "")
+        with stage_timer("build_context"):
+            sections = self.assembler.assemble(docs)
 
+        for i, section in enumerate(sections):
             # Extract just the filename from the path
+            source = section.source
             source_filename = source.split('/')[-1] if '/' in source else source
+            content = "\n[...]\n".join(passage.text for passage in section.passages)
 
             formatted_sources.append(
                 f"[SOURCE {i + 1}: {source_filename}]\n"
-                f"Title: {title}\n"
-                f"Content:\n{doc.page_content}\n"
+                f"Title: {section.title}\n"
+                f"Content:\n{content}\n"
             )
 
             # formatted_sources.append(
@@ -89,7 +309,9 @@ class AnswerGenerator:
             #     f"Content:\n{doc.page_content}"
             # )
 
-        return "\n\n".join(formatted_sources)
+        context = "\n\n".join(formatted_sources)
+        CONTEXT_TOKENS.observe(self.assembler.count_tokens(context))
+        return context
 
     def _build_prompt(self, query: str, docs: List[Document]) -> str:
         """
@@ -112,6 +334,13 @@ class AnswerGenerator:
 
         Remember to cite sources using the actual document filenames provided above."""
 
+    def _build_messages(self, query: str, docs: List[Document]) -> list:
+        """Chat messages for a query and its retrieved context."""
+        return [
+            SystemMessage(content=SYSTEM_PROMPT),
+            HumanMessage(content=self._build_prompt(query, docs))
+        ]
+
     def generate(self, query: str, docs: List[Document]) -> str:
         """
         Generate answer using LLM with retrieved context.
@@ -124,16 +353,70 @@ class AnswerGenerator:
             Generated answer with source attribution
         """
         if not docs:
-            return "I don't know based on the provided documents."
+            return FALLBACK_ANSWER
 
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=self._build_prompt(query, docs))
-        ]
+        messages = self._build_messages(query, docs)
+        with stage_timer("llm"):
+            response = self.llm.invoke(messages)
+        record_token_usage(getattr(response, "usage_metadata", None))
+        return response.content
+
+    async def agenerate(self, query: str, docs: List[Document]) -> str:
+        """
+        Async `generate`: awaits the LLM instead of blocking a thread on it.
 
-        response = self.llm.invoke(messages)
+        Args:
+            query: User's question
+            docs: Retrieved relevant documents
+
+        Returns:
+            Generated answer with source attribution
+        """
+        if not docs:
+            return FALLBACK_ANSWER
+
+        messages = self._build_messages(query, docs)
+        with stage_timer("llm"):
+            response = await self.llm.ainvoke(messages)
+        record_token_usage(getattr(response, "usage_metadata", None))
         return response.content
 
+    def stream(self, query: str, docs: List[Document]) -> Iterator[str]:
+        """
+        Generate an answer incrementally.
+
+        Args:
+            query: User's question
+            docs: Retrieved relevant documents
+
+        Yields:
+            Answer text fragments as the LLM produces them
+        """
+        if not docs:
+            yield FALLBACK_ANSWER
+            return
+
+        messages = self._build_messages(query, docs)
+        with stage_timer("llm"):
+            for chunk in self.llm.stream(messages):
+                # With stream_usage, the final chunk carries the token counts
+                record_token_usage(getattr(chunk, "usage_metadata", None))
+                if chunk.content:
+                    yield chunk.content
+
+    async def astream(self, query: str, docs: List[Document]) -> AsyncIterator[str]:
+        """Async `stream`."""
+        if not docs:
+            yield FALLBACK_ANSWER
+            return
+
+        messages = self._build_messages(query, docs)
+        with stage_timer("llm"):
+            async for chunk in self.llm.astream(messages):
+                record_token_usage(getattr(chunk, "usage_metadata", None))
+                if chunk.content:
+                    yield chunk.content
+
 
 if __name__ == "__main__":
     answer_generator = AnswerGenerator()
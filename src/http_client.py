@@ -0,0 +1,51 @@
+"""HTTP connection pools shared by every OpenAI client in the process."""
+import threading
+from typing import Optional
+
+import httpx
+
+from src.config import (
+    get_http_max_connections,
+    get_http_max_keepalive_connections,
+    get_http_timeout,
+)
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=get_http_max_connections(),
+        max_keepalive_connections=get_http_max_keepalive_connections(),
+        keepalive_expiry=30,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    # Requests wait up to the same timeout for a free pooled connection
+    return httpx.Timeout(get_http_timeout(), connect=10)
+
+
+def shared_http_client() -> httpx.Client:
+    """
+    Get the process-wide, bounded connection pool for sync OpenAI clients.
+
+    Passing it to every client keeps the number of connections to the API
+    bounded under bursts and reuses warm TLS connections across clients.
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(limits=_limits(), timeout=_timeout())
+        return _client
+
+
+def shared_async_http_client() -> httpx.AsyncClient:
+    """Get the process-wide, bounded connection pool for async OpenAI clients."""
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+        return _async_client
@@ -0,0 +1,162 @@
+"""Single-pass, section-aware token chunking."""
+import re
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import tiktoken
+from langchain_core.documents import Document
+
+_PARAGRAPH_BREAK = re.compile(rb"\n\n")
+_LINE_BREAK = re.compile(rb"\n")
+
+# First bytes of tokens that start a new word
+_WORD_START_BYTES = np.array([ord(" "), ord("\n")], dtype=np.uint8)
+
+
+@lru_cache(maxsize=None)
+def _token_byte_lengths(encoding_name: str) -> np.ndarray:
+    """Byte length of every token, so offsets need no per-token decoding."""
+    encoding = tiktoken.get_encoding(encoding_name)
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return lengths
+
+
+class SectionTokenChunker:
+    """
+    Cuts documents into token-bounded chunks along their section structure.
+
+    Each document is encoded once, and chunks are cut from token offsets.
+    A cut goes at a section heading if there is one late enough in the
+    chunk, else at a paragraph break, then a line break, then a word
+    boundary. Each chunk records the heading path of the section it starts
+    in, and overlap never reaches back across a heading.
+
+    Drop-in for the LangChain splitters: it has the same `split_documents`.
+    """
+
+    def __init__(
+            self,
+            chunk_size: int = 600,
+            chunk_overlap: int = 100,
+            encoding_name: str = "cl100k_base"
+    ):
+        """
+        Initialize chunker.
+
+        Args:
+            chunk_size: Maximum tokens per chunk
+            chunk_overlap: Tokens repeated from the end of the previous chunk
+            encoding_name: tiktoken encoding used to count tokens
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self._token_lengths = _token_byte_lengths(encoding_name)
+        # Shortest chunk (in tokens) worth ending early at each kind of boundary
+        self._min_fill = [chunk_size // 4, chunk_size // 2, chunk_size // 2, chunk_size // 2]
+
+    @staticmethod
+    def _section_spans(text: str, sections: List[List]) -> Tuple[List[int], List[List[str]]]:
+        """Byte offset and heading path of each section, the lead section first."""
+        offsets, paths = [0], [[]]
+        path: List[Tuple[int, str]] = []
+        char_offset = byte_offset = 0
+        for offset, level, heading in sections:
+            byte_offset += len(text[char_offset:offset].encode("utf-8"))
+            char_offset = offset
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, heading))
+            offsets.append(byte_offset)
+            paths.append([h for _, h in path])
+        return offsets, paths
+
+    def _cut(self, start: int, limit: int, boundaries: List[np.ndarray]) -> int:
+        """Latest boundary in (start + min fill, limit], trying coarser kinds first."""
+        for candidates, min_fill in zip(boundaries, self._min_fill):
+            i = int(np.searchsorted(candidates, limit, side="right")) - 1
+            if i >= 0 and candidates[i] > start + min_fill:
+                return int(candidates[i])
+        return limit
+
+    def split_document(self, doc: Document) -> List[Document]:
+        """
+        Split one document.
+
+        Args:
+            doc: Document whose `sections` metadata lists its headings as
+                [char offset, level, heading] (missing means no headings)
+
+        Returns:
+            Chunks carrying the document's metadata (minus `sections`) plus
+            `section_path`, the headings enclosing the chunk's start
+        """
+        text = doc.page_content
+        data = text.encode("utf-8")
+        tokens = np.array(self.encoding.encode(text, disallowed_special=()), dtype=np.int64)
+        if not len(tokens):
+            return []
+
+        # starts[i]: byte offset of token i; starts[-1]: end of the text
+        starts = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(self._token_lengths[tokens], out=starts[1:])
+        first_bytes = np.frombuffer(data, dtype=np.uint8)[starts[:-1]]
+
+        def token_at(byte_offsets: List[int]) -> np.ndarray:
+            return np.unique(np.searchsorted(starts, byte_offsets, side="left"))
+
+        section_offsets, section_paths = self._section_spans(text, doc.metadata.get("sections") or [])
+        section_starts = np.searchsorted(starts, section_offsets, side="left")
+        words = np.flatnonzero(np.isin(first_bytes, _WORD_START_BYTES))
+        boundaries = [
+            section_starts[1:],
+            token_at([m.end() for m in _PARAGRAPH_BREAK.finditer(data)]),
+            token_at([m.end() for m in _LINE_BREAK.finditer(data)]),
+            words,
+        ]
+        # Never cut inside a multi-byte character
+        char_starts = np.flatnonzero((first_bytes & 0xC0) != 0x80)
+
+        metadata = {key: value for key, value in doc.metadata.items() if key != "sections"}
+        chunks = []
+        start = 0
+        while start < len(tokens):
+            limit = start + self.chunk_size
+            if limit >= len(tokens):
+                end = len(tokens)
+            else:
+                end = self._cut(start, limit, boundaries)
+                i = int(np.searchsorted(char_starts, end, side="right")) - 1
+                if i >= 0 and char_starts[i] > start:
+                    end = int(char_starts[i])
+
+            content = data[starts[start]:starts[end]].decode("utf-8", errors="ignore").strip()
+            if content:
+                section = int(np.searchsorted(section_starts, start, side="right")) - 1
+                chunks.append(Document(
+                    page_content=content,
+                    metadata={**metadata, "section_path": section_paths[max(section, 0)]},
+                ))
+            if end >= len(tokens):
+                break
+
+            # Overlap from the first word boundary in range, but not back past a heading
+            floor = max(end - self.chunk_overlap, start + 1)
+            i = int(np.searchsorted(section_starts, end, side="right")) - 1
+            floor = max(floor, int(section_starts[i]))
+            i = int(np.searchsorted(words, floor, side="left"))
+            start = int(words[i]) if i < len(words) and words[i] < end else end
+        return chunks
+
+    def split_documents(self, docs: Iterable[Document]) -> List[Document]:
+        """Split documents, keeping document order."""
+        return [chunk for doc in docs for chunk in self.split_document(doc)]
@@ -0,0 +1,206 @@
+"""Token-budgeted, concurrent embedding with retries and checkpointing."""
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import List, Optional, Tuple, Type
+
+import numpy as np
+import openai
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+# Errors worth retrying: rate limits, timeouts and transient server failures
+RETRYABLE_ERRORS: Tuple[Type[BaseException], ...] = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+def pack_batches(
+        token_counts: List[int],
+        max_batch_tokens: int,
+        max_batch_size: int
+) -> List[List[int]]:
+    """
+    Greedily pack items into batches under a token and item budget.
+
+    Args:
+        token_counts: Token count of each item, in order
+        max_batch_tokens: Maximum total tokens per batch
+        max_batch_size: Maximum number of items per batch
+
+    Returns:
+        Batches as lists of item positions, preserving order
+    """
+    batches = []
+    current, current_tokens = [], 0
+
+    for i, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_batch_tokens
+                        or len(current) >= max_batch_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchEmbedder:
+    """Embeds texts in token-budgeted batches with bounded concurrency."""
+
+    def __init__(
+            self,
+            embeddings: Embeddings,
+            checkpoint_dir: Optional[str] = None,
+            namespace: str = "",
+            max_batch_tokens: int = 100_000,
+            max_batch_size: int = 2048,
+            max_concurrency: int = 4,
+            max_retries: int = 6,
+            initial_backoff: float = 1.0,
+            max_backoff: float = 60.0,
+            retry_on: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS,
+            encoding_name: str = "cl100k_base"
+    ):
+        """
+        Initialize batch embedder.
+
+        Args:
+            embeddings: Embedding client used for each batch
+            checkpoint_dir: Directory where finished batches are saved so an
+                interrupted run can resume (disabled if None)
+            namespace: Extra checkpoint key component, e.g. the model name
+            max_batch_tokens: Token budget per embedding request
+            max_batch_size: Maximum number of texts per embedding request
+            max_concurrency: Maximum number of requests in flight
+            max_retries: Attempts per batch before giving up
+            initial_backoff: First retry delay in seconds, doubled each retry
+            max_backoff: Upper bound on the retry delay in seconds
+            retry_on: Exception types that trigger a retry
+            encoding_name: tiktoken encoding used to count tokens
+        """
+        self.embeddings = embeddings
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        self.namespace = namespace
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+        # Progress across every `embed` call, e.g. the windows of a streamed run
+        self._progress_lock = threading.Lock()
+        self._done = 0
+        self._total = 0
+        self._started: Optional[float] = None
+
+    def _batch_key(self, texts: List[str]) -> str:
+        """Content-derived key identifying a batch across runs."""
+        digest = hashlib.sha256(self.namespace.encode("utf-8"))
+        for text in texts:
+            digest.update(b"\0")
+            digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _checkpoint_path(self, key: str) -> Optional[Path]:
+        return self.checkpoint_dir / f"{key}.npy" if self.checkpoint_dir else None
+
+    def _load_checkpoint(self, key: str) -> Optional[np.ndarray]:
+        path = self._checkpoint_path(key)
+        if path is None or not path.exists():
+            return None
+        return np.load(path)
+
+    def _save_checkpoint(self, key: str, vectors: np.ndarray) -> None:
+        path = self._checkpoint_path(key)
+        if path is None:
+            return
+
+        # Write then rename so a crash never leaves a truncated batch behind
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp_path, path)
+
+    def _embed_with_retry(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch, backing off exponentially on retryable errors."""
+        delay = self.initial_backoff
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            except self.retry_on as e:
+                if attempt == self.max_retries:
+                    raise
+                sleep_for = min(delay, self.max_backoff) * (0.5 + random.random() / 2)
+                print(f"Embedding batch failed ({e.__class__.__name__}), "
+                      f"retrying in {sleep_for:.1f}s (attempt {attempt}/{self.max_retries})")
+                time.sleep(sleep_for)
+                delay *= 2
+
+    def _report_progress(self, count: int) -> None:
+        with self._progress_lock:
+            self._done += count
+            elapsed = max(time.perf_counter() - self._started, 1e-9)
+            print(f"Embedded {self._done}/{self._total} chunks "
+                  f"({self._done / elapsed:.1f} chunks/s)")
+
+    def _run_batch(self, texts: List[str]) -> np.ndarray:
+        key = self._batch_key(texts)
+        vectors = self._load_checkpoint(key)
+        if vectors is None:
+            vectors = self._embed_with_retry(texts)
+            self._save_checkpoint(key, vectors)
+        self._report_progress(len(texts))
+        return vectors
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, resuming from any checkpointed batches.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), dim), in input order
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        if self.checkpoint_dir:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+        token_counts = [
+            len(tokens) for tokens in
+            self.encoding.encode_ordinary_batch(texts, num_threads=self.max_concurrency)
+        ]
+        batches = pack_batches(token_counts, self.max_batch_tokens, self.max_batch_size)
+
+        with self._progress_lock:
+            self._total += len(texts)
+            if self._started is None:
+                self._started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [
+                executor.submit(self._run_batch, [texts[i] for i in batch])
+                for batch in batches
+            ]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise future.exception()
+
+        return np.concatenate([future.result() for future in futures])
@@ -0,0 +1,176 @@
+"""Fast, parallel loading of Wikipedia HTML pages."""
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+from lxml import html as lxml_html
+
+from src.ingestion.metadata import extract_metadata, parse_infobox
+
+
+# Wikipedia chrome that carries no article content: navigation boxes,
+# reference lists, edit links, sidebars, maintenance banners, etc.
+BOILERPLATE_TAGS = frozenset({"script", "style", "noscript"})
+BOILERPLATE_CLASSES = frozenset({
+    "navbox", "navbox-styles", "vertical-navbox", "sidebar", "sistersitebox",
+    "reflist", "references", "mw-references-wrap", "reference",
+    "mw-editsection", "hatnote", "ambox", "metadata", "noprint",
+    "catlinks", "printfooter", "mw-jump-link",
+})
+BOILERPLATE_IDS = frozenset({"toc"})
+
+_EXCESS_NEWLINES = re.compile(r"\n\s*\n(\s*\n)+")
+_TRAILING_SPACES = re.compile(r"[ \t]+\n")
+
+
+def _clean_text(text: str) -> str:
+    """Collapse whitespace left behind by removed markup."""
+    text = _TRAILING_SPACES.sub("\n", text)
+    text = _EXCESS_NEWLINES.sub("\n\n", text)
+    return text.strip()
+
+
+def _is_boilerplate(el) -> bool:
+    """Check whether an element is page chrome rather than article content."""
+    if not isinstance(el.tag, str):
+        return False
+    if el.tag in BOILERPLATE_TAGS or el.get("id") in BOILERPLATE_IDS:
+        return True
+    classes = el.get("class")
+    return bool(classes) and not BOILERPLATE_CLASSES.isdisjoint(classes.split())
+
+
+def _locate_sections(root, text: str) -> List[List]:
+    """
+    Find the section headings of a page in its cleaned text.
+
+    Args:
+        root: Article body, with boilerplate (edit links) already dropped
+        text: Cleaned text of `root`
+
+    Returns:
+        [char offset, level, heading] per heading found, in page order
+    """
+    sections = []
+    position = 0
+    # Prefixed so that a heading opening the text is found too
+    padded = "\n" + text
+    for el in root.iter("h2", "h3", "h4", "h5", "h6"):
+        heading = " ".join(el.text_content().split())
+        if not heading:
+            continue
+        # Headings are paragraphs of their own in the cleaned text
+        offset = padded.find(f"\n{heading}\n", position)
+        if offset == -1:
+            continue
+        sections.append([offset, int(el.tag[1]), heading])
+        position = offset + 1
+    return sections
+
+
+def parse_html_file(path: str) -> Document:
+    """
+    Parse a single Wikipedia HTML page into a Document.
+
+    Only the article body is kept; boilerplate is dropped during the parse.
+
+    Args:
+        path: Path to the HTML file
+
+    Returns:
+        Document with `source` and `title` metadata, the `year`,
+        `category` and `entities` extracted from the title and infobox, and
+        the `sections` headings used by the section-aware chunker
+    """
+    with open(path, "rb") as f:
+        tree = lxml_html.fromstring(f.read())
+
+    title_el = tree.find(".//title")
+    title = title_el.text_content().strip() if title_el is not None else ""
+
+    content = tree.xpath("//div[@id='mw-content-text']")
+    root = content[0] if content else tree
+
+    for el in [el for el in root.iter() if _is_boilerplate(el)]:
+        el.drop_tree()
+
+    text = _clean_text(root.text_content())
+    return Document(
+        page_content=text,
+        metadata={
+            "source": str(path),
+            "title": title,
+            **extract_metadata(title, str(path), parse_infobox(root)),
+            "sections": _locate_sections(root, text),
+        }
+    )
+
+
+class ParallelHTMLLoader(BaseLoader):
+    """Loads HTML files from a directory, parsing them across a process pool."""
+
+    def __init__(
+            self,
+            path: str,
+            glob: str = "*.html",
+            recursive: bool = True,
+            max_workers: Optional[int] = None,
+            file_paths: Optional[List[str]] = None,
+            max_pending: Optional[int] = None
+    ):
+        """
+        Initialize the loader.
+
+        Args:
+            path: Directory containing HTML files
+            glob: Filename pattern to match
+            recursive: Whether to descend into subdirectories
+            max_workers: Number of parser processes (defaults to CPU count)
+            file_paths: Explicit files to load instead of scanning the directory
+            max_pending: Maximum parsed-but-unconsumed files held in memory
+                (defaults to twice the worker count)
+        """
+        self.path = path
+        self.glob = glob
+        self.recursive = recursive
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.file_paths = file_paths
+        self.max_pending = max_pending or 2 * self.max_workers
+
+    def file_paths_to_load(self) -> List[str]:
+        """List files to load in a stable order."""
+        if self.file_paths is not None:
+            return sorted(self.file_paths)
+
+        root = Path(self.path)
+        matches = root.rglob(self.glob) if self.recursive else root.glob(self.glob)
+        return sorted(str(p) for p in matches if p.is_file())
+
+    def lazy_load(self) -> Iterator[Document]:
+        """
+        Yield parsed documents in file order.
+
+        At most `max_pending` files are parsed ahead of the consumer, so a
+        slow downstream stage holds back parsing instead of piling up
+        documents in memory.
+        """
+        paths = self.file_paths_to_load()
+
+        if self.max_workers == 1 or len(paths) <= 1:
+            for path in paths:
+                yield parse_html_file(path)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for path in paths:
+                if len(pending) >= self.max_pending:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(parse_html_file, path))
+            while pending:
+                yield pending.popleft().result()
@@ -1,17 +1,53 @@
 import os
-from typing import List
+import queue
+import shutil
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 from dotenv import load_dotenv
-from langchain_community.document_loaders import BSHTMLLoader, DirectoryLoader
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from src.config import get_docs_path, get_index_path
+from src.config import (
+    get_docs_path,
+    get_embedding_cache_max_entries,
+    get_embedding_cache_path,
+    get_index_path,
+    get_openai_base_url,
+    get_parsed_corpus_path,
+)
+from src.embeddings.cache import CachedEmbeddings, cache_model_name, get_embedding_cache
+from src.ingestion.chunker import SectionTokenChunker
+from src.ingestion.embedding_pipeline import BatchEmbedder
+from src.ingestion.html_loader import ParallelHTMLLoader
+from src.ingestion.manifest import IngestionManifest, make_chunk_id
+from src.ingestion.parsed_corpus import ParsedCorpus, ParsedCorpusLoader
+from src.ingestion.metadata import METADATA_VERSION
+from src.retrieval.bm25 import BM25Index
+from src.retrieval.partitions import MetadataPartitions
+from src.storage.index_types import (
+    build_index,
+    reconstruct_all,
+    resolve_index_params,
+    supports_removal,
+)
+from src.storage.mmap_store import is_mmap_index, load_faiss, save_mmap_index
+from src.storage.shards import remove_shards, write_shards
 
 load_dotenv()
 
+# "section": single-pass, section-aware; "recursive": LangChain's recursive splitter
+CHUNKERS = ("section", "recursive")
+
+# Seconds a blocked producer waits on the window queue before checking for a stop
+WINDOW_PUT_TIMEOUT = 0.1
+
 
 class DocumentIngestion:
     """Handles document loading, chunking, and FAISS index creation."""
@@ -22,7 +58,18 @@ class DocumentIngestion:
             index_path: str = None,
             chunk_size: int = 600,
             chunk_overlap: int = 100,
-            embedding_model: str = "text-embedding-3-small"
+            embedding_model: str = "text-embedding-3-small",
+            num_workers: Optional[int] = None,
+            embedding_batch_tokens: int = 100_000,
+            embedding_concurrency: int = 4,
+            window_size: int = 512,
+            max_pending_windows: int = 2,
+            index_type: str = "flat",
+            index_params: Optional[Dict[str, Any]] = None,
+            chunker: str = "section",
+            num_shards: int = 1,
+            parsed_corpus_path: Optional[str] = None,
+            reparse: bool = False
     ):
         """
         Initialize document ingestion pipeline.
@@ -33,7 +80,27 @@ class DocumentIngestion:
             chunk_size: Token size for text chunks
             chunk_overlap: Token overlap between chunks
             embedding_model: OpenAI embedding model name
+            num_workers: Number of HTML parser processes (defaults to CPU count)
+            embedding_batch_tokens: Token budget per embedding request
+            embedding_concurrency: Maximum embedding requests in flight
+            window_size: Chunks embedded and added to the index per window
+            max_pending_windows: Windows parsed ahead of the embedding stage
+            index_type: FAISS index to build: "flat" (exact), "ivf_flat",
+                "hnsw" or "ivf_pq"
+            index_params: Build parameters for the index type (nlist, M,
+                ef_construction, pq_m, pq_nbits)
+            chunker: "section" (cut at headings, chunks carry their
+                `section_path`) or "recursive" (LangChain's splitter)
+            num_shards: Also split the index into this many shards, searched
+                in parallel by shard workers (1: no shards)
+            parsed_corpus_path: Directory of the parsed-corpus artifact, from
+                which unchanged pages are read instead of parsed (defaults to config)
+            reparse: Parse every page again and rewrite the artifact
         """
+        if num_shards < 1:
+            raise ValueError(f"num_shards must be at least 1, got {num_shards}")
+        if chunker not in CHUNKERS:
+            raise ValueError(f"Unknown chunker {chunker!r}, expected one of {CHUNKERS}")
 
         # Use config defaults if not provided
         self.docs_path = str(docs_path) if docs_path else str(get_docs_path())
@@ -41,72 +108,488 @@ class DocumentIngestion:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.embedding_model = embedding_model
+        self.num_workers = num_workers
+        self.embedding_batch_tokens = embedding_batch_tokens
+        self.embedding_concurrency = embedding_concurrency
+        self.window_size = window_size
+        self.max_pending_windows = max_pending_windows
+        self.index_type = index_type
+        self.index_params = resolve_index_params(index_type, index_params)
+        self.chunker = chunker
+        self.num_shards = num_shards
+        self.parsed_corpus_path = str(parsed_corpus_path) if parsed_corpus_path else str(get_parsed_corpus_path())
+        self.reparse = reparse
+        self.checkpoint_dir = os.path.join(self.index_path, "embedding_checkpoint")
 
         # Validate OpenAI API key
         if not os.getenv("OPENAI_API_KEY"):
             raise ValueError("OPENAI_API_KEY environment variable not set")
 
-    def load_documents(self) -> List[Document]:
-        """Load HTML documents from the docs directory."""
-        print(f"Loading documents from {self.docs_path}...")
+    def _loader(
+            self,
+            file_paths: Optional[List[str]] = None,
+            fingerprints: Optional[Dict[str, Dict]] = None
+    ) -> ParsedCorpusLoader:
+        """
+        Build the loader for the docs directory, reusing earlier parses of unchanged pages.
 
-        loader = DirectoryLoader(
-            self.docs_path,
-            glob="*.html",
-            loader_cls=BSHTMLLoader,
-            loader_kwargs={"open_encoding": "utf-8"},
-            recursive=True,
-            show_progress=True,
+        Args:
+            file_paths: Only load these files (defaults to the whole directory)
+            fingerprints: Manifest fingerprints of the files, keyed by file
+                key, so the parsed-corpus artifact does not hash them again
+        """
+        corpus = ParsedCorpus(self.parsed_corpus_path, {
+            os.path.join(self.docs_path, key): fingerprint
+            for key, fingerprint in (fingerprints or {}).items()
+        })
+        if self.reparse:
+            corpus.entries = {}
+        return ParsedCorpusLoader(
+            ParallelHTMLLoader(
+                self.docs_path,
+                glob="*.html",
+                recursive=True,
+                max_workers=self.num_workers,
+                file_paths=file_paths,
+            ),
+            corpus,
         )
-        docs = loader.load()
-        print(f"Loaded {len(docs)} documents")
-        return docs
 
-    def chunk_documents(self, docs: List[Document]) -> List[Document]:
+    def _settings(self) -> Dict:
+        """Settings that must match for an index to be updated in place."""
+        return {
+            # Vectors of another endpoint (e.g. the stub server) are not interchangeable
+            "embedding_model": cache_model_name(self.embedding_model, get_openai_base_url()),
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "chunker": self.chunker,
+            "index_type": self.index_type,
+            "index_params": self.index_params,
+            "num_shards": self.num_shards,
+            "metadata_version": METADATA_VERSION,
+        }
+
+    def _file_key(self, source: str) -> str:
+        """Key a source file by its path relative to the docs directory."""
+        return os.path.relpath(source, self.docs_path)
+
+    def _embeddings(self) -> Embeddings:
+        """Build the embedding client used for chunk vectors, read through the on-disk cache."""
+        cache = get_embedding_cache(
+            get_embedding_cache_path(), get_embedding_cache_max_entries()
+        )
+        return CachedEmbeddings(
+            OpenAIEmbeddings(model=self.embedding_model, base_url=get_openai_base_url()),
+            cache,
+            cache_model_name(self.embedding_model, get_openai_base_url())
+        )
+
+    def _report_cache_stats(self, embeddings: Embeddings) -> None:
+        """Print embedding cache hit/miss counters, if a cache is in use."""
+        if isinstance(embeddings, CachedEmbeddings):
+            stats = embeddings.cache.stats()
+            print(
+                f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['entries']} entries"
+            )
+
+    def load_documents(self, file_paths: Optional[List[str]] = None) -> List[Document]:
         """
-        Split documents into chunks using tiktoken tokenizer.
+        Load HTML documents from the docs directory.
 
-        Uses RecursiveCharacterTextSplitter with cl100k_base encoding
-        to ensure chunks respect token boundaries.
+        Pages are parsed in parallel with lxml, and Wikipedia boilerplate
+        (navboxes, reference lists, edit links, sidebars) is dropped. Pages
+        unchanged since an earlier run are read from the parsed-corpus
+        artifact instead.
+
+        Args:
+            file_paths: Only load these files (defaults to the whole directory)
         """
-        print("Chunking documents...")
+        print(f"Loading documents from {self.docs_path}...")
+
+        docs = self._loader(file_paths).load()
+        print(f"Loaded {len(docs)} documents")
+        return docs
 
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+    def _text_splitter(self) -> Union[SectionTokenChunker, RecursiveCharacterTextSplitter]:
+        """Build the token-aware text splitter."""
+        if self.chunker == "section":
+            return SectionTokenChunker(self.chunk_size, self.chunk_overlap)
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
             encoding_name="cl100k_base",
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             separators=["\n\n", "\n", " ", ""]
         )
 
-        chunks = text_splitter.split_documents(docs)
+    def iter_chunks(self, docs: Iterable[Document]) -> Iterator[Document]:
+        """
+        Lazily split documents into chunks, one document at a time.
+
+        Each chunk gets a stable ID derived from its source file and position,
+        which lets incremental runs delete a file's vectors later.
+        """
+        text_splitter = self._text_splitter()
+
+        for doc in docs:
+            file_key = self._file_key(doc.metadata["source"])
+            for position, chunk in enumerate(text_splitter.split_documents([doc])):
+                # Heading offsets only mean something within the whole page
+                chunk.metadata.pop("sections", None)
+                chunk.id = make_chunk_id(file_key, position)
+                yield chunk
+
+    def chunk_documents(self, docs: List[Document]) -> List[Document]:
+        """
+        Split documents into chunks using tiktoken tokenizer.
+
+        Chunk sizes are counted in cl100k_base tokens, so chunks respect
+        token boundaries whichever chunker is used.
+        """
+        print("Chunking documents...")
+
+        chunks = list(self.iter_chunks(docs))
+
         print(f"Created {len(chunks)} chunks")
         return chunks
 
+    def _batch_embedder(self, embeddings: Embeddings) -> BatchEmbedder:
+        """Build the batch embedder of one run; its progress counts every chunk of the run."""
+        return BatchEmbedder(
+            embeddings,
+            checkpoint_dir=self.checkpoint_dir,
+            # Vectors from another endpoint must not resume from these checkpoints
+            namespace=cache_model_name(self.embedding_model, get_openai_base_url()),
+            max_batch_tokens=self.embedding_batch_tokens,
+            max_concurrency=self.embedding_concurrency,
+        )
+
+    def embed_chunks(
+            self,
+            chunks: List[Document],
+            embeddings: Embeddings,
+            embedder: Optional[BatchEmbedder] = None
+    ) -> np.ndarray:
+        """
+        Embed chunk texts in token-budgeted, concurrent batches.
+
+        Finished batches are checkpointed under the index directory, so an
+        interrupted run resumes without re-embedding them.
+
+        Args:
+            chunks: Chunks to embed
+            embeddings: Embedding client
+            embedder: Batch embedder of the run (a new one if None)
+
+        Returns:
+            float32 array with one vector per chunk
+        """
+        embedder = embedder or self._batch_embedder(embeddings)
+        return embedder.embed([chunk.page_content for chunk in chunks])
+
+    def _add_chunks(
+            self,
+            vectorstore: Optional[FAISS],
+            chunks: List[Document],
+            embeddings: Embeddings,
+            embedder: Optional[BatchEmbedder] = None
+    ) -> Optional[FAISS]:
+        """Embed chunks and add them to a vector store, creating it if needed."""
+        if not chunks:
+            return vectorstore
+
+        vectors = self.embed_chunks(chunks, embeddings, embedder)
+        text_embeddings = zip([chunk.page_content for chunk in chunks], vectors)
+        metadatas = [chunk.metadata for chunk in chunks]
+        ids = [chunk.id for chunk in chunks]
+
+        if vectorstore is None:
+            return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+
+        vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        return vectorstore
+
     def create_index(self, chunks: List[Document]) -> FAISS:
         """Create FAISS vector index from document chunks."""
         print("Creating FAISS index...")
 
-        embeddings = OpenAIEmbeddings(model=self.embedding_model)
-        vectorstore = FAISS.from_documents(chunks, embeddings)
+        embeddings = self._embeddings()
+        vectorstore = self._add_chunks(None, chunks, embeddings)
+        self.convert_index(vectorstore)
+        self._report_cache_stats(embeddings)
 
         print(f"FAISS index created with {len(chunks)} vectors")
         return vectorstore
 
+    def convert_index(self, vectorstore: FAISS) -> None:
+        """
+        Replace the exact index built during streaming with the configured type.
+
+        Approximate indexes need all vectors up front to train, so streaming
+        always fills a flat index and it is converted once at the end.
+        """
+        if self.index_type == "flat":
+            return
+
+        print(f"Building {self.index_type} index with {self.index_params}...")
+        vectorstore.index = build_index(
+            self.index_type, reconstruct_all(vectorstore.index), self.index_params
+        )
+
     def save_index(self, vectorstore: FAISS) -> None:
-        """Save FAISS index to disk."""
-        vectorstore.save_local(self.index_path)
+        """
+        Save FAISS index to disk.
+
+        Uses the pickle-free mmap format: the FAISS index file plus columnar,
+        offset-indexed chunk text and metadata files that the retriever maps
+        into memory instead of reading into the heap. A BM25 inverted index
+        and the metadata partitions used by filters are saved alongside.
+        """
+        save_mmap_index(vectorstore, self.index_path)
+
+        # Lexical index and metadata partitions over the same chunks, in vector order
+        docs = [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+            for i in range(len(vectorstore.index_to_docstore_id))
+        ]
+        BM25Index.build(doc.page_content for doc in docs).save(self.index_path)
+        MetadataPartitions.build(doc.metadata for doc in docs).save(self.index_path)
         print(f"Index saved to {self.index_path}")
 
-    def run_ingestion(self) -> None:
-        """Run the complete ingestion pipeline."""
+    def save_shards(self, vectors: Optional[np.ndarray]) -> None:
+        """
+        Save the index split into shards, or drop stale shards when unsharded.
+
+        Args:
+            vectors: Every vector in position order, from the exact index
+                (None when unsharded)
+        """
+        if self.num_shards > 1:
+            write_shards(self.index_path, vectors, self.index_type, self.index_params, self.num_shards)
+        else:
+            remove_shards(self.index_path)
+
+    def _shard_vectors(self, vectorstore: FAISS) -> Optional[np.ndarray]:
+        """Read the vectors to shard out of the exact index, before it is converted."""
+        return reconstruct_all(vectorstore.index) if self.num_shards > 1 else None
+
+    def load_index(self) -> FAISS:
+        """Load the saved index as a writable FAISS store."""
+        if is_mmap_index(self.index_path):
+            return load_faiss(self.index_path, self._embeddings())
+
+        # Indexes saved before the mmap format still use LangChain's pickle
+        return FAISS.load_local(
+            self.index_path,
+            self._embeddings(),
+            allow_dangerous_deserialization=True
+        )
+
+    def _windows(self, chunks: Iterable[Document]) -> Iterator[List[Document]]:
+        """Group a chunk stream into fixed-size windows."""
+        window = []
+        for chunk in chunks:
+            window.append(chunk)
+            if len(window) >= self.window_size:
+                yield window
+                window = []
+        if window:
+            yield window
+
+    def _produce_windows(
+            self,
+            file_paths: List[str],
+            fingerprints: Optional[Dict[str, Dict]],
+            windows: queue.Queue,
+            stop: threading.Event
+    ) -> None:
+        """
+        Parse and chunk files into windows on a background thread.
+
+        Ends with None, or with the exception that stopped it. Returns early
+        once `stop` is set, so a failed consumer never leaves it blocked on
+        the full queue.
+        """
+        def put(item) -> bool:
+            # Blocks while the embedding stage is behind (backpressure)
+            while not stop.is_set():
+                try:
+                    windows.put(item, timeout=WINDOW_PUT_TIMEOUT)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            docs = self._loader(file_paths, fingerprints).lazy_load()
+            for window in self._windows(self.iter_chunks(docs)):
+                if not put(window):
+                    return
+        except BaseException as e:
+            put(e)
+        else:
+            put(None)
+
+    def stream_into_index(
+            self,
+            file_paths: List[str],
+            vectorstore: Optional[FAISS] = None,
+            embeddings: Optional[Embeddings] = None,
+            fingerprints: Optional[Dict[str, Dict]] = None
+    ) -> Tuple[Optional[FAISS], Dict[str, List[str]]]:
+        """
+        Stream files through parse -> chunk -> embed -> add in fixed-size windows.
+
+        Parsing and chunking run ahead of embedding by at most
+        `max_pending_windows` windows, so the text in flight between the
+        parse and embed stages is bounded by the window size. Peak memory is
+        not: the docstore and the index grow with the corpus, and so does
+        the document list `save_index` builds from them.
+
+        Args:
+            file_paths: Files to ingest
+            vectorstore: Existing store to add to (created on the first window if None)
+            embeddings: Embedding client (defaults to the store's or a new one)
+            fingerprints: Output of `IngestionManifest.scan` for the files,
+                so they are not hashed again while parsing
+
+        Returns:
+            Tuple of (vector store, chunk IDs added per file key)
+        """
+        if embeddings is None:
+            embeddings = vectorstore.embeddings if vectorstore else self._embeddings()
+        # One embedder for all windows, so progress covers the whole run
+        embedder = self._batch_embedder(embeddings)
+
+        windows = queue.Queue(maxsize=self.max_pending_windows)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce_windows, args=(file_paths, fingerprints, windows, stop), daemon=True
+        )
+        producer.start()
+
+        chunk_ids = defaultdict(list)
+        total = 0
+        try:
+            while True:
+                window = windows.get()
+                if window is None:
+                    break
+                if isinstance(window, BaseException):
+                    raise window
+
+                vectorstore = self._add_chunks(vectorstore, window, embeddings, embedder)
+                for chunk in window:
+                    chunk_ids[self._file_key(chunk.metadata["source"])].append(chunk.id)
+                total += len(window)
+                print(f"Indexed {total} chunks")
+        finally:
+            # Also when embedding failed: release the producer instead of
+            # leaving it blocked on the full queue
+            stop.set()
+            producer.join()
+        self._report_cache_stats(embeddings)
+        return vectorstore, chunk_ids
+
+    def _build_manifest(
+            self,
+            fingerprints: Dict[str, Dict],
+            chunk_ids: Dict[str, List[str]],
+            manifest: Optional[IngestionManifest] = None
+    ) -> IngestionManifest:
+        """Record file fingerprints and their chunk IDs in a manifest."""
+        manifest = manifest or IngestionManifest(self._settings())
+
+        for key, fingerprint in fingerprints.items():
+            manifest.files[key] = {**fingerprint, "chunk_ids": chunk_ids.get(key, [])}
+        return manifest
+
+    def _rebuild(self) -> None:
+        """Stream the whole corpus into a fresh index."""
+        file_paths = self._loader().file_paths_to_load()
+        fingerprints = IngestionManifest(self._settings()).scan(self.docs_path, file_paths)
+
+        print(f"Streaming {len(file_paths)} documents from {self.docs_path}...")
+        vectorstore, chunk_ids = self.stream_into_index(file_paths, fingerprints=fingerprints)
+        if vectorstore is None:
+            raise ValueError(f"No chunks produced from {self.docs_path}")
+
+        shard_vectors = self._shard_vectors(vectorstore)
+        self.convert_index(vectorstore)
+        self.save_index(vectorstore)
+        self.save_shards(shard_vectors)
+        self._build_manifest(fingerprints, chunk_ids).save(self.index_path)
+
+    def _update(self, manifest: IngestionManifest) -> None:
+        """Re-embed only added or changed files and drop removed ones."""
+        file_paths = self._loader().file_paths_to_load()
+        current = manifest.scan(self.docs_path, file_paths)
+        added, changed, removed = manifest.diff(current)
+        refreshed = manifest.refresh(current)
+
+        print(f"Files added: {len(added)}, changed: {len(changed)}, removed: {len(removed)}")
+        if not (added or changed or removed):
+            if refreshed:
+                manifest.save(self.index_path)
+            print("Index is up to date")
+            return
+
+        if self.num_shards > 1 and self.index_type != "flat":
+            # Shards are built from exact vectors, which approximate indexes do not keep
+            print(f"Sharded {self.index_type} index cannot be updated in place, rebuilding the full index")
+            self._rebuild()
+            return
+
+        vectorstore = self.load_index()
+
+        stale_ids = manifest.stale_chunk_ids(changed + removed)
+        if stale_ids and not supports_removal(vectorstore.index):
+            print(f"{self.index_type} index cannot delete vectors in place, rebuilding the full index")
+            self._rebuild()
+            return
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+            print(f"Deleted {len(stale_ids)} stale vectors")
+        for key in removed:
+            del manifest.files[key]
+
+        to_load = added + changed
+        # Hashed once by the scan; parsing and the manifest reuse the digests
+        fingerprints = {key: current[key] for key in to_load}
+        vectorstore, chunk_ids = self.stream_into_index(
+            [os.path.join(self.docs_path, key) for key in to_load], vectorstore, fingerprints=fingerprints
+        )
+        print(f"Added {sum(len(ids) for ids in chunk_ids.values())} vectors")
+
+        self.save_index(vectorstore)
+        self.save_shards(self._shard_vectors(vectorstore))
+        self._build_manifest(fingerprints, chunk_ids, manifest).save(self.index_path)
+
+    def run_ingestion(self, incremental: bool = False) -> None:
+        """
+        Run the complete ingestion pipeline.
+
+        Args:
+            incremental: Update the existing index in place using its
+                manifest, falling back to a full rebuild when there is no
+                compatible manifest
+        """
         print("=" * 60)
         print("Starting document ingestion pipeline")
         print("=" * 60)
 
-        docs = self.load_documents()
-        chunks = self.chunk_documents(docs)
-        vectorstore = self.create_index(chunks)
-        self.save_index(vectorstore)
+        manifest = IngestionManifest.load(self.index_path) if incremental else None
+        index_exists = (Path(self.index_path) / "index.faiss").exists()
+
+        if manifest and index_exists and manifest.settings == self._settings():
+            self._update(manifest)
+        else:
+            if incremental:
+                print("No compatible manifest found, rebuilding the full index")
+            self._rebuild()
+
+        # Vectors are safely in the saved index now
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
 
         print("=" * 60)
         print("Ingestion complete!")
@@ -0,0 +1,146 @@
+"""Content-hash manifest used for incremental ingestion."""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    """Compute the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(file_key: str, position: int) -> str:
+    """
+    Build a stable chunk ID from a file key and the chunk's position in it.
+
+    Args:
+        file_key: Path of the source file relative to the docs directory
+        position: Index of the chunk within the file
+
+    Returns:
+        ID that is identical across runs for the same file and position
+    """
+    prefix = hashlib.sha1(file_key.encode("utf-8")).hexdigest()[:16]
+    return f"{prefix}-{position:05d}"
+
+
+class IngestionManifest:
+    """Tracks per-file content hashes and chunk IDs stored in the index."""
+
+    def __init__(self, settings: Dict, files: Optional[Dict[str, Dict]] = None):
+        """
+        Initialize manifest.
+
+        Args:
+            settings: Ingestion settings the index was built with
+            files: Mapping of file key to its `sha256`, `size`, `mtime_ns`
+                and `chunk_ids`
+        """
+        self.settings = settings
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional['IngestionManifest']:
+        """Load the manifest stored next to an index, if there is one."""
+        path = Path(index_path) / MANIFEST_FILENAME
+        if not path.exists():
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["settings"], data["files"])
+
+    def save(self, index_path: str) -> None:
+        """Write the manifest next to the index."""
+        path = Path(index_path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = path / f"{MANIFEST_FILENAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "files": self.files}, f, indent=1)
+        os.replace(tmp_path, path / MANIFEST_FILENAME)
+
+    def scan(self, docs_path: str, file_paths: List[str]) -> Dict[str, Dict]:
+        """
+        Fingerprint files on disk.
+
+        Hashes are reused from the manifest when size and mtime are unchanged,
+        so only touched files are read.
+
+        Args:
+            docs_path: Root documents directory
+            file_paths: Files to fingerprint
+
+        Returns:
+            Mapping of file key to `sha256`, `size` and `mtime_ns`
+        """
+        current = {}
+        for file_path in file_paths:
+            key = os.path.relpath(file_path, docs_path)
+            stat = os.stat(file_path)
+            previous = self.files.get(key)
+
+            if (previous and previous["size"] == stat.st_size
+                    and previous["mtime_ns"] == stat.st_mtime_ns):
+                sha256 = previous["sha256"]
+            else:
+                sha256 = file_sha256(file_path)
+
+            current[key] = {
+                "sha256": sha256,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        return current
+
+    def diff(self, current: Dict[str, Dict]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Compare fingerprints on disk against the manifest.
+
+        Args:
+            current: Output of `scan`
+
+        Returns:
+            Tuple of (added, changed, removed) file keys
+        """
+        added = sorted(key for key in current if key not in self.files)
+        changed = sorted(
+            key for key in current
+            if key in self.files and current[key]["sha256"] != self.files[key]["sha256"]
+        )
+        removed = sorted(key for key in self.files if key not in current)
+        return added, changed, removed
+
+    def refresh(self, current: Dict[str, Dict]) -> int:
+        """
+        Record the new size and mtime of files touched without changing.
+
+        Otherwise their stale stat would make every later scan hash them again.
+
+        Args:
+            current: Output of `scan`
+
+        Returns:
+            Number of entries refreshed
+        """
+        refreshed = 0
+        for key, fingerprint in current.items():
+            entry = self.files.get(key)
+            if entry is None or entry["sha256"] != fingerprint["sha256"]:
+                continue
+            if entry["size"] != fingerprint["size"] or entry["mtime_ns"] != fingerprint["mtime_ns"]:
+                entry.update(size=fingerprint["size"], mtime_ns=fingerprint["mtime_ns"])
+                refreshed += 1
+        return refreshed
+
+    def stale_chunk_ids(self, keys: List[str]) -> List[str]:
+        """Collect the chunk IDs currently indexed for the given files."""
+        return [chunk_id for key in keys for chunk_id in self.files.get(key, {}).get("chunk_ids", [])]
@@ -0,0 +1,108 @@
+"""Structured metadata (year, category, entities) extracted from Wikipedia pages."""
+import re
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Bump when the extraction rules change, so existing indexes are rebuilt
+METADATA_VERSION = 1
+
+CATEGORIES = ("season", "race", "circuit", "team", "driver", "person", "car", "engine", "other")
+
+# Infobox rows whose linked names are worth filtering on
+ENTITY_LABELS = frozenset({
+    "Driver", "Constructor", "Constructors", "Location", "Engine", "Engines", "Manufacturer",
+    "Founder(s)", "Base", "Noted drivers", "Notable drivers", "Designer(s)",
+    "Team", "Teams", "Drivers' Championships", "Constructors' Championships",
+})
+MAX_ENTITIES = 25
+
+_WIKIPEDIA_SUFFIX = re.compile(r"\s+-\s+Wikipedia$")
+_LEADING_YEAR = re.compile(r"^((?:19|20)\d{2})\b")
+_SEASON = re.compile(r"^(?:19|20)\d{2} Formula One (?:season|World Championship)$")
+_DRIVER_LABELS = frozenset({"Races entered", "Entries", "Active years", "Wins", "Podiums", "Career points"})
+_RACE_WORDS = re.compile(r"\b(?:Grand Prix|Trophy|Cup|Coppa|Gran Premio|500)\b")
+
+
+def parse_infobox(root) -> Dict[str, Any]:
+    """
+    Read the label/value rows of a page's first infobox.
+
+    Args:
+        root: lxml element containing the article body
+
+    Returns:
+        Mapping of row label to {"text": str, "links": [str, ...]}
+    """
+    tables = root.xpath(".//table[contains(concat(' ', @class, ' '), ' infobox ')]")
+    if not tables:
+        return {}
+
+    rows = {}
+    for row in tables[0].iter("tr"):
+        label = row.find("th")
+        value = row.find("td")
+        if label is None or value is None:
+            continue
+        rows[" ".join(label.text_content().split())] = {
+            "text": " ".join(value.text_content().split()),
+            "links": [
+                " ".join(a.text_content().split())
+                for a in value.iter("a") if a.text_content().strip()
+            ],
+        }
+    return rows
+
+
+def page_name(title: str, source: str) -> str:
+    """Article name from the HTML title, falling back to the file name."""
+    name = _WIKIPEDIA_SUFFIX.sub("", title).strip()
+    return name or Path(source).stem
+
+
+def classify(name: str, infobox: Dict[str, Any]) -> str:
+    """Assign a page to one of `CATEGORIES` from its name and infobox labels."""
+    labels = set(infobox)
+    if _SEASON.match(name):
+        return "season"
+    if _RACE_WORDS.search(name) and (_LEADING_YEAR.match(name) or "Date" in labels):
+        return "race"
+    if labels & {"Turns", "Race lap record"}:
+        return "circuit"
+    if labels & {"Suspension (front)", "Wheelbase", "Axle track"}:
+        return "car"
+    if labels & {"Base", "Founder(s)", "Noted drivers", "Notable drivers"}:
+        return "team"
+    if "Born" in labels:
+        return "driver" if labels & _DRIVER_LABELS else "person"
+    if "engine" in name.lower() or labels & {"Configuration", "Displacement"}:
+        return "engine"
+    return "other"
+
+
+def extract_metadata(title: str, source: str, infobox: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the structured metadata of a page.
+
+    Args:
+        title: HTML <title> of the page
+        source: Path of the HTML file
+        infobox: Rows returned by `parse_infobox`
+
+    Returns:
+        Dict with "category", "entities" and, for dated pages, "year"
+    """
+    name = page_name(title, source)
+    metadata: Dict[str, Any] = {"category": classify(name, infobox)}
+
+    year = _LEADING_YEAR.match(name)
+    if year:
+        metadata["year"] = int(year.group(1))
+
+    entities: List[str] = [name]
+    for label, row in infobox.items():
+        if label in ENTITY_LABELS:
+            entities.extend(row["links"] or [row["text"]])
+    # Skip values that are numbers or coordinates rather than names
+    names = (e for e in entities if any(c.isalpha() for c in e) and "°" not in e)
+    metadata["entities"] = list(dict.fromkeys(names))[:MAX_ENTITIES]
+    return metadata
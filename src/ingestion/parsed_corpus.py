@@ -0,0 +1,211 @@
+"""
+Parsed-corpus artifact: the cleaned text and metadata of every parsed page.
+
+Parsing the HTML corpus is the slowest CPU stage of ingestion, and its output
+does not depend on the chunking settings. The artifact keeps that output so
+later runs, e.g. chunking experiments, only parse files that were added or
+changed since.
+
+Layout:
+
+* `documents.jsonl`: one JSON document per line, {"page_content", "metadata"}.
+  Lines are only ever appended; a re-parsed file gets a new line
+* `index.json`: absolute file path -> byte offset and length of its current
+  line, plus the `size`, `mtime_ns` and `sha256` of the file it was parsed from
+"""
+import copy
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+from src.ingestion.html_loader import ParallelHTMLLoader
+from src.ingestion.manifest import file_sha256
+from src.ingestion.metadata import METADATA_VERSION
+
+DOCUMENTS_FILENAME = "documents.jsonl"
+INDEX_FILENAME = "index.json"
+
+# Bump when HTML cleaning or section detection changes, so pages are re-parsed
+PARSER_VERSION = 1
+
+# Rewrite the documents file once superseded lines outweigh current ones
+COMPACT_RATIO = 0.5
+
+
+class ParsedCorpus:
+    """Append-only store of parsed documents, keyed by file path and fingerprint."""
+
+    def __init__(self, path: str, fingerprints: Optional[Dict[str, Dict]] = None):
+        """
+        Open (or start) an artifact directory.
+
+        Entries written by another parser or metadata version are ignored.
+
+        Args:
+            path: Artifact directory
+            fingerprints: `sha256`, `size` and `mtime_ns` of files already
+                hashed by the caller, keyed by file path; reused while the
+                file's size and mtime still match instead of hashing it again
+        """
+        self.path = Path(path)
+        self.fingerprints = {self.key(p): fp for p, fp in (fingerprints or {}).items()}
+        self.documents_path = self.path / DOCUMENTS_FILENAME
+        self.version = {"parser_version": PARSER_VERSION, "metadata_version": METADATA_VERSION}
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+
+        index_path = self.path / INDEX_FILENAME
+        if index_path.exists() and self.documents_path.exists():
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.version:
+                self.entries = data["entries"]
+
+    @staticmethod
+    def key(file_path: str) -> str:
+        """Key a file by its absolute path."""
+        return os.path.abspath(file_path)
+
+    def _sha256(self, file_path: str, stat: os.stat_result) -> str:
+        """Hash a file, or reuse its known digest if taken at the same size and mtime."""
+        known = self.fingerprints.get(self.key(file_path))
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+        return file_sha256(file_path)
+
+    def lookup(self, file_path: str) -> Optional[Dict]:
+        """
+        Find the entry of a file if it was parsed from the same contents.
+
+        Size and mtime are compared first; the file is only hashed when they
+        differ, and a matching hash refreshes them.
+
+        Returns:
+            The entry, or None if the file must be parsed
+        """
+        entry = self.entries.get(self.key(file_path))
+        if entry is None:
+            return None
+
+        stat = os.stat(file_path)
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry
+        if self._sha256(file_path, stat) != entry["sha256"]:
+            return None
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        return entry
+
+    def read(self, file_path: str, entry: Dict, f) -> Document:
+        """Read the document of a file at its entry's offset in the open documents file."""
+        f.seek(entry["offset"])
+        data = json.loads(f.read(entry["length"]))
+        # The same file may be reached through another relative path than when parsed
+        return Document(page_content=data["page_content"], metadata={**data["metadata"], "source": file_path})
+
+    def append(self, file_path: str, doc: Document, f) -> None:
+        """Append a parsed document to the open documents file and index it."""
+        line = json.dumps(
+            {"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False
+        ).encode("utf-8") + b"\n"
+        stat = os.stat(file_path)
+        self.entries[self.key(file_path)] = {
+            "offset": f.tell(),
+            "length": len(line),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": self._sha256(file_path, stat),
+        }
+        f.write(line)
+
+    def load(self, file_paths: List[str], parse: ParallelHTMLLoader) -> Iterator[Document]:
+        """
+        Yield documents in file order, parsing only files missing from the artifact.
+
+        Missing files are parsed by `parse` (restricted to them) while stored
+        ones are read back, and new documents are appended as they arrive.
+        The index is saved when the iteration finishes.
+
+        Args:
+            file_paths: Files to load, in order
+            parse: Loader used for the files that have to be parsed
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not self.entries:
+            # Nothing indexed: start from an empty file instead of appending to stale lines
+            self.documents_path.write_bytes(b"")
+
+        stored = {path: self.lookup(path) for path in file_paths}
+        parse = copy.copy(parse)
+        parse.file_paths = [path for path in file_paths if stored[path] is None]
+        parsed = parse.lazy_load()
+
+        try:
+            with open(self.documents_path, "rb") as reader, open(self.documents_path, "ab") as writer:
+                for path in file_paths:
+                    if stored[path] is not None:
+                        self.hits += 1
+                        yield self.read(path, stored[path], reader)
+                        continue
+
+                    self.misses += 1
+                    doc = next(parsed)
+                    self.append(path, doc, writer)
+                    # Lines reach the reader's view of the file once flushed
+                    writer.flush()
+                    yield doc
+        finally:
+            # Also keeps what was parsed when the consumer stops early
+            self.save()
+        print(f"Parsed corpus: {self.hits} pages reused, {self.misses} parsed")
+
+    def save(self) -> None:
+        """Write the index, compacting the documents file first if it is mostly superseded lines."""
+        live = sum(entry["length"] for entry in self.entries.values())
+        if self.documents_path.stat().st_size * COMPACT_RATIO > live:
+            self.compact()
+
+        tmp_path = self.path / f"{INDEX_FILENAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "entries": self.entries}, f)
+        os.replace(tmp_path, self.path / INDEX_FILENAME)
+
+    def compact(self) -> None:
+        """Rewrite the documents file with only the current line of each existing file."""
+        self.entries = {key: entry for key, entry in self.entries.items() if os.path.exists(key)}
+
+        tmp_path = self.path / f"{DOCUMENTS_FILENAME}.tmp"
+        with open(self.documents_path, "rb") as reader, open(tmp_path, "wb") as writer:
+            for entry in sorted(self.entries.values(), key=lambda e: e["offset"]):
+                reader.seek(entry["offset"])
+                line = reader.read(entry["length"])
+                entry["offset"] = writer.tell()
+                writer.write(line)
+        os.replace(tmp_path, self.documents_path)
+
+
+class ParsedCorpusLoader(BaseLoader):
+    """HTML loader that goes through a `ParsedCorpus`, parsing only new or changed files."""
+
+    def __init__(self, loader: ParallelHTMLLoader, corpus: ParsedCorpus):
+        """
+        Initialize the loader.
+
+        Args:
+            loader: HTML loader selecting and parsing the files
+            corpus: Artifact holding earlier parses
+        """
+        self.loader = loader
+        self.corpus = corpus
+
+    def file_paths_to_load(self) -> List[str]:
+        """List files to load in a stable order."""
+        return self.loader.file_paths_to_load()
+
+    def lazy_load(self) -> Iterator[Document]:
+        """Yield documents in file order."""
+        return self.corpus.load(self.file_paths_to_load(), self.loader)
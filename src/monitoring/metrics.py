@@ -0,0 +1,108 @@
+"""Prometheus metrics and per-request stage timings."""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Sub-millisecond cache and FAISS lookups up to multi-second LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds", "Time spent in each pipeline stage", ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "rag_http_requests_total", "HTTP requests by endpoint and status", ["endpoint", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "rag_http_request_duration_seconds", "HTTP request latency (to response headers)", ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "rag_time_to_first_token_seconds", "Streamed answers: request start to first token",
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("rag_llm_tokens_total", "LLM tokens used", ["kind"])
+CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens", "Tokens of retrieved context put into the prompt",
+    buckets=(100, 250, 500, 1000, 1500, 2000, 2500, 3000, 4000, 6000, 8000),
+)
+CHUNKS_RETRIEVED = Histogram(
+    "rag_chunks_retrieved", "Chunks returned per retrieval", buckets=(0, 1, 2, 3, 5, 8, 10, 15, 20, 50),
+)
+RETRIEVALS = Counter("rag_retrievals_total", "Retrievals by the strategy that answered them", ["strategy"])
+CACHE_LOOKUPS = Counter("rag_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+COALESCED_REQUESTS = Counter(
+    "rag_coalesced_requests_total", "Requests answered by joining an identical in-flight request", ["group"]
+)
+SHARD_FAILURES = Counter(
+    "rag_shard_failures_total", "Shard searches left out of a result, by shard and reason", ["shard", "reason"]
+)
+COLD_START = Gauge("rag_cold_start_seconds", "Duration of each start-up phase of this process", ["phase"])
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Time a pipeline stage into `STAGE_LATENCY`.
+
+    Inside `collect_timings`, the duration is also added to that request's
+    breakdown.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed * 1000
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """Collect the stage durations (ms) of the current request into a dict."""
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def format_timings(timings: Dict[str, float], total_seconds: float) -> Dict[str, float]:
+    """Rounded per-stage breakdown for a JSON response, in milliseconds."""
+    breakdown = {f"{stage}_ms": round(ms, 2) for stage, ms in timings.items()}
+    breakdown["total_ms"] = round(total_seconds * 1000, 2)
+    return breakdown
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int) -> None:
+    """Count cache hits and misses."""
+    if hits:
+        CACHE_LOOKUPS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, "miss").inc(misses)
+
+
+def record_token_usage(usage: Optional[dict]) -> None:
+    """Count prompt and completion tokens from a LangChain `usage_metadata` dict."""
+    if usage:
+        LLM_TOKENS.labels("prompt").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels("completion").inc(usage.get("output_tokens", 0))
+
+
+def observe_request(endpoint: str, status: int, seconds: float) -> None:
+    """Count an HTTP request and record its latency."""
+    REQUESTS.labels(endpoint, str(status)).inc()
+    REQUEST_LATENCY.labels(endpoint).observe(seconds)
+
+
+def render_metrics():
+    """Prometheus exposition of all metrics, as (body, content type)."""
+    return generate_latest(), CONTENT_TYPE_LATEST
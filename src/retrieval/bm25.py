@@ -0,0 +1,195 @@
+"""Compact BM25 inverted index over chunk texts."""
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+TERMS_FILENAME = "bm25.terms.json"
+TERM_OFFSETS_FILENAME = "bm25.term_offsets.npy"
+POSTING_DOCS_FILENAME = "bm25.posting_docs.npy"
+POSTING_TFS_FILENAME = "bm25.posting_tfs.npy"
+DOC_LENGTHS_FILENAME = "bm25.doc_lengths.npy"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be but by did do does for from had has have how i in is it its
+of on or was were what when where which who whom why will with the that this to
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-folded word tokens without stopwords."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in _TOKEN.findall(text) if t not in STOPWORDS]
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    """Save an array through a temporary name; readers may have the old file memory-mapped."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class BM25Index:
+    """Okapi BM25 over chunk positions, stored as flat posting arrays."""
+
+    def __init__(
+            self,
+            terms: List[str],
+            term_offsets: np.ndarray,
+            posting_docs: np.ndarray,
+            posting_tfs: np.ndarray,
+            doc_lengths: np.ndarray,
+            k1: float = 1.5,
+            b: float = 0.75
+    ):
+        """
+        Initialize index from its posting arrays.
+
+        Args:
+            terms: Sorted vocabulary
+            term_offsets: Start of each term's postings (len(terms) + 1 entries)
+            posting_docs: Chunk position of every posting
+            posting_tfs: Term frequency of every posting
+            doc_lengths: Token count of every chunk
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+        """
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.term_offsets = term_offsets
+        self.posting_docs = posting_docs
+        self.posting_tfs = posting_tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> 'BM25Index':
+        """Build an index over texts, one document per chunk position."""
+        postings = defaultdict(list)
+        doc_lengths = []
+
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((position, tf))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            term_offsets[i + 1] = term_offsets[i] + len(postings[term])
+
+        posting_docs = np.empty(term_offsets[-1], dtype=np.int32)
+        posting_tfs = np.empty(term_offsets[-1], dtype=np.int32)
+        for i, term in enumerate(terms):
+            entries = np.array(postings[term], dtype=np.int32).reshape(-1, 2)
+            posting_docs[term_offsets[i]:term_offsets[i + 1]] = entries[:, 0]
+            posting_tfs[term_offsets[i]:term_offsets[i + 1]] = entries[:, 1]
+
+        return cls(terms, term_offsets, posting_docs, posting_tfs,
+                   np.array(doc_lengths, dtype=np.int32))
+
+    def save(self, path: str) -> None:
+        """Persist the index next to the FAISS index."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        terms = sorted(self.term_ids, key=self.term_ids.get)
+        with open(path / TERMS_FILENAME, "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        _save_array(path / TERM_OFFSETS_FILENAME, self.term_offsets)
+        _save_array(path / POSTING_DOCS_FILENAME, self.posting_docs)
+        _save_array(path / POSTING_TFS_FILENAME, self.posting_tfs)
+        _save_array(path / DOC_LENGTHS_FILENAME, self.doc_lengths)
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        """Load an index, memory-mapping the posting arrays."""
+        path = Path(path)
+        with open(path / TERMS_FILENAME, "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        return cls(
+            terms,
+            np.load(path / TERM_OFFSETS_FILENAME, mmap_mode="r"),
+            np.load(path / POSTING_DOCS_FILENAME, mmap_mode="r"),
+            np.load(path / POSTING_TFS_FILENAME, mmap_mode="r"),
+            np.load(path / DOC_LENGTHS_FILENAME),
+        )
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Check whether a directory holds a saved BM25 index."""
+        return (Path(path) / TERMS_FILENAME).exists()
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def search(
+            self,
+            query: str,
+            k: int,
+            allowed: Optional[np.ndarray] = None
+    ) -> Tuple[List[Tuple[int, float]], float]:
+        """
+        Score chunks against a query.
+
+        Args:
+            query: Query text
+            k: Number of results
+            allowed: Only score these chunk positions (None for all)
+
+        Returns:
+            Tuple of ([(chunk position, score), ...] best first, confidence).
+            Confidence is 0 unless the top chunk contains every query term;
+            otherwise it is the IDF of the rarest query term relative to a
+            term found in a single chunk, so lookups of rare names score
+            high and queries made of common words score low.
+        """
+        unique_terms = set(tokenize(query))
+        query_terms = [t for t in unique_terms if t in self.term_ids]
+        if not query_terms or not self.num_docs:
+            return [], 0.0
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        matched = np.zeros(self.num_docs, dtype=np.int32)
+        max_idf = 0.0
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_doc_length, 1e-9))
+
+        for term in query_terms:
+            i = self.term_ids[term]
+            start, end = self.term_offsets[i], self.term_offsets[i + 1]
+            docs = np.asarray(self.posting_docs[start:end])
+            tfs = np.asarray(self.posting_tfs[start:end], dtype=np.float32)
+
+            idf = self._idf(end - start)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+            matched[docs] += 1
+            max_idf = max(max_idf, idf)
+
+        if allowed is not None:
+            mask = np.zeros(self.num_docs, dtype=bool)
+            mask[allowed] = True
+            scores[~mask] = 0
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return [], 0.0
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results = [(int(position), float(scores[position])) for position in top]
+        all_terms_matched = matched[top[0]] == len(unique_terms)
+        confidence = max_idf / self._idf(1) if all_terms_matched else 0.0
+        return results, confidence
@@ -0,0 +1,72 @@
+"""In-process LRU cache with per-entry expiry."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from src.monitoring.metrics import record_cache_lookups
+
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None, name: Optional[str] = None):
+        """
+        Initialize cache.
+
+        Args:
+            max_size: Maximum number of entries before the least recently
+                used one is evicted (0 disables the cache)
+            ttl: Seconds an entry stays valid (None for no expiry)
+            name: Label of the cache's hit/miss metrics (None to not export)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if self.name:
+                        record_cache_lookups(self.name, 1, 0)
+                    return value
+                del self._entries[key]
+
+            self.misses += 1
+            if self.name:
+                record_cache_lookups(self.name, 0, 1)
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
@@ -0,0 +1,156 @@
+"""Metadata partitions: chunk positions grouped by year, category and entity."""
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+KEYS_FILENAME = "partitions.keys.json"
+OFFSETS_FILENAME = "partitions.offsets.npy"
+POSITIONS_FILENAME = "partitions.positions.npy"
+
+# Filter name -> chunk metadata field it matches
+FILTER_FIELDS = {"year": "year", "category": "category", "entity": "entities"}
+
+
+def _partition_key(name: str, value: Any) -> str:
+    """Canonical key of one filter value, e.g. "entity=lewis hamilton"."""
+    if name == "year":
+        return f"year={int(value)}"
+    return f"{name}={str(value).strip().casefold()}"
+
+
+def validate_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, List[Any]]]:
+    """
+    Check a filter spec and normalize every value to a list.
+
+    Args:
+        filters: e.g. {"year": 1954, "category": ["race", "season"]}
+
+    Returns:
+        Filters with list values, or None when no filter is given
+
+    Raises:
+        ValueError: On unknown filter names or unusable values
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must be an object")
+
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown filters {sorted(unknown)}, expected some of {sorted(FILTER_FIELDS)}")
+
+    normalized = {}
+    for name, values in filters.items():
+        values = values if isinstance(values, list) else [values]
+        if not values:
+            raise ValueError(f"Filter {name!r} has no values")
+        if name == "year" and not all(str(v).isdigit() for v in values):
+            raise ValueError("Year filter values must be integers")
+        normalized[name] = values
+    return normalized
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    """Save an array through a temporary name; readers may have the old file memory-mapped."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class MetadataPartitions:
+    """Sorted chunk positions for every (filter, value) pair, stored as flat arrays."""
+
+    def __init__(self, keys: List[str], offsets: np.ndarray, positions: np.ndarray):
+        """
+        Initialize partitions from their arrays.
+
+        Args:
+            keys: Partition keys, as built by `_partition_key`
+            offsets: Start of each key's positions (len(keys) + 1 entries)
+            positions: Chunk positions of all partitions, each run sorted
+        """
+        self.key_ids = {key: i for i, key in enumerate(keys)}
+        self.offsets = offsets
+        self.positions = positions
+
+    @classmethod
+    def build(cls, metadatas: Iterable[Dict[str, Any]]) -> 'MetadataPartitions':
+        """Group chunk positions by metadata value, one metadata dict per chunk position."""
+        partitions = defaultdict(list)
+        for position, metadata in enumerate(metadatas):
+            for name, field in FILTER_FIELDS.items():
+                values = metadata.get(field)
+                if values is None:
+                    continue
+                for value in values if isinstance(values, list) else [values]:
+                    partitions[_partition_key(name, value)].append(position)
+
+        keys = sorted(partitions)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        for i, key in enumerate(keys):
+            # An entity can appear twice in one chunk's list
+            partitions[key] = sorted(set(partitions[key]))
+            offsets[i + 1] = offsets[i] + len(partitions[key])
+
+        positions = np.empty(offsets[-1], dtype=np.int64)
+        for i, key in enumerate(keys):
+            positions[offsets[i]:offsets[i + 1]] = partitions[key]
+        return cls(keys, offsets, positions)
+
+    def save(self, path: str) -> None:
+        """Persist the partitions next to the FAISS index."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        keys = sorted(self.key_ids, key=self.key_ids.get)
+        with open(path / KEYS_FILENAME, "w", encoding="utf-8") as f:
+            json.dump(keys, f, ensure_ascii=False)
+        _save_array(path / OFFSETS_FILENAME, self.offsets)
+        _save_array(path / POSITIONS_FILENAME, self.positions)
+
+    @classmethod
+    def load(cls, path: str) -> 'MetadataPartitions':
+        """Load partitions, memory-mapping the position array."""
+        path = Path(path)
+        with open(path / KEYS_FILENAME, "r", encoding="utf-8") as f:
+            keys = json.load(f)
+        return cls(
+            keys,
+            np.load(path / OFFSETS_FILENAME),
+            np.load(path / POSITIONS_FILENAME, mmap_mode="r"),
+        )
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Check whether a directory holds saved partitions."""
+        return (Path(path) / KEYS_FILENAME).exists()
+
+    def _partition(self, key: str) -> np.ndarray:
+        i = self.key_ids.get(key)
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        return np.asarray(self.positions[self.offsets[i]:self.offsets[i + 1]])
+
+    def select(self, filters: Dict[str, List[Any]]) -> np.ndarray:
+        """
+        Chunk positions matching every filter (any of its values).
+
+        Args:
+            filters: Output of `validate_filters`
+
+        Returns:
+            Sorted int64 array of chunk positions
+        """
+        selected = None
+        for name, values in filters.items():
+            matches = np.unique(np.concatenate(
+                [self._partition(_partition_key(name, value)) for value in values]
+            ))
+            selected = matches if selected is None else np.intersect1d(selected, matches, assume_unique=True)
+        return selected
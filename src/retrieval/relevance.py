@@ -0,0 +1,80 @@
+"""Relevance scores of vector search results and the cutoffs applied to them."""
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+def distances_to_scores(distances: np.ndarray) -> np.ndarray:
+    """
+    Turn squared L2 distances into cosine similarities.
+
+    For unit-length vectors, as OpenAI embeddings are, |q - d|^2 = 2 - 2 cos,
+    so the score is 1 for an identical vector and 0 for an unrelated one.
+    """
+    return 1.0 - np.asarray(distances, dtype=np.float32) / 2.0
+
+
+@dataclass(frozen=True)
+class ScoreCutoffs:
+    """
+    Which of the ranked vector results are relevant enough to answer from.
+
+    Only vector similarities are cut; BM25 and fused ranks have no comparable
+    score. The defaults keep every result.
+    """
+
+    # Lowest score a chunk may have
+    min_score: float = -math.inf
+    # Lowest score relative to the best chunk's, e.g. 0.75 of the top score
+    relative_score: float = 0.0
+    # Adaptive k: stop at the first drop of more than this between consecutive chunks
+    max_drop: float = math.inf
+
+    def count(self, scores: Sequence[float], k: int) -> int:
+        """
+        Number of leading results that pass the cutoffs.
+
+        Args:
+            scores: Scores of the ranked results, best first
+            k: Maximum number of results
+
+        Returns:
+            How many of the first (at most k) results to keep
+        """
+        if not len(scores):
+            return 0
+
+        floor = self.min_score
+        if scores[0] > 0:
+            floor = max(floor, self.relative_score * scores[0])
+
+        kept = 0
+        for score in scores[:k]:
+            if score < floor or (kept and scores[kept - 1] - score > self.max_drop):
+                break
+            kept += 1
+        return kept
+
+
+def _round(score: Optional[float]) -> Optional[float]:
+    return None if score is None else round(score, 4)
+
+
+def score_fields(docs: Sequence) -> Dict[str, Any]:
+    """
+    Relevance scores of a retrieval result, for an API response.
+
+    Returns:
+        {"scores": [...]} with the score of each source, plus the scores of
+        the best rejected `candidate_scores` when none passed the cutoffs;
+        empty for documents retrieved without scores
+    """
+    scores = getattr(docs, "scores", None)
+    if scores is None:
+        return {}
+    fields = {"scores": [_round(score) for score in scores]}
+    if not docs:
+        fields["candidate_scores"] = [_round(score) for score in getattr(docs, "candidate_scores", None) or []]
+    return fields
@@ -1,11 +1,95 @@
+import asyncio
 import os
-from typing import List, Optional
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 
-from src.config import get_index_path
+from src.config import (
+    get_embedding_cache_max_entries,
+    get_embedding_cache_path,
+    get_http_timeout,
+    get_index_path,
+    get_lexical_confidence,
+    get_openai_base_url,
+    get_relevance_max_drop,
+    get_relevance_min_score,
+    get_relevance_relative_score,
+    get_retrieval_cache_size,
+    get_retrieval_cache_ttl,
+    get_retrieval_mode,
+    get_search_ef_search,
+    get_search_nprobe,
+    get_shard_addresses,
+    get_shard_connections,
+    get_shard_timeout,
+    get_sharded_search,
+)
+from src.embeddings.cache import CachedEmbeddings, cache_model_name, get_embedding_cache
+from src.http_client import shared_async_http_client, shared_http_client
+from src.retrieval.bm25 import BM25Index
+from src.retrieval.cache import LRUCache
+from src.monitoring.metrics import CHUNKS_RETRIEVED, RETRIEVALS, stage_timer
+from src.retrieval.partitions import MetadataPartitions, validate_filters
+from src.retrieval.relevance import ScoreCutoffs, distances_to_scores
+from src.retrieval.scatter_gather import ShardGroup
+from src.storage.index_types import apply_search_params, filtered_search_params
+from src.storage.mmap_store import MmapVectorStore, is_mmap_index, open_chunk_store
+from src.storage.shards import is_sharded_index
+from src.utils.text import normalize_text
+
+
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+
+# Reciprocal rank fusion constant; dampens the weight of top ranks
+RRF_K = 60
+
+
+class RetrievalResult(list):
+    """
+    List of retrieved documents annotated with how they were obtained.
+
+    `scores` holds the relevance score of each document (None for documents
+    found by BM25 alone), and `candidate_scores` the scores of the best
+    vector results before the cutoffs; both are None when no vector search
+    ran. `query_embedding` is the query vector the search used, None when the
+    query was not embedded.
+    """
+
+    def __init__(
+            self,
+            docs: List[Document],
+            cache_hit: bool = False,
+            strategy: str = "vector",
+            scores: Optional[List[Optional[float]]] = None,
+            candidate_scores: Optional[List[float]] = None,
+            query_embedding: Optional[List[float]] = None
+    ):
+        super().__init__(docs)
+        self.cache_hit = cache_hit
+        self.strategy = strategy
+        self.scores = scores
+        self.candidate_scores = candidate_scores
+        self.query_embedding = query_embedding
+
+
+@dataclass
+class _BatchPlan:
+    """Retrieval state for a batch between the cache/BM25 stage and the vector search."""
+
+    queries: List[str]
+    k: int
+    fetch_k: int
+    keys: List[tuple]
+    results: List[Optional[RetrievalResult]]
+    # Query position -> BM25 candidates still waiting for the vector search
+    pending: Dict[int, List[Document]]
+    # Chunk positions allowed by the filters (None when unfiltered)
+    allowed: Optional[np.ndarray] = None
 
 
 class DocumentRetriever:
@@ -13,7 +97,7 @@ class DocumentRetriever:
 
     # Singleton pattern to avoid reloading index
     _instance: Optional['DocumentRetriever'] = None
-    _vectorstore: Optional[FAISS] = None
+    _vectorstore: Optional[Union[FAISS, MmapVectorStore]] = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -24,7 +108,15 @@ class DocumentRetriever:
             self,
             index_path: str = None,
             embedding_model: str = "text-embedding-3-small",
-            k: int = 5
+            k: int = 5,
+            cache_size: Optional[int] = None,
+            cache_ttl: Optional[float] = None,
+            nprobe: Optional[int] = None,
+            ef_search: Optional[int] = None,
+            mode: Optional[str] = None,
+            lexical_confidence: Optional[float] = None,
+            sharded: Optional[bool] = None,
+            cutoffs: Optional[ScoreCutoffs] = None
     ):
         """
         Initialize document retriever.
@@ -33,6 +125,17 @@ class DocumentRetriever:
             index_path: Path to FAISS index
             embedding_model: OpenAI embedding model (must match ingestion)
             k: Number of documents to retrieve
+            cache_size: Queries kept in the in-process caches (defaults to config)
+            cache_ttl: Seconds a cached query stays valid (defaults to config)
+            nprobe: IVF lists visited per query (defaults to config)
+            ef_search: HNSW candidate list size per query (defaults to config)
+            mode: "vector", "hybrid" or "lexical" (defaults to config)
+            lexical_confidence: BM25 confidence at which hybrid retrieval
+                answers from BM25 alone (defaults to config)
+            sharded: Search the index shards through shard workers, if the
+                index has shards (defaults to config)
+            cutoffs: Relevance cutoffs on the vector results (defaults to
+                config, where they are off unless set)
         """
         # Only initialize once
         if self._vectorstore is not None:
@@ -46,6 +149,33 @@ class DocumentRetriever:
         self.index_path = str(index_path) if index_path else str(get_index_path())
         self.embedding_model = embedding_model
         self.k = k
+        self.index_version = ""
+        self.nprobe = get_search_nprobe() if nprobe is None else nprobe
+        self.ef_search = get_search_ef_search() if ef_search is None else ef_search
+        self.mode = mode or get_retrieval_mode()
+        if self.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {self.mode!r}, expected one of {RETRIEVAL_MODES}")
+        self.lexical_confidence = (
+            get_lexical_confidence() if lexical_confidence is None else lexical_confidence
+        )
+        self.sharded = get_sharded_search() if sharded is None else sharded
+        configured = {
+            "min_score": get_relevance_min_score(),
+            "relative_score": get_relevance_relative_score(),
+            "max_drop": get_relevance_max_drop(),
+        }
+        self.cutoffs = cutoffs or ScoreCutoffs(
+            **{name: value for name, value in configured.items() if value is not None}
+        )
+        self._bm25: Optional[BM25Index] = None
+        self._partitions: Optional[MetadataPartitions] = None
+        self._shards: Optional[ShardGroup] = None
+
+        # Normalized query -> embedding, and (query, k, index version) -> chunk IDs and scores
+        cache_size = get_retrieval_cache_size() if cache_size is None else cache_size
+        cache_ttl = get_retrieval_cache_ttl() if cache_ttl is None else cache_ttl
+        self._query_embedding_cache = LRUCache(cache_size, cache_ttl, name="query_embedding")
+        self._result_cache = LRUCache(cache_size, cache_ttl, name="retrieval_result")
 
         # Load the vectorstore
         self._load_vectorstore()
@@ -54,31 +184,379 @@ class DocumentRetriever:
         """Load FAISS index from disk."""
         print(f"Loading FAISS index from {self.index_path}...")
 
-        embeddings = OpenAIEmbeddings(model=self.embedding_model)
-        self._vectorstore = FAISS.load_local(
-            self.index_path,
-            embeddings,
-            allow_dangerous_deserialization=True
+        # Repeated queries are answered from the on-disk embedding cache
+        cache = get_embedding_cache(
+            get_embedding_cache_path(), get_embedding_cache_max_entries()
+        )
+        embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(
+                model=self.embedding_model,
+                base_url=get_openai_base_url(),
+                # Same connection pool as the LLM client
+                http_client=shared_http_client(),
+                http_async_client=shared_async_http_client(),
+                request_timeout=get_http_timeout()
+            ),
+            cache,
+            cache_model_name(self.embedding_model, get_openai_base_url())
         )
+        if self.sharded and is_sharded_index(self.index_path):
+            # Shard workers hold the vectors; only the chunk store is opened here
+            self._shards = ShardGroup(
+                self.index_path, get_shard_addresses(), get_shard_timeout(),
+                nprobe=self.nprobe, ef_search=self.ef_search, connections=get_shard_connections()
+            )
+            self._vectorstore = MmapVectorStore(embeddings, None, open_chunk_store(self.index_path))
+        elif is_mmap_index(self.index_path):
+            # Memory-mapped: near-constant startup, pages shared across workers
+            self._vectorstore = MmapVectorStore.load(self.index_path, embeddings)
+        else:
+            self._vectorstore = FAISS.load_local(
+                self.index_path,
+                embeddings,
+                allow_dangerous_deserialization=True
+            )
+
+        if self.sharded and self._shards is None:
+            print(f"No shards in {self.index_path}, searching the full index in this process")
+
+        # Search-time accuracy/speed knobs for approximate indexes
+        if self._shards is None:
+            apply_search_params(self._vectorstore.index, self.nprobe, self.ef_search)
+
+        if self.mode != "vector":
+            if BM25Index.exists(self.index_path):
+                self._bm25 = BM25Index.load(self.index_path)
+            else:
+                print(f"No BM25 index in {self.index_path}, using vector retrieval only")
+
+        if MetadataPartitions.exists(self.index_path):
+            self._partitions = MetadataPartitions.load(self.index_path)
+
+        # Cached results are only valid for the index they came from
+        stat = (Path(self.index_path) / "index.faiss").stat()
+        self.index_version = f"{stat.st_mtime_ns}-{stat.st_size}"
 
         print("FAISS index loaded successfully")
 
-    def retrieve(self, query: str, k: Optional[int] = None) -> List[Document]:
+    def _lookup_query_embeddings(self, queries: List[str]) -> Tuple[List[str], dict, dict]:
+        """Split queries into cached embeddings and distinct normalized misses."""
+        keys = [normalize_text(query) for query in queries]
+        embeddings = {}
+        missing = {}
+        for key, query in zip(keys, queries):
+            if key in embeddings or key in missing:
+                continue
+            embedding = self._query_embedding_cache.get(key)
+            if embedding is None:
+                missing[key] = query
+            else:
+                embeddings[key] = embedding
+        return keys, embeddings, missing
+
+    def _store_query_embeddings(
+            self,
+            keys: List[str],
+            embeddings: dict,
+            missing: dict,
+            vectors: List[List[float]]
+    ) -> List[List[float]]:
+        """Cache freshly embedded misses and return embeddings in query order."""
+        for key, vector in zip(missing, vectors):
+            embeddings[key] = vector
+            self._query_embedding_cache.put(key, vector)
+        return [embeddings[key] for key in keys]
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed queries, reusing recent embeddings of the same normalized text.
+
+        All cache misses are sent to the embedding API in a single request.
+        """
+        keys, embeddings, missing = self._lookup_query_embeddings(queries)
+        texts = list(missing.values())
+        vectors = []
+        if texts:
+            with stage_timer("embed_query"):
+                if len(texts) == 1:
+                    vectors = [self._vectorstore.embeddings.embed_query(texts[0])]
+                else:
+                    vectors = self._vectorstore.embeddings.embed_documents(texts)
+        return self._store_query_embeddings(keys, embeddings, missing, vectors)
+
+    async def _aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Async `_embed_queries`."""
+        keys, embeddings, missing = self._lookup_query_embeddings(queries)
+        texts = list(missing.values())
+        vectors = []
+        if texts:
+            with stage_timer("embed_query"):
+                if len(texts) == 1:
+                    vectors = [await self._vectorstore.embeddings.aembed_query(texts[0])]
+                else:
+                    vectors = await self._vectorstore.embeddings.aembed_documents(texts)
+        return self._store_query_embeddings(keys, embeddings, missing, vectors)
+
+    def _doc_at(self, position: int) -> Document:
+        """Fetch the chunk stored at a vector position."""
+        if isinstance(self._vectorstore, MmapVectorStore):
+            return self._vectorstore.chunks.get(position)
+        docstore_id = self._vectorstore.index_to_docstore_id[position]
+        return self._vectorstore.docstore.search(docstore_id)
+
+    def _vector_search(
+            self,
+            embeddings: List[List[float]],
+            k: int,
+            allowed: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Search the FAISS index for all query vectors in one matrix call.
+
+        With `allowed` positions, the filter is applied inside FAISS through an
+        ID selector, so only matching vectors are ever scored. A sharded index
+        is searched on all shards at once and their results merged by distance.
+
+        Returns:
+            Per query, (document, relevance score) pairs, best first
+        """
+        vectors = np.array(embeddings, dtype=np.float32)
+        if allowed is not None:
+            k = min(k, len(allowed))
+        with stage_timer("vector_search"):
+            if self._shards is not None:
+                distances, positions = self._shards.search(vectors, k, allowed)
+            else:
+                index = self._vectorstore.index
+                params = None if allowed is None else filtered_search_params(index, allowed)
+                distances, positions = index.search(vectors, k, params=params)
+            scores = distances_to_scores(distances)
+            return [
+                [(self._doc_at(int(p)), float(score)) for p, score in zip(row, row_scores) if p != -1]
+                for row, row_scores in zip(positions, scores)
+            ]
+
+    def _fuse(self, rankings: List[List[Document]], k: int) -> List[Document]:
+        """Merge ranked lists by reciprocal rank fusion, keyed by chunk ID."""
+        scores: Dict[str, float] = {}
+        docs: Dict[str, Document] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                scores[doc.id] = scores.get(doc.id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                docs.setdefault(doc.id, doc)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [docs[chunk_id] for chunk_id in best]
+
+    def retrieve(
+            self,
+            query: str,
+            k: Optional[int] = None,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
         """
         Retrieve most relevant documents for a query.
 
+        In hybrid mode a BM25 search runs first; confident keyword matches are
+        returned directly, otherwise BM25 and vector results are fused.
+        With relevance cutoffs configured, vector results below them are
+        dropped, so fewer than k documents, or none at all for an off-topic
+        question, may come back. The cutoffs only apply to vector scores:
+        confident BM25 matches are returned unscored and uncut.
+        Repeated queries are served from an in-process cache of chunk IDs,
+        skipping both the embedding request and the FAISS search.
+
         Args:
             query: User's question
             k: Number of documents to retrieve (overrides default)
+            filters: Restrict the search to chunks whose page matches, e.g.
+                {"year": 1954, "category": "race", "entity": "Ferrari"};
+                a list value matches any of its items
 
         Returns:
-            List of relevant Document objects
+            List of relevant Document objects, with `cache_hit`, `strategy`
+            ("cache", "vector", "lexical" or "hybrid"), `scores` and
+            `candidate_scores` set
+
+        Raises:
+            ValueError: On invalid filters, or filters on an index built
+                without metadata partitions
+        """
+        return self.retrieve_batch([query], k, filters)[0]
+
+    async def aretrieve(
+            self,
+            query: str,
+            k: Optional[int] = None,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """Async `retrieve`, for the asyncio serving mode."""
+        return (await self.aretrieve_batch([query], k, filters))[0]
+
+    def _allowed_positions(self, filters: Optional[Dict[str, Any]]) -> Tuple[Optional[np.ndarray], tuple]:
+        """Resolve filters to chunk positions, plus a hashable key for the result cache."""
+        filters = validate_filters(filters)
+        if filters is None:
+            return None, ()
+        if self._partitions is None:
+            raise ValueError("This index has no metadata partitions; re-run ingestion to use filters")
+
+        key = tuple(sorted((name, tuple(sorted(map(str, values)))) for name, values in filters.items()))
+        return self._partitions.select(filters), key
+
+    def _plan_batch(
+            self,
+            queries: List[str],
+            k: Optional[int],
+            filters: Optional[Dict[str, Any]] = None
+    ) -> _BatchPlan:
+        """
+        Resolve everything that needs no embedding: cache hits and confident
+        BM25 matches. The rest is left pending for the vector search.
         """
         if self._vectorstore is None:
             raise RuntimeError("Vectorstore not initialized")
 
         k = k or self.k
-        return self._vectorstore.similarity_search(query, k=k)
+        allowed, filter_key = self._allowed_positions(filters)
+        plan = _BatchPlan(
+            queries=queries,
+            k=k,
+            fetch_k=k if self._bm25 is None else max(4 * k, 20),
+            keys=[
+                (normalize_text(query), k, self.mode, filter_key, self.index_version)
+                for query in queries
+            ],
+            results=[None] * len(queries),
+            pending={},
+            allowed=allowed,
+        )
+
+        for i, (query, key) in enumerate(zip(queries, plan.keys)):
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                chunk_ids, scores, candidate_scores, query_embedding = cached
+                docs = self._vectorstore.get_by_ids(chunk_ids)
+                plan.results[i] = RetrievalResult(
+                    docs, cache_hit=True, strategy="cache", scores=scores,
+                    candidate_scores=candidate_scores, query_embedding=query_embedding
+                )
+                continue
+
+            if allowed is not None and not len(allowed):
+                # Nothing matches the filters; no search needed
+                plan.results[i] = RetrievalResult([], strategy="vector", scores=[], candidate_scores=[])
+                continue
+
+            if self._bm25 is None:
+                plan.pending[i] = []
+                continue
+
+            with stage_timer("bm25_search"):
+                lexical, confidence = self._bm25.search(query, plan.fetch_k, allowed)
+                lexical_docs = [self._doc_at(position) for position, _ in lexical]
+
+            # Exact lookups of rare names: BM25 alone is reliable, skip the embedding call
+            if self.mode == "lexical" or (lexical_docs and confidence >= self.lexical_confidence):
+                plan.results[i] = RetrievalResult(lexical_docs[:k], strategy="lexical")
+            else:
+                plan.pending[i] = lexical_docs
+
+        return plan
+
+    def _finish_batch(
+            self,
+            plan: _BatchPlan,
+            vector_results: List[List[Tuple[Document, float]]],
+            embeddings: List[List[float]]
+    ) -> List[RetrievalResult]:
+        """
+        Apply the relevance cutoffs to the vector results, merge them into the
+        plan and cache every fresh result, along with its query embedding.
+
+        In hybrid mode the cutoffs decide how many documents are returned: BM25
+        candidates are fused in, but an off-topic question returns nothing.
+        """
+        for i, scored, embedding in zip(plan.pending, vector_results, embeddings):
+            candidate_scores = [score for _, score in scored[:plan.k]]
+            relevant = scored[:self.cutoffs.count([score for _, score in scored], plan.k)]
+            lexical_docs = plan.pending[i]
+            if self._bm25 is None:
+                docs, scores, strategy = [doc for doc, _ in relevant], [score for _, score in relevant], "vector"
+            else:
+                docs = self._fuse([[doc for doc, _ in relevant], lexical_docs], len(relevant))
+                vector_scores = {doc.id: score for doc, score in relevant}
+                scores, strategy = [vector_scores.get(doc.id) for doc in docs], "hybrid"
+            plan.results[i] = RetrievalResult(
+                docs, strategy=strategy, scores=scores, candidate_scores=candidate_scores, query_embedding=embedding
+            )
+
+        for key, result in zip(plan.keys, plan.results):
+            RETRIEVALS.labels(result.strategy).inc()
+            CHUNKS_RETRIEVED.observe(len(result))
+            if not result.cache_hit:
+                self._result_cache.put(
+                    key, ([doc.id for doc in result], result.scores, result.candidate_scores, result.query_embedding)
+                )
+        return plan.results
+
+    def retrieve_batch(
+            self,
+            queries: List[str],
+            k: Optional[int] = None,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> List[RetrievalResult]:
+        """
+        Retrieve documents for many queries at once.
+
+        Queries missing from the result cache are embedded in a single
+        request and searched with a single matrix FAISS search.
+
+        Args:
+            queries: User questions
+            k: Number of documents to retrieve per query (overrides default)
+            filters: Filters applied to every query, as in `retrieve`
+
+        Returns:
+            One result per query, in order, as returned by `retrieve`
+        """
+        with stage_timer("retrieve"):
+            plan = self._plan_batch(queries, k, filters)
+            embeddings, vector_results = [], []
+            if plan.pending:
+                embeddings = self._embed_queries([queries[i] for i in plan.pending])
+                vector_results = self._vector_search(embeddings, plan.fetch_k, plan.allowed)
+            return self._finish_batch(plan, vector_results, embeddings)
+
+    async def aretrieve_batch(
+            self,
+            queries: List[str],
+            k: Optional[int] = None,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> List[RetrievalResult]:
+        """
+        Async `retrieve_batch`.
+
+        Embeddings are requested with the async client. Cache reads, BM25
+        and chunk decoding (in planning) and the FAISS search run in worker
+        threads (FAISS releases the GIL), so the event loop stays free to
+        serve other requests meanwhile.
+        """
+        with stage_timer("retrieve"):
+            plan = await asyncio.to_thread(self._plan_batch, queries, k, filters)
+            embeddings, vector_results = [], []
+            if plan.pending:
+                embeddings = await self._aembed_queries([queries[i] for i in plan.pending])
+                vector_results = await asyncio.to_thread(
+                    self._vector_search, embeddings, plan.fetch_k, plan.allowed
+                )
+            return self._finish_batch(plan, vector_results, embeddings)
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for the in-process query caches."""
+        return {
+            "query_embeddings": self._query_embedding_cache.stats(),
+            "results": self._result_cache.stats(),
+        }
 
 
 if __name__ == "__main__":
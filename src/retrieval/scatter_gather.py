@@ -0,0 +1,500 @@
+"""
+Scatter-gather vector search over index shards held by worker processes.
+
+Every shard is searched by its own worker: a local process started by the
+retriever, or a shard server on another host reached over a socket. A query
+is sent to all shards at once, each returns its nearest vectors, and the
+results are merged by distance. Shards that do not answer within the
+timeout are left out of that query's results.
+
+Messages are a small JSON header followed by raw numpy array bytes, never
+pickles, so a peer can only ever send query vectors and results. Socket
+connections must also present the shared `SHARD_AUTHKEY`.
+
+Run a shard server, bound to a private interface:
+
+    SHARD_AUTHKEY=... python -m src.retrieval.scatter_gather --index-path faiss_index --shard 0 --address 10.0.0.11:7000
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import queue
+import socket
+import struct
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+
+from src.config import get_shard_authkey
+from src.monitoring.metrics import SHARD_FAILURES
+from src.storage.index_types import apply_search_params, filtered_search_params
+from src.storage.mmap_store import MMAP_READ_FLAGS
+from src.storage.shards import load_shard_manifest
+
+# Message types; a worker sends READY once its shard is loaded
+READY = "ready"
+CLOSE = "close"
+SEARCH = "search"
+RESULT = "result"
+
+# Array types a message may carry
+_DTYPES = {"float32": np.float32, "int64": np.int64}
+_HEADER_LENGTH = struct.Struct(">I")
+# Largest message accepted, e.g. a filter allowing every position of a large index
+MAX_MESSAGE_BYTES = 256 * 2 ** 20
+
+# Seconds a local worker may take to start and load its shard
+STARTUP_TIMEOUT = 120.0
+# Seconds between reconnection attempts to an unreachable shard server
+RECONNECT_INTERVAL = 5.0
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(address: str) -> Address:
+    """"host:port" for TCP, anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host, int(port)
+    return address
+
+
+def pack_message(header: Dict[str, Any], arrays: Sequence[np.ndarray] = ()) -> bytes:
+    """
+    Encode a message: header length, JSON header, then the raw array bytes.
+
+    Args:
+        header: JSON-serializable fields
+        arrays: float32 or int64 arrays, described in the header by dtype and shape
+    """
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    header = {**header, "arrays": [[array.dtype.name, list(array.shape)] for array in arrays]}
+    head = json.dumps(header).encode("utf-8")
+    return _HEADER_LENGTH.pack(len(head)) + head + b"".join(array.tobytes() for array in arrays)
+
+
+def unpack_message(data: bytes) -> Tuple[Dict[str, Any], List[np.ndarray]]:
+    """
+    Decode a message of `pack_message`.
+
+    Raises:
+        ValueError: If the message is malformed or carries another array type
+    """
+    try:
+        (length,) = _HEADER_LENGTH.unpack_from(data)
+        header = json.loads(data[_HEADER_LENGTH.size:_HEADER_LENGTH.size + length])
+        offset = _HEADER_LENGTH.size + length
+        arrays = []
+        for dtype_name, shape in header.pop("arrays"):
+            dtype = np.dtype(_DTYPES[dtype_name])
+            shape = tuple(int(n) for n in shape)
+            count = int(np.prod(shape))
+            if min(shape, default=0) < 0 or offset + count * dtype.itemsize > len(data):
+                raise ValueError("array out of bounds")
+            arrays.append(np.frombuffer(data, dtype, count, offset).reshape(shape))
+            offset += count * dtype.itemsize
+    except (struct.error, AttributeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Malformed shard message: {e!r}") from None
+    if offset != len(data):
+        raise ValueError("Malformed shard message: trailing bytes")
+    return header, arrays
+
+
+def _send(conn: Connection, header: Dict[str, Any], arrays: Sequence[np.ndarray] = ()) -> None:
+    conn.send_bytes(pack_message(header, arrays))
+
+
+def _receive(conn: Connection) -> Tuple[Dict[str, Any], List[np.ndarray]]:
+    return unpack_message(conn.recv_bytes(MAX_MESSAGE_BYTES))
+
+
+def _open_shard(path: str, nprobe: Optional[int], ef_search: Optional[int]) -> Any:
+    """Memory-map a shard index for single-threaded search."""
+    # Parallelism comes from one worker per shard, not from threads per search
+    faiss.omp_set_num_threads(1)
+    index = faiss.read_index(path, MMAP_READ_FLAGS)
+    apply_search_params(index, nprobe, ef_search)
+    return index
+
+
+def _answer(index: Any, header: Dict[str, Any], arrays: List[np.ndarray]) -> bytes:
+    """Run one search request: vectors, then optionally the allowed local positions."""
+    request_id = header.get("id")
+    try:
+        k = int(header["k"])
+        vectors, allowed = arrays[0], arrays[1] if len(arrays) > 1 else None
+        if vectors.dtype != np.float32 or vectors.ndim != 2 or vectors.shape[1] != index.d or k <= 0:
+            raise ValueError(f"Bad search request: vectors {vectors.dtype} {vectors.shape}, k={k}")
+        params = None
+        if allowed is not None:
+            if allowed.dtype != np.int64 or allowed.ndim != 1:
+                raise ValueError(f"Bad search request: allowed {allowed.dtype} {allowed.shape}")
+            params = filtered_search_params(index, allowed)
+            k = min(k, len(allowed))
+        distances, positions = index.search(vectors, k, params=params)
+        return pack_message({"type": RESULT, "id": request_id, "error": None}, [distances, positions])
+    except Exception as e:
+        return pack_message({"type": RESULT, "id": request_id, "error": repr(e)})
+
+
+def _serve_connection(conn: Connection, index: Any) -> None:
+    """Answer requests on one connection until it closes."""
+    with conn:
+        _send(conn, {"type": READY})
+        while True:
+            try:
+                header, arrays = _receive(conn)
+            except (EOFError, OSError):
+                return
+            except ValueError as e:
+                print(f"Closing shard connection: {e}")
+                return
+            if header.get("type") != SEARCH:
+                return
+            conn.send_bytes(_answer(index, header, arrays))
+
+
+def _local_worker(conn: Connection, path: str, nprobe: Optional[int], ef_search: Optional[int]) -> None:
+    """Entry point of a local worker process."""
+    _serve_connection(conn, _open_shard(path, nprobe, ef_search))
+
+
+def serve_shard(
+        path: str,
+        address: Address,
+        authkey: bytes,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+) -> None:
+    """
+    Serve one shard over a socket, one thread per connection.
+
+    Connections must present `authkey`; keep the server on a private network
+    all the same, as requests are not encrypted.
+
+    Args:
+        path: Shard index file
+        address: (host, port) or Unix socket path to listen on
+        authkey: Shared secret of the retrievers
+        nprobe: IVF lists visited per query
+        ef_search: HNSW candidate list size per query
+
+    Raises:
+        ValueError: If `authkey` is empty
+    """
+    if not authkey:
+        raise ValueError("Shard servers need a shared secret; set SHARD_AUTHKEY")
+    index = _open_shard(path, nprobe, ef_search)
+    with Listener(address, authkey=authkey) as listener:
+        print(f"Serving shard {path} ({index.ntotal} vectors) on {listener.address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (multiprocessing.AuthenticationError, OSError) as e:
+                print(f"Rejected shard connection: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(conn, index), daemon=True).start()
+
+
+class ShardClient:
+    """Connection to the worker of one shard."""
+
+    def __init__(
+            self,
+            shard: int,
+            start: int,
+            end: int,
+            path: Optional[str] = None,
+            address: Optional[Address] = None,
+            authkey: Optional[bytes] = None,
+            nprobe: Optional[int] = None,
+            ef_search: Optional[int] = None
+    ):
+        """
+        Initialize client.
+
+        Args:
+            shard: Shard number
+            start: First vector position of the shard in the full index
+            end: Position after its last vector
+            path: Shard index file, searched by a local worker process
+            address: Shard server address (instead of a local worker)
+            authkey: Shared secret of the shard server
+            nprobe: IVF lists visited per query (local workers)
+            ef_search: HNSW candidate list size per query (local workers)
+        """
+        self.shard = shard
+        self.start = start
+        self.end = end
+        self.path = path
+        self.address = address
+        self.authkey = authkey
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self._conn: Optional[Connection] = None
+        self._process: Optional[multiprocessing.Process] = None
+        self._last_attempt = float("-inf")
+
+    def connect(self) -> bool:
+        """Make sure there is a live connection; starts or restarts a local worker."""
+        if self._conn is not None and (self._process is None or self._process.is_alive()):
+            return True
+        self.close()
+
+        if self.address is None:
+            # Spawned, not forked: the serving process has threads and OpenMP state
+            context = multiprocessing.get_context("spawn")
+            self._conn, child_conn = context.Pipe()
+            self._process = context.Process(
+                target=_local_worker,
+                args=(child_conn, self.path, self.nprobe, self.ef_search),
+                name=f"shard-{self.shard}",
+                daemon=True,
+            )
+            self._process.start()
+            child_conn.close()
+            return True
+
+        if time.monotonic() - self._last_attempt < RECONNECT_INTERVAL:
+            return False
+        self._last_attempt = time.monotonic()
+        try:
+            if isinstance(self.address, tuple):
+                # Client() has no connect timeout; fail fast on a dead host first
+                socket.create_connection(self.address, timeout=RECONNECT_INTERVAL).close()
+            self._conn = Client(self.address, authkey=self.authkey)
+        except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+            print(f"Shard {self.shard} unreachable at {self.address}: {e}")
+            return False
+        return True
+
+    def wait_ready(self, deadline: float) -> bool:
+        """Wait until `deadline` (monotonic) for the worker to load its shard."""
+        try:
+            return self._conn.poll(max(deadline - time.monotonic(), 0)) and _receive(self._conn)[0]["type"] == READY
+        except (EOFError, OSError, ValueError):
+            self.close()
+            return False
+
+    def send(self, request_id: int, vectors: np.ndarray, k: int, allowed: Optional[np.ndarray]) -> bool:
+        """Send a search request, returning False if the shard is unavailable."""
+        if not self.connect():
+            return False
+        arrays = [vectors] if allowed is None else [vectors, allowed.astype(np.int64, copy=False)]
+        try:
+            _send(self._conn, {"type": SEARCH, "id": request_id, "k": k}, arrays)
+        except (OSError, ValueError):
+            self.close()
+            return False
+        return True
+
+    def receive(self, request_id: int, deadline: float) -> Optional[tuple]:
+        """
+        Wait until `deadline` (monotonic) for the reply to a request.
+
+        Replies to earlier requests that timed out are discarded on the way.
+
+        Returns:
+            (distances, positions in the full index), or None on timeout or error
+        """
+        while True:
+            try:
+                if not self._conn.poll(max(deadline - time.monotonic(), 0)):
+                    return None
+                header, arrays = _receive(self._conn)
+            except (EOFError, OSError, ValueError):
+                self.close()
+                return None
+            if header.get("type") != RESULT or header.get("id") != request_id:
+                continue
+
+            if header["error"] is not None:
+                print(f"Shard {self.shard} search failed: {header['error']}")
+                return None
+            distances, positions = arrays
+            return distances, np.where(positions == -1, -1, positions + self.start)
+
+    def close(self) -> None:
+        """Close the connection and stop a local worker."""
+        if self._conn is not None:
+            try:
+                _send(self._conn, {"type": CLOSE})
+            except (OSError, ValueError):
+                pass
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            self._process.join(timeout=1)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+
+
+class ShardGroup:
+    """
+    All shards of an index, searched as one.
+
+    A connection carries one request at a time, so the group keeps a pool of
+    lanes, each with its own connection to every shard; concurrent searches
+    each take a free lane.
+    """
+
+    def __init__(
+            self,
+            index_path: str,
+            addresses: Optional[List[str]] = None,
+            timeout: float = 2.0,
+            authkey: Optional[bytes] = None,
+            nprobe: Optional[int] = None,
+            ef_search: Optional[int] = None,
+            connections: int = 1
+    ):
+        """
+        Connect to every shard of an index.
+
+        Args:
+            index_path: Index directory with shards
+            addresses: Shard server addresses, in shard order; local worker
+                processes are started when empty
+            timeout: Seconds to wait for the shards' answers to a search
+            authkey: Shared secret of the shard servers (defaults to config)
+            nprobe: IVF lists visited per query (local workers)
+            ef_search: HNSW candidate list size per query (local workers)
+            connections: Concurrent searches, each with its own connection
+                (or local worker) per shard
+
+        Raises:
+            ValueError: If the number of addresses does not match the shards,
+                or shard servers are configured without a shared secret
+        """
+        manifest = load_shard_manifest(index_path)
+        shards = manifest["shards"]
+        if addresses and len(addresses) != len(shards):
+            raise ValueError(f"Index has {len(shards)} shards but {len(addresses)} shard addresses are configured")
+        authkey = authkey if authkey is not None else get_shard_authkey()
+        if addresses and not authkey:
+            raise ValueError("Shard servers need a shared secret; set SHARD_AUTHKEY")
+
+        self.ntotal = manifest["count"]
+        self.timeout = timeout
+        self._request_ids = itertools.count()
+        self.lanes = [
+            [
+                ShardClient(
+                    i, shard["start"], shard["end"],
+                    path=shard["path"],
+                    address=parse_address(addresses[i]) if addresses else None,
+                    authkey=authkey,
+                    nprobe=nprobe,
+                    ef_search=ef_search,
+                )
+                for i, shard in enumerate(shards)
+            ]
+            for _ in range(max(connections, 1))
+        ]
+        self._free_lanes: "queue.Queue[List[ShardClient]]" = queue.Queue()
+        for lane in self.lanes:
+            self._free_lanes.put(lane)
+        self._wait_ready()
+
+    @property
+    def clients(self) -> List[ShardClient]:
+        """Every shard client of every lane."""
+        return [client for lane in self.lanes for client in lane]
+
+    def _wait_ready(self) -> None:
+        """Start local workers and wait until every shard has loaded."""
+        clients = self.clients
+        ready = [client for client in clients if client.connect()]
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        started = [client for client in ready if client.wait_ready(deadline)]
+        print(f"Connected to {len(started)}/{len(clients)} shard connections")
+
+    def search(
+            self,
+            vectors: np.ndarray,
+            k: int,
+            allowed: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search every shard and merge the k nearest results per query.
+
+        Args:
+            vectors: float32 query vectors, shape (n, dim)
+            k: Results per query
+            allowed: Sorted vector positions the search is restricted to
+
+        Returns:
+            (distances, positions) of shape (n, at most k), positions in
+            the full index and -1 where a shard found fewer results
+
+        Raises:
+            RuntimeError: If no queried shard answered
+        """
+        lane = self._free_lanes.get()
+        try:
+            request_id = next(self._request_ids)
+            queried = []
+            for client in lane:
+                local = None
+                if allowed is not None:
+                    lo, hi = np.searchsorted(allowed, [client.start, client.end])
+                    if lo == hi:
+                        # Nothing in this shard passes the filters
+                        continue
+                    local = allowed[lo:hi] - client.start
+                if client.send(request_id, vectors, k, local):
+                    queried.append(client)
+                else:
+                    SHARD_FAILURES.labels(str(client.shard), "unavailable").inc()
+
+            deadline = time.monotonic() + self.timeout
+            replies = []
+            for client in queried:
+                reply = client.receive(request_id, deadline)
+                if reply is None:
+                    SHARD_FAILURES.labels(str(client.shard), "timeout").inc()
+                    print(f"Shard {client.shard} did not answer within {self.timeout}s, leaving it out")
+                else:
+                    replies.append(reply)
+        finally:
+            self._free_lanes.put(lane)
+
+        if not replies:
+            if queried or allowed is None:
+                raise RuntimeError("No index shard answered the search")
+            return np.empty((len(vectors), 0), dtype=np.float32), np.empty((len(vectors), 0), dtype=np.int64)
+
+        distances = np.hstack([d for d, _ in replies])
+        positions = np.hstack([p for _, p in replies])
+        distances = np.where(positions == -1, np.inf, distances)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(positions, order, axis=1)
+
+    def close(self) -> None:
+        """Disconnect from all shards, stopping local workers."""
+        for client in self.clients:
+            client.close()
+
+
+if __name__ == "__main__":
+    from src.config import get_index_path, get_search_ef_search, get_search_nprobe
+
+    parser = argparse.ArgumentParser(description="Serve one index shard to remote retrievers.")
+    parser.add_argument("--index-path", default=str(get_index_path()), help="Index directory with shards")
+    parser.add_argument("--shard", type=int, required=True, help="Shard number")
+    parser.add_argument("--address", required=True, help="host:port or Unix socket path to listen on")
+    args = parser.parse_args()
+    if not get_shard_authkey():
+        parser.error("set SHARD_AUTHKEY to the secret shared with the retrievers")
+
+    shard_path = load_shard_manifest(args.index_path)["shards"][args.shard]["path"]
+    serve_shard(
+        shard_path, parse_address(args.address), get_shard_authkey(),
+        get_search_nprobe(), get_search_ef_search()
+    )
@@ -0,0 +1,168 @@
+"""Construction and tuning of exact and approximate FAISS indexes."""
+import math
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# Build-time parameters and their defaults; None means "derive from corpus size"
+DEFAULT_INDEX_PARAMS: Dict[str, Dict[str, Any]] = {
+    "flat": {},
+    "ivf_flat": {"nlist": None},
+    "hnsw": {"M": 32, "ef_construction": 200},
+    "ivf_pq": {"nlist": None, "pq_m": 64, "pq_nbits": 8},
+}
+
+# Filters matching at most this share of vectors make IVF search every list
+RESTRICTIVE_FILTER_FRACTION = 0.05
+
+# FAISS k-means wants roughly this many training points per centroid
+TRAIN_POINTS_PER_CENTROID = 39
+MAX_TRAIN_POINTS = 100_000
+
+
+def resolve_index_params(index_type: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Merge user parameters over the defaults for an index type."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    resolved = dict(DEFAULT_INDEX_PARAMS[index_type])
+    unknown = set(params or {}) - set(resolved)
+    if unknown:
+        raise ValueError(f"Unknown parameters for {index_type} index: {sorted(unknown)}")
+    resolved.update(params or {})
+    return resolved
+
+
+def default_nlist(num_vectors: int) -> int:
+    """Pick an IVF list count of about 4*sqrt(n), with enough points to train each list."""
+    nlist = int(4 * math.sqrt(num_vectors))
+    return max(1, min(nlist, num_vectors // TRAIN_POINTS_PER_CENTROID))
+
+
+def build_index(
+        index_type: str,
+        vectors: np.ndarray,
+        params: Optional[Dict[str, Any]] = None
+) -> Any:
+    """
+    Build and fill a FAISS index of the requested type (L2 metric).
+
+    Args:
+        index_type: One of `INDEX_TYPES`
+        vectors: float32 array of shape (n, dim), in docstore order
+        params: Build-time parameters (nlist, M, ef_construction, pq_m, pq_nbits)
+
+    Returns:
+        Trained FAISS index containing all vectors in the given order
+    """
+    params = resolve_index_params(index_type, params)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dim = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"])
+        index.hnsw.efConstruction = params["ef_construction"]
+    else:
+        nlist = params["nlist"] or default_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            if dim % params["pq_m"]:
+                raise ValueError(f"pq_m={params['pq_m']} must divide the vector dimension {dim}")
+            if num_vectors < 2 ** params["pq_nbits"]:
+                raise ValueError(
+                    f"ivf_pq with pq_nbits={params['pq_nbits']} needs at least "
+                    f"{2 ** params['pq_nbits']} vectors to train, got {num_vectors}"
+                )
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, params["pq_m"], params["pq_nbits"])
+
+        train_size = min(num_vectors, MAX_TRAIN_POINTS)
+        sample = np.random.default_rng(0).choice(num_vectors, train_size, replace=False)
+        index.train(vectors[np.sort(sample)])
+
+    index.add(vectors)
+    return index
+
+
+def reconstruct_all(index: Any) -> np.ndarray:
+    """Read every vector back out of an exact (flat) index."""
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def supports_removal(index: Any) -> bool:
+    """
+    Whether vectors can be deleted in place while keeping IDs equal to positions.
+
+    Only flat indexes renumber the remaining vectors on removal, as the
+    docstore mapping and the chunk store assume; IVF indexes keep the old IDs
+    and HNSW graphs cannot delete at all.
+    """
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+
+def apply_search_params(
+        index: Any,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+) -> None:
+    """
+    Set search-time knobs on an index, ignoring ones it does not have.
+
+    Args:
+        index: FAISS index
+        nprobe: Number of IVF lists visited per query
+        ef_search: HNSW candidate list size per query
+    """
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+
+    if ef_search is not None:
+        hnsw_index = faiss.downcast_index(index)
+        if isinstance(hnsw_index, faiss.IndexHNSW):
+            hnsw_index.hnsw.efSearch = ef_search
+
+
+def filtered_search_params(index: Any, ids: np.ndarray) -> Any:
+    """
+    Search parameters that restrict a search to the given vector IDs.
+
+    The filter is applied inside the search, so the k results are the nearest
+    allowed vectors rather than survivors of a post-filter. Current nprobe and
+    efSearch settings are carried over; restrictive filters make IVF indexes
+    probe every list, since vectors outside the filter are never scored.
+
+    Args:
+        index: FAISS index
+        ids: Allowed vector IDs (positions)
+
+    Returns:
+        `faiss.SearchParameters` (or the IVF/HNSW subclass) to pass as `params`
+    """
+    selector = faiss.IDSelectorBatch(np.ascontiguousarray(ids, dtype=np.int64))
+
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    else:
+        try:
+            ivf = faiss.extract_index_ivf(index)
+        except RuntimeError:
+            params = faiss.SearchParameters(sel=selector)
+        else:
+            restrictive = len(ids) <= RESTRICTIVE_FILTER_FRACTION * index.ntotal
+            params = faiss.SearchParametersIVF(
+                sel=selector, nprobe=ivf.nlist if restrictive else ivf.nprobe
+            )
+
+    # The parameters only hold a raw pointer to the selector
+    params.selector_ref = selector
+    return params
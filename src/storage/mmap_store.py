@@ -0,0 +1,407 @@
+"""Pickle-free, memory-mapped on-disk index format."""
+import json
+import mmap
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+import zstandard as zstd
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+FORMAT_VERSION = "mmap-v2"
+# Uncompressed text and JSON metadata per chunk; still readable
+LEGACY_FORMAT_VERSION = "mmap-v1"
+
+INDEX_FILENAME = "index.faiss"
+STORE_FILENAME = "store.json"
+IDS_FILENAME = "chunks.ids.npy"
+ID_ORDER_FILENAME = "chunks.id_order.npy"
+SORTED_IDS_FILENAME = "chunks.sorted_ids.npy"
+
+# mmap-v2: compressed text blocks, one record per chunk, interned metadata
+BLOCKS_FILENAME = "chunks.text.zst"
+BLOCK_OFFSETS_FILENAME = "chunks.blocks.npy"
+RECORDS_FILENAME = "chunks.records.npy"
+TABLES_FILENAME = "chunks.tables.json"
+
+# mmap-v1
+TEXT_FILENAME = "chunks.text"
+META_FILENAME = "chunks.meta"
+OFFSETS_FILENAME = "chunks.offsets.npy"
+
+# Map flat/IVF codes straight from the file instead of copying them to the heap
+MMAP_READ_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+# About a dozen chunks per block: ~3.4x smaller text, ~70 us to decompress one
+BLOCK_SIZE = 32 * 1024
+COMPRESSION_LEVEL = 9
+# Decompressed blocks kept per store (hits of one query often share blocks)
+BLOCK_CACHE_SIZE = 64
+
+READ_ONLY_MESSAGE = "mmap indexes are read-only; rebuild with run_ingestion.py"
+
+# Where a chunk's text sits and which table entries hold its metadata
+RECORD_DTYPE = np.dtype([
+    ("block", np.int32), ("start", np.int32), ("length", np.int32),
+    ("source", np.int32), ("title", np.int32), ("extra", np.int32),
+])
+
+
+def is_mmap_index(path: str) -> bool:
+    """Check whether a directory holds an index in the mmap format."""
+    return (Path(path) / STORE_FILENAME).exists()
+
+
+def _write_atomic(path: Path, write) -> None:
+    """Write a file through a temporary name so readers never see it half-written."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _write_ids(path: Path, ids: List[bytes]) -> None:
+    """Write chunk IDs in vector order, plus a sorted copy for lookups by ID."""
+    id_array = np.array(ids, dtype=f"S{max((len(i) for i in ids), default=1)}")
+    id_order = np.argsort(id_array, kind="stable")
+    _write_atomic(path / IDS_FILENAME, lambda f: np.save(f, id_array))
+    _write_atomic(path / ID_ORDER_FILENAME, lambda f: np.save(f, id_order))
+    _write_atomic(path / SORTED_IDS_FILENAME, lambda f: np.save(f, id_array[id_order]))
+
+
+class _Interner:
+    """Assigns each distinct value a small integer, in first-seen order."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def __call__(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        return self.ids.setdefault(value, len(self.ids))
+
+    @property
+    def table(self) -> List[str]:
+        return list(self.ids)
+
+
+def write_chunk_store(path: str, docs: Iterable[Document]) -> int:
+    """
+    Write chunks in vector order as compressed blocks and fixed-size records.
+
+    Chunk texts are packed into zstd-compressed blocks of about
+    `BLOCK_SIZE` bytes. The source and title of every chunk, and the JSON of
+    its other metadata, are stored once in tables and referenced by index,
+    since all chunks of a page share them.
+
+    Args:
+        path: Index directory
+        docs: Chunks, in the same order as the vectors in the FAISS index
+
+    Returns:
+        Number of chunks written
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    compressor = zstd.ZstdCompressor(level=COMPRESSION_LEVEL)
+    sources, titles, extras = _Interner(), _Interner(), _Interner()
+    records = []
+    ids = []
+    block_offsets = [0]
+    block = bytearray()
+    blocks_tmp = path / (BLOCKS_FILENAME + ".tmp")
+
+    with open(blocks_tmp, "wb") as blocks_file:
+        for doc in docs:
+            text = doc.page_content.encode("utf-8")
+            metadata = dict(doc.metadata)
+            source = metadata.pop("source", None)
+            title = metadata.pop("title", None)
+            records.append((
+                len(block_offsets) - 1, len(block), len(text),
+                sources(source), titles(title),
+                extras(json.dumps(metadata, ensure_ascii=False, sort_keys=True)),
+            ))
+            ids.append((doc.id or "").encode("utf-8"))
+
+            # Chunks never straddle blocks, so a hit decompresses one block
+            block += text
+            if len(block) >= BLOCK_SIZE:
+                blocks_file.write(compressor.compress(bytes(block)))
+                block_offsets.append(blocks_file.tell())
+                block = bytearray()
+        if block:
+            blocks_file.write(compressor.compress(bytes(block)))
+            block_offsets.append(blocks_file.tell())
+
+    tables = {"sources": sources.table, "titles": titles.table, "extras": extras.table}
+    _write_atomic(path / RECORDS_FILENAME, lambda f: np.save(f, np.array(records, dtype=RECORD_DTYPE)))
+    _write_atomic(path / BLOCK_OFFSETS_FILENAME, lambda f: np.save(f, np.array(block_offsets, dtype=np.int64)))
+    _write_atomic(path / TABLES_FILENAME, lambda f: f.write(json.dumps(tables, ensure_ascii=False).encode("utf-8")))
+    _write_ids(path, ids)
+    os.replace(blocks_tmp, path / BLOCKS_FILENAME)
+    return len(ids)
+
+
+def _mmap_file(path: Path):
+    """Map a file read-only (empty files cannot be mapped)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MmapChunkStore:
+    """Read-only chunk store backed by memory-mapped files (mmap-v1 layout)."""
+
+    def __init__(self, path: str):
+        """
+        Open a chunk store.
+
+        Args:
+            path: Index directory written in the mmap-v1 layout
+        """
+        path = Path(path)
+        self._load_ids(path)
+        self._text = _mmap_file(path / TEXT_FILENAME)
+        self._meta = _mmap_file(path / META_FILENAME)
+        self._offsets = np.load(path / OFFSETS_FILENAME, mmap_mode="r")
+
+    def _load_ids(self, path: Path) -> None:
+        self._ids = np.load(path / IDS_FILENAME, mmap_mode="r")
+        self._id_order = np.load(path / ID_ORDER_FILENAME, mmap_mode="r")
+        self._sorted_ids = np.load(path / SORTED_IDS_FILENAME, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def id_at(self, position: int) -> str:
+        """Chunk ID stored at a vector position."""
+        return self._ids[position].decode("utf-8")
+
+    def get(self, position: int) -> Document:
+        """Read the chunk stored at a vector position."""
+        text_start, meta_start = self._offsets[position]
+        text_end, meta_end = self._offsets[position + 1]
+        return Document(
+            id=self.id_at(position),
+            page_content=self._text[text_start:text_end].decode("utf-8"),
+            metadata=json.loads(self._meta[meta_start:meta_end].decode("utf-8")),
+        )
+
+    def position_of(self, chunk_id: str) -> Optional[int]:
+        """Find a chunk's vector position by binary search over sorted IDs."""
+        key = chunk_id.encode("utf-8")
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            return int(self._id_order[i])
+        return None
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.get(position)
+
+
+class CompactChunkStore(MmapChunkStore):
+    """
+    Read-only chunk store over the mmap-v2 layout.
+
+    Records and compressed blocks stay memory-mapped; only the metadata
+    tables live in the heap. A chunk's block is decompressed when the chunk
+    is read, so a query only pays for its hits.
+    """
+
+    def __init__(self, path: str, block_cache_size: int = BLOCK_CACHE_SIZE):
+        """
+        Open a chunk store.
+
+        Args:
+            path: Index directory written by `write_chunk_store`
+            block_cache_size: Decompressed blocks kept in memory
+        """
+        path = Path(path)
+        self._load_ids(path)
+        self._blocks = _mmap_file(path / BLOCKS_FILENAME)
+        self._block_offsets = np.load(path / BLOCK_OFFSETS_FILENAME)
+        self._records = np.load(path / RECORDS_FILENAME, mmap_mode="r")
+        with open(path / TABLES_FILENAME, "r", encoding="utf-8") as f:
+            tables = json.load(f)
+        self._sources = tables["sources"]
+        self._titles = tables["titles"]
+        self._extras = tables["extras"]
+        # Decompressors must not be shared between threads
+        self._local = threading.local()
+        self._block = lru_cache(maxsize=block_cache_size)(self._decompress)
+
+    def _decompress(self, block: int) -> bytes:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstd.ZstdDecompressor()
+        start, end = self._block_offsets[block], self._block_offsets[block + 1]
+        return decompressor.decompress(self._blocks[start:end])
+
+    def get(self, position: int) -> Document:
+        """Read the chunk stored at a vector position."""
+        block, start, length, source, title, extra = self._records[position].tolist()
+        metadata = {}
+        if source >= 0:
+            metadata["source"] = self._sources[source]
+        if title >= 0:
+            metadata["title"] = self._titles[title]
+        metadata.update(json.loads(self._extras[extra]))
+        return Document(
+            id=self.id_at(position),
+            page_content=self._block(block)[start:start + length].decode("utf-8"),
+            metadata=metadata,
+        )
+
+
+def open_chunk_store(path: str) -> MmapChunkStore:
+    """Open the chunk store of an index directory, whichever mmap layout it uses."""
+    with open(Path(path) / STORE_FILENAME, "r", encoding="utf-8") as f:
+        version = json.load(f).get("format")
+    if version == LEGACY_FORMAT_VERSION:
+        return MmapChunkStore(path)
+    return CompactChunkStore(path)
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Read-only vector store over a memory-mapped FAISS index and chunk store.
+
+    The index and chunk files are mapped read-only, so vectors cannot be
+    added in place: `add_texts`, `add_documents` and `from_texts` raise
+    TypeError. To change the index, rebuild it with run_ingestion.py
+    (`--incremental` for changed pages), or open it as a writable in-memory
+    store with `load_faiss`.
+    """
+
+    def __init__(self, embedding_function: Embeddings, index: Any, chunks: MmapChunkStore):
+        """
+        Initialize store.
+
+        Args:
+            embedding_function: Embeddings used for queries
+            index: FAISS index whose positions match the chunk store
+            chunks: Chunk texts and metadata
+        """
+        self.embedding_function = embedding_function
+        self.index = index
+        self.chunks = chunks
+
+    @classmethod
+    def load(cls, path: str, embeddings: Embeddings) -> 'MmapVectorStore':
+        """Open an index directory without reading it into the heap."""
+        index = faiss.read_index(str(Path(path) / INDEX_FILENAME), MMAP_READ_FLAGS)
+        return cls(embeddings, index, open_chunk_store(path))
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    def similarity_search_with_score_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return the k nearest chunks with their L2 distances."""
+        scores, positions = self.index.search(np.array([embedding], dtype=np.float32), k)
+        return [
+            (self.chunks.get(int(position)), float(score))
+            for score, position in zip(scores[0], positions[0])
+            if position != -1
+        ]
+
+    def similarity_search_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k)
+
+    def get_by_ids(self, ids: List[str], /) -> List[Document]:
+        positions = [self.chunks.position_of(chunk_id) for chunk_id in ids]
+        return [self.chunks.get(p) for p in positions if p is not None]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  **kwargs: Any) -> List[str]:
+        raise TypeError(READ_ONLY_MESSAGE)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None, **kwargs: Any) -> 'MmapVectorStore':
+        raise TypeError(READ_ONLY_MESSAGE)
+
+
+def save_mmap_index(vectorstore: FAISS, path: str) -> None:
+    """
+    Save a FAISS vector store in the mmap format.
+
+    Args:
+        vectorstore: Store built during ingestion
+        path: Index directory
+    """
+    docs = (
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+        for i in range(len(vectorstore.index_to_docstore_id))
+    )
+    write_mmap_index(path, vectorstore.index, docs)
+
+
+def write_mmap_index(path: str, index: Any, docs: Iterable[Document]) -> None:
+    """
+    Write a FAISS index and its chunks in the mmap format.
+
+    Args:
+        path: Index directory
+        index: FAISS index
+        docs: Chunks in vector order (consumed lazily, so they need not fit in memory)
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    count = write_chunk_store(str(path), docs)
+    # Readers may have the old index memory-mapped; replace it, never rewrite it in place
+    tmp_path = path / (INDEX_FILENAME + ".tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, path / INDEX_FILENAME)
+
+    _write_atomic(
+        path / STORE_FILENAME,
+        lambda f: f.write(json.dumps({"format": FORMAT_VERSION, "count": count}).encode("utf-8"))
+    )
+
+    # Files of older formats are no longer needed
+    for name in ("index.pkl", TEXT_FILENAME, META_FILENAME, OFFSETS_FILENAME):
+        if (path / name).exists():
+            (path / name).unlink()
+
+
+def load_faiss(path: str, embeddings: Embeddings) -> FAISS:
+    """
+    Load an mmap-format index as a writable, in-memory FAISS store.
+
+    Used when an index has to be modified, e.g. by incremental ingestion.
+    """
+    index = faiss.read_index(str(Path(path) / INDEX_FILENAME))
+    docs = list(open_chunk_store(path))
+    return FAISS(
+        embeddings,
+        index,
+        InMemoryDocstore({doc.id: doc for doc in docs}),
+        {i: doc.id for i, doc in enumerate(docs)},
+    )
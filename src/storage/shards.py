@@ -0,0 +1,103 @@
+"""
+Vector index split into shards over contiguous ranges of vector positions.
+
+Shard i holds the vectors at positions [start, end) of the full index, so a
+position found in a shard maps back to the chunk store, the BM25 index and
+the metadata partitions of the full index by adding `start`.
+
+Layout, next to the full index:
+
+* `shards/shards.json`: format, total count and the range of every shard
+* `shards/shard-000.faiss`, ...: one FAISS index per shard, of the same type
+  as the full index
+"""
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from src.storage.index_types import build_index
+
+SHARDS_DIRNAME = "shards"
+SHARDS_FILENAME = "shards.json"
+SHARDS_FORMAT_VERSION = "shards-v1"
+
+
+def shard_ranges(count: int, num_shards: int) -> List[Tuple[int, int]]:
+    """Split positions [0, count) into at most `num_shards` near-equal, non-empty ranges."""
+    bounds = np.linspace(0, count, min(num_shards, count) + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def write_shards(
+        path: str,
+        vectors: np.ndarray,
+        index_type: str,
+        index_params: Optional[Dict[str, Any]],
+        num_shards: int
+) -> None:
+    """
+    Build and save one index per shard.
+
+    The new shards are written to a temporary directory that then replaces
+    the old one, so a restarting worker never reads a half-written set.
+
+    Args:
+        path: Index directory
+        vectors: float32 array of every vector, in position order
+        index_type: FAISS index type of every shard
+        index_params: Build parameters (IVF list counts left unset are derived per shard)
+        num_shards: Number of shards
+    """
+    shards_dir = Path(path) / SHARDS_DIRNAME
+    tmp_dir = shards_dir.with_name(SHARDS_DIRNAME + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    shards = []
+    for shard, (start, end) in enumerate(shard_ranges(len(vectors), num_shards)):
+        filename = f"shard-{shard:03d}.faiss"
+        faiss.write_index(build_index(index_type, vectors[start:end], index_params), str(tmp_dir / filename))
+        shards.append({"file": filename, "start": start, "end": end})
+
+    manifest = {"format": SHARDS_FORMAT_VERSION, "count": len(vectors), "shards": shards}
+    (tmp_dir / SHARDS_FILENAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    shutil.rmtree(shards_dir, ignore_errors=True)
+    tmp_dir.rename(shards_dir)
+    print(f"Saved {len(shards)} shards to {shards_dir}")
+
+
+def remove_shards(path: str) -> None:
+    """Delete the shards of an index, e.g. after it was rebuilt unsharded."""
+    shutil.rmtree(Path(path) / SHARDS_DIRNAME, ignore_errors=True)
+
+
+def is_sharded_index(path: str) -> bool:
+    """Whether an index directory has shards."""
+    return (Path(path) / SHARDS_DIRNAME / SHARDS_FILENAME).exists()
+
+
+def load_shard_manifest(path: str) -> Dict[str, Any]:
+    """
+    Read the shard layout of an index.
+
+    Returns:
+        Dict with `count` and `shards`, a list of {"path", "start", "end"}
+        with absolute shard file paths
+    """
+    shards_dir = Path(path) / SHARDS_DIRNAME
+    manifest = json.loads((shards_dir / SHARDS_FILENAME).read_text(encoding="utf-8"))
+    if manifest.get("format") != SHARDS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported shard format {manifest.get('format')!r} in {shards_dir}")
+
+    return {
+        "count": manifest["count"],
+        "shards": [
+            {"path": str(shards_dir / shard["file"]), "start": shard["start"], "end": shard["end"]}
+            for shard in manifest["shards"]
+        ],
+    }
@@ -0,0 +1,10 @@
+"""Dependency-free text helpers shared by the API and the retrieval caches."""
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
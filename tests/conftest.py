@@ -31,4 +31,41 @@ def sample_documents():
                          "racing cars.",
             metadata={"source": "docs/Formula One.html", "title": "Formula One - Wikipedia"}
         ),
-    ]
\ No newline at end of file
+    ]
+
+
+@pytest.fixture
+def offline_retriever(monkeypatch, tmp_path, sample_documents):
+    """Retriever over a small index built with deterministic fake embeddings."""
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from src.retrieval.bm25 import BM25Index
+    from src.retrieval.relevance import ScoreCutoffs
+    from src.retrieval.retriever import DocumentRetriever
+    from src.storage.mmap_store import save_mmap_index
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(
+        "src.retrieval.retriever.get_embedding_cache_path", lambda: tmp_path / "embeddings.sqlite"
+    )
+
+    embeddings = DeterministicFakeEmbedding(size=16)
+    save_mmap_index(
+        FAISS.from_documents(
+            sample_documents, embeddings, ids=[f"chunk-{i}" for i in range(len(sample_documents))]
+        ),
+        str(tmp_path / "index")
+    )
+    BM25Index.build(doc.page_content for doc in sample_documents).save(str(tmp_path / "index"))
+
+    DocumentRetriever._instance = None
+    DocumentRetriever._vectorstore = None
+    # Fake embeddings are not unit length, so their scores carry no relevance
+    retriever = DocumentRetriever(index_path=str(tmp_path / "index"), k=2, mode="hybrid", cutoffs=ScoreCutoffs())
+    retriever._vectorstore.embedding_function = embeddings
+
+    yield retriever
+
+    DocumentRetriever._instance = None
+    DocumentRetriever._vectorstore = None
@@ -81,3 +81,395 @@ def test_404_endpoint(client):
     assert response.status_code == 404
     data = json.loads(response.data)
     assert 'error' in data
+
+
+def test_chat_batch_endpoint_reports_per_item_errors(monkeypatch, client):
+    from langchain_core.documents import Document
+
+    def fake_retrieve_batch(queries, k=5, filters=None):
+        return [[Document(page_content=q, metadata={"source": "a.html"})] for q in queries]
+
+    def fake_generate(query, docs):
+        if query == "bad":
+            raise RuntimeError("LLM unavailable")
+        return f"Answer to {query}"
+
+    monkeypatch.setattr(
+        "src.api.app.retriever",
+        type("R", (), {"retrieve_batch": staticmethod(fake_retrieve_batch)})()
+    )
+    monkeypatch.setattr(
+        "src.api.app.generator",
+        type("G", (), {"generate": staticmethod(fake_generate)})()
+    )
+
+    resp = client.post("/api/chat/batch", json={"queries": ["first", "", "bad", "last"]})
+
+    assert resp.status_code == 200
+    results = resp.json["results"]
+    assert [r["query"] for r in results] == ["first", "", "bad", "last"]
+    assert results[0]["answer"] == "Answer to first"
+    assert "empty" in results[1]["error"].lower()
+    assert results[2]["error"] == "LLM unavailable"
+    assert results[3]["num_sources"] == 1
+    assert resp.json["num_errors"] == 2
+
+
+def test_chat_batch_endpoint_rejects_missing_queries(monkeypatch, client):
+    monkeypatch.setattr("src.api.app.retriever", object())
+    monkeypatch.setattr("src.api.app.generator", object())
+
+    resp = client.post("/api/chat/batch", json={"queries": []})
+
+    assert resp.status_code == 400
+
+
+def test_async_chat_serves_concurrent_requests(monkeypatch):
+    import asyncio
+    import time
+
+    from langchain_core.documents import Document
+
+    from src.api.async_app import app as async_app
+
+    class SlowRetriever:
+        async def aretrieve(self, query, k=5, filters=None):
+            await asyncio.sleep(0.05)
+            return [Document(page_content=query, metadata={"source": "a.html"})]
+
+    class SlowGenerator:
+        async def agenerate(self, query, docs):
+            await asyncio.sleep(0.2)
+            return f"Answer to {query}\n\nSources:\n- a.html"
+
+    monkeypatch.setattr("src.api.async_app.retriever", SlowRetriever())
+    monkeypatch.setattr("src.api.async_app.generator", SlowGenerator())
+
+    async def run():
+        client = async_app.test_client()
+        responses = await asyncio.gather(*(
+            client.post("/api/chat", json={"query": f"q{i}"}) for i in range(50)
+        ))
+        return [(r.status_code, await r.get_json()) for r in responses]
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert all(status == 200 for status, _ in results)
+    assert results[7][1] == {"query": "q7", "answer": "Answer to q7\n\nSources:\n- a.html", "num_sources": 1}
+    # 50 requests of 0.25s each overlap instead of queueing behind each other
+    assert elapsed < 5
+
+
+def test_chat_stream_endpoint_sends_metadata_tokens_and_sources(monkeypatch, client):
+    from langchain_core.documents import Document
+
+    def fake_retrieve(query, k=5, filters=None):
+        return [Document(page_content="Built in 1927.", metadata={"source": "docs/Nürburgring.html"})]
+
+    def fake_stream(query, docs):
+        yield "Built in 1927."
+        yield "\n\nSources:\n- Nürburgring.html"
+
+    monkeypatch.setattr(
+        "src.api.app.retriever",
+        type("R", (), {"retrieve": staticmethod(fake_retrieve)})()
+    )
+    monkeypatch.setattr(
+        "src.api.app.generator",
+        type("G", (), {"stream": staticmethod(fake_stream)})()
+    )
+
+    resp = client.post("/api/chat/stream", json={"query": "When was it built?"})
+
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/event-stream"
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in resp.get_data(as_text=True).strip().split("\n\n")
+    ]
+    assert [name for name, _ in events] == ["metadata", "token", "token", "done"]
+    assert events[0][1]["num_sources"] == 1
+    assert events[1][1] == {"text": "Built in 1927."}
+    assert events[-1][1]["sources"] == ["Nürburgring.html"]
+    assert events[-1][1]["ttft_ms"] is not None
+
+
+def test_metrics_endpoint_and_debug_timings(monkeypatch, client):
+    from langchain_core.documents import Document
+
+    from src.monitoring.metrics import stage_timer
+
+    def fake_retrieve(query, k=5, filters=None):
+        with stage_timer("retrieve"):
+            return [Document(page_content="Built in 1927.", metadata={"source": "a.html"})]
+
+    def fake_generate(query, docs):
+        with stage_timer("llm"):
+            return "Built in 1927.\n\nSources:\n- a.html"
+
+    monkeypatch.setattr(
+        "src.api.app.retriever",
+        type("R", (), {"retrieve": staticmethod(fake_retrieve)})()
+    )
+    monkeypatch.setattr(
+        "src.api.app.generator",
+        type("G", (), {"generate": staticmethod(fake_generate)})()
+    )
+
+    plain = client.post("/api/chat", json={"query": "When?"})
+    debug = client.post("/api/chat", json={"query": "When?", "debug": True})
+    metrics = client.get("/api/metrics")
+
+    assert "timings" not in plain.json
+    assert set(debug.json["timings"]) == {"retrieve_ms", "llm_ms", "total_ms"}
+    assert metrics.status_code == 200
+    body = metrics.get_data(as_text=True)
+    assert 'rag_stage_duration_seconds_count{stage="llm"}' in body
+    assert 'rag_http_requests_total{endpoint="/api/chat",status="200"}' in body
+
+
+def test_ready_endpoint_reports_cold_start(monkeypatch, client):
+    from src.api.warmup import ColdStart, warm_components
+
+    calls = []
+    retriever = type("R", (), {"retrieve": staticmethod(lambda query: calls.append("retrieve"))})()
+    llm = type("L", (), {"invoke": staticmethod(lambda text, **kwargs: calls.append(kwargs))})()
+    generator = type("G", (), {
+        "assembler": type("A", (), {"count_tokens": staticmethod(len)})(),
+        "llm": llm,
+    })()
+
+    monkeypatch.setattr("src.api.app.retriever", None)
+    monkeypatch.setattr("src.api.app.generator", None)
+    starting = client.get("/api/ready")
+
+    cold_start = ColdStart()
+    warm_components(retriever, generator, cold_start)
+    monkeypatch.setattr("src.api.app.retriever", retriever)
+    monkeypatch.setattr("src.api.app.generator", generator)
+    monkeypatch.setattr("src.api.app.cold_start", cold_start)
+    ready = client.get("/api/ready")
+
+    assert starting.status_code == 503
+    assert ready.status_code == 200
+    assert calls == ["retrieve", {"max_tokens": 1}]
+    assert set(ready.json["cold_start"]) == {
+        "warm_retrieval_ms", "warm_generation_ms", "since_process_start_ms"
+    }
+
+
+def test_app_import_does_not_load_heavy_modules():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, src.api.app, src.api.async_app; "
+        "print(sorted(m for m in ('faiss', 'langchain_openai', 'langchain_community', 'langsmith') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    import threading
+    import time
+
+    from src.api.singleflight import SingleFlight
+
+    flight = SingleFlight("test")
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do(("q", 5), work)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 4
+    # Finished calls are not cached
+    assert flight.do(("q", 5), work) == ("answer", False)
+
+
+def test_async_chat_coalesces_identical_requests(monkeypatch):
+    import asyncio
+
+    from langchain_core.documents import Document
+
+    from src.api.async_app import app as async_app
+
+    calls = {"retrieve": 0, "generate": 0}
+
+    class SlowRetriever:
+        async def aretrieve(self, query, k=5, filters=None):
+            calls["retrieve"] += 1
+            await asyncio.sleep(0.05)
+            return [Document(page_content=query, metadata={"source": "a.html"})]
+
+    class SlowGenerator:
+        async def agenerate(self, query, docs):
+            calls["generate"] += 1
+            await asyncio.sleep(0.1)
+            return "Answer\n\nSources:\n- a.html"
+
+    monkeypatch.setattr("src.api.async_app.retriever", SlowRetriever())
+    monkeypatch.setattr("src.api.async_app.generator", SlowGenerator())
+
+    async def run():
+        client = async_app.test_client()
+        queries = ["Who won?", "Who  won? ", "Who won?", "Who lost?"]
+        responses = await asyncio.gather(*(
+            client.post("/api/chat", json={"query": query, "debug": True}) for query in queries
+        ))
+        return [await r.get_json() for r in responses]
+
+    results = asyncio.run(run())
+
+    assert calls == {"retrieve": 2, "generate": 2}
+    assert [r["coalesced"] for r in results] == [False, True, True, False]
+    assert results[1]["query"] == "Who  won? "
+    assert all(r["answer"] == "Answer\n\nSources:\n- a.html" for r in results)
+
+
+def test_semantic_answer_cache_matches_similar_queries_with_same_sources():
+    from src.api.answer_cache import SemanticAnswerCache
+
+    cache = SemanticAnswerCache(max_size=2, ttl=None, threshold=0.9, name=None)
+    cache.put([1.0, 0.0, 0.1], ["c1", "c2"], "Built in 1927.", "v1")
+
+    assert cache.get([0.9, 0.0, 0.15], ["c2", "c1"], "v1") == "Built in 1927."
+    assert cache.get([0.9, 0.0, 0.15], ["c1", "c3"], "v1") is None
+    assert cache.get([0.0, 1.0, 0.0], ["c1", "c2"], "v1") is None
+
+    cache.put([0.0, 1.0, 0.0], ["c3"], "Second.", "v1")
+    cache.get([1.0, 0.0, 0.1], ["c1", "c2"], "v1")
+    cache.put([0.0, 0.0, 1.0], ["c4"], "Third.", "v1")
+    # The least recently used answer made room
+    assert cache.get([0.0, 1.0, 0.0], ["c3"], "v1") is None
+    assert cache.get([1.0, 0.0, 0.1], ["c1", "c2"], "v1") == "Built in 1927."
+
+    # A rebuilt index invalidates every answer
+    assert cache.get([1.0, 0.0, 0.1], ["c1", "c2"], "v2") is None
+    assert len(cache) == 0
+
+
+def test_chat_reuses_answer_of_similar_question(monkeypatch, client):
+    from langchain_core.documents import Document
+
+    from src.api.answer_cache import SemanticAnswerCache
+    from src.retrieval.retriever import RetrievalResult
+
+    embeddings = {"who built the nurburgring": [1.0, 0.2], "Nürburgring builder?": [1.0, 0.25], "Other": [0.0, 1.0]}
+    generated = []
+
+    class Retriever:
+        index_version = "v1"
+
+        def retrieve(self, query, k=5, filters=None):
+            docs = [Document(id="chunk-0", page_content="Built in 1927.", metadata={"source": "a.html"})]
+            return RetrievalResult(docs, query_embedding=embeddings.get(query))
+
+    def fake_generate(query, docs):
+        generated.append(query)
+        return f"Answer to {query}"
+
+    monkeypatch.setattr("src.api.app.retriever", Retriever())
+    monkeypatch.setattr("src.api.app.generator", type("G", (), {"generate": staticmethod(fake_generate)})())
+    monkeypatch.setattr("src.api.app.answer_cache", SemanticAnswerCache(threshold=0.95, name=None))
+
+    first = client.post("/api/chat", json={"query": "who built the nurburgring", "debug": True})
+    similar = client.post("/api/chat", json={"query": "Nürburgring builder?", "debug": True})
+    other = client.post("/api/chat", json={"query": "Other", "debug": True})
+    # A BM25 match is not embedded, so it bypasses the answer cache
+    lexical = client.post("/api/chat", json={"query": "Nurburgring 1927", "debug": True})
+
+    assert generated == ["who built the nurburgring", "Other", "Nurburgring 1927"]
+    assert similar.json["answer"] == "Answer to who built the nurburgring"
+    assert [r.json["answer_cached"] for r in (first, similar, other, lexical)] == [False, True, False, False]
+
+
+def test_chat_answers_without_llm_when_no_source_is_relevant(monkeypatch, client):
+    from src.generation.generator import FALLBACK_ANSWER
+    from src.retrieval.retriever import RetrievalResult
+
+    def fake_retrieve(*args, **kwargs):
+        return RetrievalResult([], scores=[], candidate_scores=[0.123456, 0.1])
+
+    def fake_generate(*args, **kwargs):
+        raise AssertionError("no LLM call without relevant sources")
+
+    monkeypatch.setattr("src.api.app.retriever", type("R", (), {"retrieve": staticmethod(fake_retrieve)})())
+    monkeypatch.setattr("src.api.app.generator", type("G", (), {"generate": staticmethod(fake_generate)})())
+
+    resp = client.post("/api/chat", json={"query": "Best pizza in Monza?"})
+
+    assert resp.status_code == 200
+    assert resp.json["answer"] == FALLBACK_ANSWER
+    assert resp.json["num_sources"] == 0
+    assert resp.json["scores"] == []
+    assert resp.json["candidate_scores"] == [0.1235, 0.1]
+
+
+def test_chat_endpoints_reject_filters_the_index_cannot_serve(monkeypatch, client):
+    message = "This index has no metadata partitions; re-run ingestion to use filters"
+
+    def reject(*args, **kwargs):
+        raise ValueError(message)
+
+    monkeypatch.setattr("src.api.app.retriever", type("R", (), {"retrieve": reject, "retrieve_batch": reject})())
+    monkeypatch.setattr("src.api.app.generator", object())
+    body = {"query": "Who won?", "filters": {"year": [2023]}}
+
+    for path, json in [
+        ("/api/chat", body),
+        ("/api/chat/stream", body),
+        ("/api/chat/batch", {"queries": ["Who won?"], "filters": {"year": [2023]}}),
+    ]:
+        resp = client.post(path, json=json)
+
+        assert resp.status_code == 400
+        assert resp.json == {"error": message}
+
+
+def test_async_chat_endpoints_reject_filters_the_index_cannot_serve(monkeypatch):
+    import asyncio
+
+    from src.api.async_app import app as async_app
+
+    message = "This index has no metadata partitions; re-run ingestion to use filters"
+
+    class RejectingRetriever:
+        async def aretrieve(self, query, k=5, filters=None):
+            raise ValueError(message)
+
+        async def aretrieve_batch(self, queries, k=5, filters=None):
+            raise ValueError(message)
+
+    monkeypatch.setattr("src.api.async_app.retriever", RejectingRetriever())
+    monkeypatch.setattr("src.api.async_app.generator", object())
+    body = {"query": "Who won?", "filters": {"year": [2023]}}
+
+    async def run():
+        client = async_app.test_client()
+        responses = [
+            await client.post(path, json=json) for path, json in [
+                ("/api/chat", body),
+                ("/api/chat/stream", body),
+                ("/api/chat/batch", {"queries": ["Who won?"], "filters": {"year": [2023]}}),
+            ]
+        ]
+        return [(r.status_code, await r.get_json()) for r in responses]
+
+    assert asyncio.run(run()) == [(400, {"error": message})] * 3
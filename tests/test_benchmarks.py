@@ -0,0 +1,105 @@
+import numpy as np
+
+
+def test_hashing_embeddings_are_deterministic():
+    from benchmarks.stubs import HashingEmbeddings
+
+    embeddings = HashingEmbeddings(dim=64)
+    first = np.array(embeddings.embed_query("Monaco Grand Prix winners"))
+    again = np.array(HashingEmbeddings(dim=64).embed_query("Monaco Grand Prix winners"))
+    related = np.array(embeddings.embed_query("winners of the Monaco Grand Prix"))
+    unrelated = np.array(embeddings.embed_query("turbocharged engine displacement"))
+
+    assert np.array_equal(first, again)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert first @ related > first @ unrelated
+
+
+def test_stub_chat_model_cites_first_source(monkeypatch, sample_documents):
+    from benchmarks.stubs import StubChatModel
+    from src.generation.generator import AnswerGenerator, parse_sources
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    generator = AnswerGenerator()
+    generator.llm = StubChatModel()
+
+    answer = generator.generate("Where is the Nürburgring?", sample_documents)
+    streamed = "".join(generator.stream("Where is the Nürburgring?", sample_documents))
+
+    assert parse_sources(answer) == ["Nurburgring.html"]
+    assert streamed == answer
+
+
+def test_compare_matches_synthetic_runs_by_size():
+    from benchmarks.pipeline import compare
+
+    previous = {"synthetic": [{"num_vectors": 10000, "retrieve": {"p50_ms": 2.0}}]}
+    current = {"synthetic": [
+        {"num_vectors": 1000, "retrieve": {"p50_ms": 0.5}},
+        {"num_vectors": 10000, "retrieve": {"p50_ms": 1.5}},
+    ]}
+
+    rows = compare(previous, current)
+
+    assert [row["metric"] for row in rows] == ["synthetic.10000.num_vectors", "synthetic.10000.retrieve.p50_ms"]
+    assert rows[1]["change"] == -0.25
+
+
+def test_openai_stub_serves_the_openai_clients():
+    import asyncio
+
+    import httpx
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+    from benchmarks.openai_stub import StubSettings, create_app
+    from benchmarks.stubs import HashingEmbeddings
+
+    app = create_app(StubSettings(embedding_latency=0, chat_latency=0, tokens_per_second=0, answer_tokens=12))
+    client_args = {
+        "base_url": "http://stub/v1",
+        "api_key": "sk-stub",
+        "http_async_client": httpx.AsyncClient(transport=httpx.ASGITransport(app=app)),
+    }
+    embeddings = OpenAIEmbeddings(model="text-embedding-3-small", **client_args)
+    llm = ChatOpenAI(model="gpt-4o-mini", stream_usage=True, **client_args)
+    prompt = "[SOURCE 1: Nürburgring.html]\nTitle: Nürburgring\nContent: Built in 1927."
+
+    async def run():
+        vector = await embeddings.aembed_query("Monaco Grand Prix winners")
+        reply = await llm.ainvoke(prompt)
+        chunks = [chunk async for chunk in llm.astream(prompt)]
+        return vector, reply, chunks
+
+    vector, reply, chunks = asyncio.run(run())
+    streamed = "".join(chunk.content for chunk in chunks)
+
+    assert np.allclose(vector, HashingEmbeddings().embed_query("Monaco Grand Prix winners"), atol=1e-6)
+    assert reply.content.endswith("Sources:\n- Nürburgring.html")
+    assert streamed == reply.content
+    assert reply.usage_metadata["output_tokens"] > 12
+    assert any(chunk.usage_metadata for chunk in chunks)
+
+
+def test_load_test_reports_throughput_errors_and_latency():
+    import asyncio
+
+    import httpx
+
+    from benchmarks.load_test import run_load
+
+    def handler(request):
+        if b"fail" in request.content:
+            return httpx.Response(500, json={"error": "Internal server error"})
+        return httpx.Response(200, json={"answer": "ok", "timings": {"llm_ms": 2.0}})
+
+    results = asyncio.run(run_load(
+        "http://api", ["q1", "q2", "q3", "fail"], concurrency=4, num_requests=20,
+        debug=True, transport=httpx.MockTransport(handler),
+    ))
+
+    assert results["requests"] == 20
+    assert results["errors"] == 5 and results["error_rate"] == 0.25
+    assert results["status_codes"] == {"200": 15, "500": 5}
+    assert results["latency"]["p99_ms"] >= results["latency"]["p50_ms"]
+    assert results["stages_mean_ms"] == {"llm_ms": 2.0}
+    assert results["error_samples"][0].startswith("500")
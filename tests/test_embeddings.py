@@ -0,0 +1,52 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.embeddings.cache import CachedEmbeddings, EmbeddingCache, cache_key
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+def test_cache_key_normalizes_whitespace():
+    assert cache_key("m", "Lombank  Trophy\n") == cache_key("m", "Lombank Trophy")
+    assert cache_key("m", "Lombank Trophy") != cache_key("other", "Lombank Trophy")
+
+
+def test_cached_embeddings_skip_repeated_texts(tmp_path):
+    underlying = CountingEmbeddings(size=8)
+    cache = EmbeddingCache(tmp_path / "cache.sqlite")
+    embeddings = CachedEmbeddings(underlying, cache, "fake-model")
+
+    first = embeddings.embed_documents(["a", "b"])
+    second = embeddings.embed_documents(["b", "c"])
+    query = embeddings.embed_query("a")
+
+    assert underlying.calls == 3
+    assert second[0] == pytest.approx(first[1], rel=1e-6)
+    assert query == pytest.approx(first[0], rel=1e-6)
+    assert cache.stats() == {"hits": 2, "misses": 3, "entries": 3}
+
+
+def test_cache_persists_and_evicts(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = EmbeddingCache(path, max_entries=2)
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    cache.get_many(["a"])
+    cache.put_many({"c": [3.0]})
+    cache.put_many({"c": [4.0]})
+    assert len(cache) == 2
+    cache.close()
+
+    reopened = EmbeddingCache(path, max_entries=2)
+
+    assert reopened.get_many(["a", "b", "c"]) == {"a": [1.0], "c": [4.0]}
+    assert len(reopened) == 2
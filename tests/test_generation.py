@@ -1,4 +1,4 @@
-from src.generation.generator import AnswerGenerator
+from src.generation.generator import AnswerGenerator, parse_sources
 
 
 def test_generate_with_no_documents():
@@ -50,3 +50,74 @@ def test_generate_with_documents(sample_documents):
     # Check result
     assert "motorsports complex" in result
     assert "Nurburgring.html" in result
+
+
+def test_stream_yields_llm_chunks(monkeypatch, sample_documents):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    class FakeLLM:
+        def stream(self, messages):
+            for text in ["The Nürburgring", "", " is in Germany."]:
+                yield type("Chunk", (), {"content": text})()
+
+    generator = AnswerGenerator()
+    generator.llm = FakeLLM()
+
+    assert list(generator.stream("Where is it?", sample_documents)) == ["The Nürburgring", " is in Germany."]
+    assert list(generator.stream("Where is it?", [])) == ["I don't know based on the provided documents."]
+
+
+def test_parse_sources():
+    answer = "It was built in 1927.\n\nSources:\n- Nürburgring.html\n- Germany.html\n"
+
+    assert parse_sources(answer) == ["Nürburgring.html", "Germany.html"]
+    assert parse_sources("I don't know based on the provided documents.") == []
+
+
+def _chunk(text, source, position):
+    from langchain_core.documents import Document
+    return Document(
+        id=f"0123456789abcdef-{position:05d}",
+        page_content=text,
+        metadata={"source": f"docs/{source}", "title": f"{source} - Wikipedia"}
+    )
+
+
+def test_context_merges_overlapping_chunks_of_a_source():
+    from src.generation.generator import ContextAssembler
+
+    first = _chunk("The circuit was built in the Eifel mountains. Construction began in 1925.", "Ring.html", 0)
+    second = _chunk("Construction began in 1925. It opened in June 1927.", "Ring.html", 1)
+
+    sections = ContextAssembler(max_tokens=1000).assemble([second, first])
+
+    assert len(sections) == 1
+    assert [p.text for p in sections[0].passages] == [
+        "The circuit was built in the Eifel mountains. Construction began in 1925. It opened in June 1927."
+    ]
+
+
+def test_context_drops_near_duplicates_and_keeps_relevance_order():
+    from src.generation.generator import ContextAssembler
+
+    text = "Formula One is the highest class of international racing for open-wheel single-seater cars."
+    docs = [
+        _chunk("The M196 was a straight-8 engine used in 1954 and 1955.", "M196.html", 3),
+        _chunk(text, "Formula One.html", 0),
+        _chunk(text + " Mirror", "Mirror.html", 7),
+    ]
+
+    sections = ContextAssembler(max_tokens=1000).assemble(docs)
+
+    assert [s.source for s in sections] == ["docs/M196.html", "docs/Formula One.html"]
+
+
+def test_context_respects_token_budget(monkeypatch, sample_documents):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    generator = AnswerGenerator(max_context_tokens=40)
+    context = generator._build_context(sample_documents)
+
+    # Best-ranked source first; the budget truncates before the last one
+    assert context.startswith("[SOURCE 1: Nurburgring.html]")
+    assert "Formula One.html" not in context
+    assert generator.assembler.count_tokens(context) < 80
@@ -0,0 +1,359 @@
+import os
+import threading
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.ingestion.chunker import SectionTokenChunker
+from src.ingestion.embedding_pipeline import BatchEmbedder, pack_batches
+from src.ingestion.html_loader import ParallelHTMLLoader, parse_html_file
+from src.ingestion.ingest import DocumentIngestion
+from src.ingestion.manifest import IngestionManifest
+from src.ingestion.parsed_corpus import ParsedCorpus, ParsedCorpusLoader
+from src.retrieval.relevance import ScoreCutoffs
+from src.retrieval.retriever import DocumentRetriever
+from src.storage.shards import load_shard_manifest
+
+SAMPLE_PAGE = """<html><head><title>Lombank Trophy - Wikipedia</title></head>
+<body>
+<div id="mw-content-text">
+<h2>History<span class="mw-editsection">[edit]</span></h2>
+<p>The Lombank Trophy was held at Snetterton.<sup class="reference">[1]</sup></p>
+<table class="navbox"><tr><td>Non-championship races</td></tr></table>
+<div class="reflist"><ol class="references"><li>Motor Sport, 1960</li></ol></div>
+</div>
+</body></html>"""
+
+
+def test_parse_html_file_strips_boilerplate(tmp_path):
+    page = tmp_path / "Lombank Trophy.html"
+    page.write_text(SAMPLE_PAGE, encoding="utf-8")
+
+    doc = parse_html_file(str(page))
+
+    assert "held at Snetterton." in doc.page_content
+    assert "[edit]" not in doc.page_content
+    assert "[1]" not in doc.page_content
+    assert "Non-championship races" not in doc.page_content
+    assert "Motor Sport" not in doc.page_content
+
+
+def test_parse_html_file_metadata(tmp_path):
+    page = tmp_path / "Lombank Trophy.html"
+    page.write_text(SAMPLE_PAGE, encoding="utf-8")
+
+    doc = parse_html_file(str(page))
+
+    assert doc.metadata["source"] == str(page)
+    assert doc.metadata["title"] == "Lombank Trophy - Wikipedia"
+
+
+def test_parse_html_file_extracts_structured_metadata(tmp_path):
+    page = tmp_path / "1960 Lombank Trophy.html"
+    page.write_text(SAMPLE_PAGE.replace("Lombank Trophy - Wikipedia", "1960 Lombank Trophy - Wikipedia").replace(
+        '<p>The Lombank', '<table class="infobox vevent"><tr><th class="infobox-label">Date</th>'
+        '<td>26 March 1960</td></tr><tr><th class="infobox-label">Location</th>'
+        '<td><a href="#">Snetterton Motor Racing Circuit</a>, <a href="#">Norfolk</a></td></tr>'
+        '<tr><th class="infobox-label">Driver</th><td><a href="#">Innes Ireland</a></td></tr>'
+        '</table><p>The Lombank'
+    ), encoding="utf-8")
+
+    metadata = parse_html_file(str(page)).metadata
+
+    assert metadata["year"] == 1960
+    assert metadata["category"] == "race"
+    assert metadata["entities"] == [
+        "1960 Lombank Trophy", "Snetterton Motor Racing Circuit", "Norfolk", "Innes Ireland"
+    ]
+
+
+def test_parse_html_file_locates_section_headings(tmp_path):
+    page = tmp_path / "Lombank Trophy.html"
+    page.write_text(SAMPLE_PAGE, encoding="utf-8")
+
+    doc = parse_html_file(str(page))
+
+    [[offset, level, heading]] = doc.metadata["sections"]
+    assert (level, heading) == (2, "History")
+    assert doc.page_content[offset:].startswith("History\nThe Lombank Trophy")
+
+
+def _sectioned_document():
+    parts = [("", 0, "Lead paragraph about the race. " * 6), ("History", 2, "Early years. " * 40),
+             ("Revival", 3, "The race returned. " * 8), ("Results", 2, "Winner was Innes Ireland.")]
+    text, sections = "", []
+    for heading, level, body in parts:
+        if heading:
+            sections.append([len(text), level, heading])
+            text += heading + "\n"
+        text += body.strip() + "\n\n"
+    return Document(page_content=text, metadata={"source": "docs/a.html", "sections": sections})
+
+
+def test_section_chunker_cuts_at_headings_within_token_limit():
+    chunker = SectionTokenChunker(chunk_size=80, chunk_overlap=10)
+
+    chunks = chunker.split_document(_sectioned_document())
+
+    assert all(len(chunker.encoding.encode(c.page_content)) <= 80 for c in chunks)
+    assert all("sections" not in c.metadata and c.metadata["source"] == "docs/a.html" for c in chunks)
+    assert [c.metadata["section_path"] for c in chunks if c.page_content.startswith(("History", "Revival"))] == [
+        ["History"], ["History", "Revival"]
+    ]
+    # Short sections share a chunk, but overlap never reaches back past a heading
+    assert chunks[-1].page_content.endswith("Results\nWinner was Innes Ireland.")
+    assert "Early years." not in chunks[-1].page_content
+
+
+def test_parallel_loader_loads_all_files(tmp_path):
+    for name in ["a.html", "b.html", "c.html"]:
+        (tmp_path / name).write_text(SAMPLE_PAGE, encoding="utf-8")
+
+    docs = ParallelHTMLLoader(str(tmp_path), max_workers=2).load()
+
+    assert [d.metadata["source"].split("/")[-1] for d in docs] == ["a.html", "b.html", "c.html"]
+
+
+def test_parsed_corpus_only_parses_new_or_changed_pages(monkeypatch, tmp_path):
+    import src.ingestion.html_loader as html_loader
+
+    docs_path = tmp_path / "docs"
+    docs_path.mkdir()
+    for name in ["a.html", "b.html", "c.html"]:
+        _write_page(docs_path / name, f"Page {name}.")
+    parsed = []
+    monkeypatch.setattr(html_loader, "parse_html_file", lambda path: parsed.append(path) or parse_html_file(path))
+
+    def load():
+        parsed.clear()
+        loader = ParallelHTMLLoader(str(docs_path), max_workers=1)
+        return ParsedCorpusLoader(loader, ParsedCorpus(str(tmp_path / "parsed"))).load()
+
+    first = load()
+    assert len(parsed) == 3
+
+    _write_page(docs_path / "b.html", "Page b.html, revised.")
+    os.utime(docs_path / "c.html", ns=(0, 0))  # touched, same contents
+    second = load()
+
+    assert [p.split("/")[-1] for p in parsed] == ["b.html"]
+    assert [d.page_content for d in second] == [
+        first[0].page_content, first[1].page_content.replace("b.html.", "b.html, revised."), first[2].page_content
+    ]
+    assert second[0].metadata == first[0].metadata
+    assert load() == second and parsed == []
+
+
+def _write_page(path, body):
+    path.write_text(SAMPLE_PAGE.replace("The Lombank Trophy was held at Snetterton.", body), encoding="utf-8")
+
+
+def _make_ingestion(monkeypatch, docs_path, index_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    ingestion = DocumentIngestion(
+        docs_path=docs_path, index_path=index_path, num_workers=1, parsed_corpus_path=index_path.parent / "parsed"
+    )
+    monkeypatch.setattr(ingestion, "_embeddings", lambda: DeterministicFakeEmbedding(size=16))
+    return ingestion
+
+
+def test_incremental_ingestion_updates_only_changed_files(monkeypatch, tmp_path):
+    docs_path, index_path = tmp_path / "docs", tmp_path / "index"
+    docs_path.mkdir()
+    _write_page(docs_path / "a.html", "Page A.")
+    _write_page(docs_path / "b.html", "Page B.")
+    _write_page(docs_path / "c.html", "Page C.")
+
+    ingestion = _make_ingestion(monkeypatch, docs_path, index_path)
+    ingestion.run_ingestion(incremental=True)
+    before = IngestionManifest.load(str(index_path))
+
+    _write_page(docs_path / "b.html", "Page B, revised.")
+    (docs_path / "c.html").unlink()
+    _write_page(docs_path / "d.html", "Page D.")
+
+    loaded = []
+    original_stream = ingestion.stream_into_index
+    monkeypatch.setattr(
+        ingestion, "stream_into_index",
+        lambda paths, *args, **kwargs: loaded.extend(paths) or original_stream(paths, *args, **kwargs)
+    )
+    ingestion.run_ingestion(incremental=True)
+    after = IngestionManifest.load(str(index_path))
+
+    assert sorted(p.split("/")[-1] for p in loaded) == ["b.html", "d.html"]
+    assert sorted(after.files) == ["a.html", "b.html", "d.html"]
+    assert after.files["a.html"] == before.files["a.html"]
+    assert after.files["b.html"]["sha256"] != before.files["b.html"]["sha256"]
+
+    store = ingestion.load_index()
+    indexed_ids = set(store.index_to_docstore_id.values())
+    expected_ids = {cid for entry in after.files.values() for cid in entry["chunk_ids"]}
+    assert indexed_ids == expected_ids
+    assert store.index.ntotal == len(expected_ids)
+
+
+def test_incremental_ingestion_hashes_changed_file_once(monkeypatch, tmp_path):
+    from src.ingestion.manifest import file_sha256
+
+    docs_path, index_path = tmp_path / "docs", tmp_path / "index"
+    docs_path.mkdir()
+    _write_page(docs_path / "a.html", "Page A.")
+
+    ingestion = _make_ingestion(monkeypatch, docs_path, index_path)
+    ingestion.run_ingestion(incremental=True)
+    _write_page(docs_path / "a.html", "Page A, revised.")
+
+    hashed = []
+    for module in ("manifest", "parsed_corpus"):
+        monkeypatch.setattr(
+            f"src.ingestion.{module}.file_sha256", lambda path: hashed.append(path) or file_sha256(path)
+        )
+    ingestion.run_ingestion(incremental=True)
+
+    assert [os.path.basename(path) for path in hashed] == ["a.html"]
+    assert IngestionManifest.load(str(index_path)).files["a.html"]["sha256"] == file_sha256(str(docs_path / "a.html"))
+
+
+def test_manifest_refreshes_stat_of_touched_unchanged_files(monkeypatch, tmp_path):
+    _write_page(tmp_path / "a.html", "Page A.")
+    paths = [str(tmp_path / "a.html")]
+    manifest = IngestionManifest({}, {})
+    manifest.files = manifest.scan(str(tmp_path), paths)
+
+    os.utime(tmp_path / "a.html", ns=(0, 0))  # touched, same contents
+    current = manifest.scan(str(tmp_path), paths)
+
+    assert manifest.diff(current) == ([], [], [])
+    assert manifest.refresh(current) == 1
+    hashed = []
+    monkeypatch.setattr("src.ingestion.manifest.file_sha256", lambda path: hashed.append(path))
+    assert manifest.scan(str(tmp_path), paths) == current
+    assert hashed == []
+
+
+def test_pack_batches_respects_token_and_size_budget():
+    assert pack_batches([40, 40, 40, 10], max_batch_tokens=100, max_batch_size=10) == [[0, 1], [2, 3]]
+    assert pack_batches([1, 1, 1], max_batch_tokens=100, max_batch_size=2) == [[0, 1], [2]]
+    assert pack_batches([500], max_batch_tokens=100, max_batch_size=2) == [[0]]
+
+
+class FlakyEmbeddings(DeterministicFakeEmbedding):
+    failures_left: int = 0
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.failures_left:
+            self.failures_left -= 1
+            raise ConnectionError("rate limited")
+        return super().embed_documents(texts)
+
+
+def test_batch_embedder_retries_transient_errors():
+    embeddings = FlakyEmbeddings(size=8, failures_left=2)
+    embedder = BatchEmbedder(embeddings, initial_backoff=0.0, retry_on=(ConnectionError,))
+
+    vectors = embedder.embed(["a", "b", "c"])
+
+    assert vectors.shape == (3, 8)
+    assert embeddings.calls == 3
+
+
+def test_batch_embedder_progress_spans_calls(capsys):
+    embedder = BatchEmbedder(FlakyEmbeddings(size=8), max_batch_size=1, max_concurrency=1)
+
+    embedder.embed(["a", "b"])
+    embedder.embed(["c"])
+
+    assert capsys.readouterr().out.splitlines()[-1].startswith("Embedded 3/3 chunks")
+
+
+def test_batch_embedder_resumes_from_checkpoint(tmp_path):
+    texts = ["first chunk", "second chunk", "third chunk"]
+    first = BatchEmbedder(FlakyEmbeddings(size=8), checkpoint_dir=tmp_path, max_batch_size=1)
+    expected = first.embed(texts)
+
+    resumed_embeddings = FlakyEmbeddings(size=8)
+    resumed = BatchEmbedder(resumed_embeddings, checkpoint_dir=tmp_path, max_batch_size=1)
+
+    assert (resumed.embed(texts) == expected).all()
+    assert resumed_embeddings.calls == 0
+
+
+def test_stream_into_index_adds_every_window(monkeypatch, tmp_path):
+    docs_path = tmp_path / "docs"
+    docs_path.mkdir()
+    for name in ["a.html", "b.html", "c.html"]:
+        _write_page(docs_path / name, f"Page {name}.")
+
+    ingestion = _make_ingestion(monkeypatch, docs_path, tmp_path / "index")
+    ingestion.window_size = 1
+    paths = ingestion._loader().file_paths_to_load()
+
+    vectorstore, chunk_ids = ingestion.stream_into_index(paths)
+
+    assert sorted(chunk_ids) == ["a.html", "b.html", "c.html"]
+    assert vectorstore.index.ntotal == sum(len(ids) for ids in chunk_ids.values())
+
+
+def test_stream_into_index_releases_producer_when_embedding_fails(monkeypatch, tmp_path):
+    docs_path = tmp_path / "docs"
+    docs_path.mkdir()
+    for i in range(6):
+        _write_page(docs_path / f"{i}.html", f"Page {i}.")
+
+    ingestion = _make_ingestion(monkeypatch, docs_path, tmp_path / "index")
+    ingestion.window_size = 1
+    ingestion.max_pending_windows = 1
+    paths = ingestion._loader().file_paths_to_load()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("embedding API down")
+
+    produced = threading.Event()
+    produce_windows = ingestion._produce_windows
+
+    def produce(*args):
+        produce_windows(*args)
+        produced.set()
+
+    monkeypatch.setattr(ingestion, "_add_chunks", fail)
+    monkeypatch.setattr(ingestion, "_produce_windows", produce)
+
+    with pytest.raises(RuntimeError, match="embedding API down"):
+        ingestion.stream_into_index(paths)
+    # The producer was blocked on the full queue and has returned
+    assert produced.is_set()
+
+
+def test_sharded_ingestion_searches_like_unsharded(monkeypatch, tmp_path):
+    docs_path = tmp_path / "docs"
+    docs_path.mkdir()
+    for name in ["a.html", "b.html", "c.html"]:
+        _write_page(docs_path / name, f"Page {name} about the Lombank Trophy.")
+    monkeypatch.setattr("src.retrieval.retriever.get_embedding_cache_path", lambda: tmp_path / "embeddings.sqlite")
+
+    ingestion = _make_ingestion(monkeypatch, docs_path, tmp_path / "index")
+    ingestion.num_shards = 2
+    ingestion.run_ingestion()
+    shards = load_shard_manifest(str(tmp_path / "index"))["shards"]
+
+    results = {}
+    for sharded in (False, True):
+        DocumentRetriever._instance = None
+        DocumentRetriever._vectorstore = None
+        retriever = DocumentRetriever(
+            index_path=str(tmp_path / "index"), k=3, mode="vector", sharded=sharded, cutoffs=ScoreCutoffs()
+        )
+        retriever._vectorstore.embedding_function = DeterministicFakeEmbedding(size=16)
+        results[sharded] = [doc.id for doc in retriever.retrieve("Lombank Trophy")]
+        if retriever._shards is not None:
+            retriever._shards.close()
+    DocumentRetriever._instance = None
+    DocumentRetriever._vectorstore = None
+
+    assert [(s["start"], s["end"]) for s in shards] == [(0, 1), (1, 3)]
+    assert results[True] == results[False]
+    assert len(results[True]) == 3
@@ -1,4 +1,19 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+import pytest
+
+from src.retrieval.bm25 import BM25Index, tokenize
+from src.retrieval.partitions import MetadataPartitions
+from src.retrieval.relevance import ScoreCutoffs, distances_to_scores
 from src.retrieval.retriever import DocumentRetriever
+from src.retrieval.scatter_gather import ShardGroup, pack_message, serve_shard, unpack_message
+from src.storage.index_types import build_index
+from src.storage.shards import load_shard_manifest, write_shards
 
 
 def test_singleton_pattern():
@@ -46,3 +61,233 @@ def test_retrieval_respects_k():
     docs = retriever.retrieve(query, k=3)
     assert len(docs) == 3
 
+
+def test_retrieval_cache_hit_skips_embedding(offline_retriever):
+    first = offline_retriever.retrieve("What is the Nurburgring?")
+
+    class FailingEmbeddings:
+        def embed_query(self, text):
+            raise AssertionError("embedding should come from the cache")
+
+    offline_retriever._vectorstore.embedding_function = FailingEmbeddings()
+    second = offline_retriever.retrieve("  What is the   Nurburgring?")
+
+    assert first.cache_hit is False
+    assert second.cache_hit is True
+    assert [d.id for d in second] == [d.id for d in first]
+    assert offline_retriever.cache_stats()["results"]["hits"] == 1
+
+
+def test_retrieval_cache_keyed_by_k(offline_retriever):
+    offline_retriever.retrieve("Formula One", k=1)
+    result = offline_retriever.retrieve("Formula One", k=3)
+
+    assert result.cache_hit is False
+    assert len(result) == 3
+
+
+def test_bm25_tokenize_folds_case_and_accents():
+    assert tokenize("Who built the Nürburgring?") == ["built", "nurburgring"]
+
+
+def test_bm25_ranks_and_round_trips(tmp_path, sample_documents):
+    BM25Index.build(doc.page_content for doc in sample_documents).save(str(tmp_path))
+    index = BM25Index.load(str(tmp_path))
+
+    results, confidence = index.search("M196 engine", k=3)
+
+    assert results[0][0] == 1
+    assert confidence > 0.9
+    assert index.search("M196 pizza", k=3)[1] == 0.0
+    assert index.search("unknownword", k=3) == ([], 0.0)
+
+
+def test_hybrid_confident_lexical_match_skips_embedding(offline_retriever):
+    class FailingEmbeddings:
+        def embed_query(self, text):
+            raise AssertionError("confident keyword match should not be embedded")
+
+    offline_retriever._vectorstore.embedding_function = FailingEmbeddings()
+    result = offline_retriever.retrieve("Who built the Nurburgring?", k=1)
+
+    assert result.strategy == "lexical"
+    assert [d.id for d in result] == ["chunk-0"]
+    assert result.query_embedding is None
+
+
+def test_hybrid_fuses_lexical_and_vector_results(offline_retriever):
+    # No single chunk mentions every term, so BM25 alone is not trusted
+    result = offline_retriever.retrieve("Formula One motorsports", k=3)
+    cached = offline_retriever.retrieve("Formula One motorsports", k=3)
+
+    assert result.strategy == "hybrid"
+    assert sorted(d.id for d in result) == ["chunk-0", "chunk-1", "chunk-2"]
+    # The answer cache reuses the query vector, also on result cache hits
+    assert result.query_embedding is not None
+    assert cached.cache_hit is True and cached.query_embedding == result.query_embedding
+
+
+def test_retrieve_batch_embeds_once_and_matches_single_queries(offline_retriever):
+    offline_retriever.mode, offline_retriever._bm25 = "vector", None
+    fake = offline_retriever._vectorstore.embedding_function
+    calls = []
+
+    class CountingEmbeddings:
+        def embed_query(self, text):
+            calls.append([text])
+            return fake.embed_query(text)
+
+        def embed_documents(self, texts):
+            calls.append(texts)
+            return fake.embed_documents(texts)
+
+    offline_retriever._vectorstore.embedding_function = CountingEmbeddings()
+    queries = ["Nurburgring", "M196 engine", "Formula One", "Nurburgring"]
+    batch = offline_retriever.retrieve_batch(queries, k=2)
+
+    assert calls == [["Nurburgring", "M196 engine", "Formula One"]]
+    assert [r.strategy for r in batch] == ["vector"] * 4
+
+    offline_retriever._result_cache.clear()
+    offline_retriever._query_embedding_cache.clear()
+    for query, result in zip(queries, batch):
+        assert [d.id for d in offline_retriever.retrieve(query, k=2)] == [d.id for d in result]
+
+
+def test_aretrieve_matches_retrieve(offline_retriever):
+    import asyncio
+
+    expected = offline_retriever.retrieve("Formula One motorsports", k=2)
+    offline_retriever._result_cache.clear()
+    result = asyncio.run(offline_retriever.aretrieve("Formula One motorsports", k=2))
+
+    assert result.cache_hit is False
+    assert [d.id for d in result] == [d.id for d in expected]
+
+
+def test_filters_restrict_search_before_ranking(offline_retriever):
+    offline_retriever._partitions = MetadataPartitions.build([
+        {"category": "circuit", "entities": ["Nürburgring"]},
+        {"year": 1954, "category": "engine", "entities": ["Mercedes-Benz M196", "Mercedes"]},
+        {"category": "other", "entities": ["Formula One"]},
+    ])
+
+    engines = offline_retriever.retrieve("Who built the Nurburgring?", k=2, filters={"category": "engine"})
+    either = offline_retriever.retrieve("Formula One", k=3, filters={"entity": ["mercedes", "NÜRBURGRING"]})
+    nothing = offline_retriever.retrieve("Formula One", k=3, filters={"year": 1999})
+
+    assert [d.id for d in engines] == ["chunk-1"]
+    assert sorted(d.id for d in either) == ["chunk-0", "chunk-1"]
+    assert list(nothing) == []
+    with pytest.raises(ValueError):
+        offline_retriever.retrieve("Formula One", filters={"season": 1954})
+
+
+def test_retrieval_records_cache_metrics(offline_retriever):
+    from prometheus_client import REGISTRY
+
+    def hits():
+        return REGISTRY.get_sample_value(
+            "rag_cache_lookups_total", {"cache": "retrieval_result", "result": "hit"}
+        ) or 0
+
+    before = hits()
+    offline_retriever.retrieve("Formula One motorsports")
+    offline_retriever.retrieve("Formula One motorsports")
+
+    assert hits() == before + 1
+
+
+def test_score_cutoffs_stop_when_relevance_drops_off():
+    cutoffs = ScoreCutoffs(min_score=0.3, relative_score=0.75, max_drop=0.1)
+
+    assert cutoffs.count([0.8, 0.75, 0.7, 0.55, 0.5], k=5) == 3
+    assert cutoffs.count([0.8, 0.75, 0.7, 0.65], k=2) == 2
+    # 0.36 is within the drop limit but under 0.75 of the best score
+    assert cutoffs.count([0.5, 0.45, 0.36, 0.32], k=5) == 2
+    assert cutoffs.count([0.25, 0.2], k=5) == 0
+    assert ScoreCutoffs().count([-0.5, -0.9], k=5) == 2
+    assert distances_to_scores(np.array([[0.0, 2.0]])).tolist() == [[1.0, 0.0]]
+
+
+def test_off_topic_query_returns_scores_but_no_documents(offline_retriever):
+    relevant = offline_retriever.retrieve("Formula One motorsports", k=2)
+    offline_retriever.cutoffs = ScoreCutoffs(min_score=1.5)
+    off_topic = offline_retriever.retrieve("Formula One pizza", k=2)
+    cached = offline_retriever.retrieve("Formula One pizza", k=2)
+
+    assert len(relevant) == 2 and relevant.scores[0] >= relevant.candidate_scores[1]
+    assert list(off_topic) == [] and off_topic.scores == []
+    assert len(off_topic.candidate_scores) == 2
+    assert cached.cache_hit is True
+    assert cached.candidate_scores == off_topic.candidate_scores
+
+
+def _write_sharded_index(path, num_shards):
+    vectors = np.random.default_rng(0).standard_normal((600, 16)).astype("float32")
+    write_shards(str(path), vectors, "flat", None, num_shards)
+    return vectors
+
+
+def test_shard_group_merges_shards_like_one_index(tmp_path):
+    vectors = _write_sharded_index(tmp_path, 3)
+    full = build_index("flat", vectors)
+    allowed = np.arange(150, 450, 3)
+
+    group = ShardGroup(str(tmp_path), timeout=30, connections=2)
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            searches = [
+                pool.submit(group.search, vectors[:5] + 0.01, 4),
+                pool.submit(group.search, vectors[:5], 4, allowed),
+            ]
+            (distances, positions), (_, filtered) = [search.result() for search in searches]
+    finally:
+        group.close()
+
+    expected_distances, expected = full.search(vectors[:5] + 0.01, 4)
+    assert (positions == expected).all()
+    assert np.allclose(distances, expected_distances)
+    assert np.isin(filtered, allowed).all()
+
+
+def test_shard_group_leaves_out_shards_that_time_out(tmp_path):
+    vectors = _write_sharded_index(tmp_path, 2)
+    shards = load_shard_manifest(str(tmp_path))["shards"]
+    fast, slow = str(tmp_path / "fast.sock"), str(tmp_path / "slow.sock")
+
+    def silent_server():
+        with Listener(slow, authkey=b"secret") as listener, listener.accept() as conn:
+            conn.send_bytes(pack_message({"type": "ready"}))
+            time.sleep(5)
+
+    threading.Thread(target=serve_shard, args=(shards[0]["path"], fast, b"secret"), daemon=True).start()
+    threading.Thread(target=silent_server, daemon=True).start()
+    while not (os.path.exists(fast) and os.path.exists(slow)):
+        time.sleep(0.01)
+
+    group = ShardGroup(str(tmp_path), addresses=[fast, slow], timeout=0.2, authkey=b"secret")
+    _, positions = group.search(vectors[:3], 5)
+
+    assert (positions < shards[0]["end"]).all()
+    assert positions[:, 0].tolist() == [0, 1, 2]
+
+
+def test_shard_servers_require_authkey_and_reject_pickles(tmp_path):
+    _write_sharded_index(tmp_path, 2)
+    shards = load_shard_manifest(str(tmp_path))["shards"]
+    address = str(tmp_path / "shard.sock")
+
+    with pytest.raises(ValueError, match="SHARD_AUTHKEY"):
+        serve_shard(shards[0]["path"], address, b"")
+    with pytest.raises(ValueError, match="SHARD_AUTHKEY"):
+        ShardGroup(str(tmp_path), addresses=[address, address], authkey=b"")
+
+    threading.Thread(target=serve_shard, args=(shards[0]["path"], address, b"secret"), daemon=True).start()
+    while not os.path.exists(address):
+        time.sleep(0.01)
+    with Client(address, authkey=b"secret") as conn:
+        assert unpack_message(conn.recv_bytes())[0]["type"] == "ready"
+        conn.send(("search", np.zeros((1, 16), dtype="float32"), 5, None))
+        with pytest.raises(EOFError):
+            conn.recv_bytes()
@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.storage.index_types import (
+    INDEX_TYPES,
+    apply_search_params,
+    build_index,
+    filtered_search_params,
+    supports_removal,
+)
+from src.storage.mmap_store import (
+    CompactChunkStore,
+    MmapVectorStore,
+    is_mmap_index,
+    load_faiss,
+    save_mmap_index,
+    write_chunk_store,
+)
+
+
+def _build_store(sample_documents):
+    return FAISS.from_documents(
+        sample_documents,
+        DeterministicFakeEmbedding(size=16),
+        ids=[f"chunk-{i}" for i in range(len(sample_documents))]
+    )
+
+
+def test_mmap_index_round_trip(tmp_path, sample_documents):
+    store = _build_store(sample_documents)
+    save_mmap_index(store, str(tmp_path))
+
+    loaded = MmapVectorStore.load(str(tmp_path), store.embeddings)
+
+    assert is_mmap_index(str(tmp_path))
+    assert not (tmp_path / "index.pkl").exists()
+    assert len(loaded.chunks) == len(sample_documents)
+    for i, doc in enumerate(sample_documents):
+        assert loaded.chunks.get(i).page_content == doc.page_content
+        assert loaded.chunks.get(i).metadata == doc.metadata
+
+
+def test_compact_chunk_store_interns_metadata_and_decompresses_hits_only(monkeypatch, tmp_path):
+    from langchain_core.documents import Document
+
+    monkeypatch.setattr("src.storage.mmap_store.BLOCK_SIZE", 200)
+    docs = [
+        Document(
+            id=f"page-{i // 10}-{i % 10}",
+            page_content=f"Chunk {i} of page {i // 10}. " + "Formula One racing. " * 10,
+            metadata={"source": f"docs/page-{i // 10}.html", "title": f"Page {i // 10}", "year": 1950 + i // 10},
+        )
+        for i in range(40)
+    ]
+    write_chunk_store(str(tmp_path), docs)
+
+    store = CompactChunkStore(str(tmp_path))
+    first, second = store.get(12), store.get(13)
+
+    assert [store.get(i) for i in range(len(docs))] == docs
+    assert first.metadata["source"] is second.metadata["source"]
+    assert (tmp_path / "chunks.text.zst").stat().st_size < sum(len(d.page_content) for d in docs) / 2
+    store._block.cache_clear()
+    store.get(25)
+    assert store._block.cache_info().currsize == 1
+
+
+def test_mmap_search_matches_faiss(tmp_path, sample_documents):
+    store = _build_store(sample_documents)
+    save_mmap_index(store, str(tmp_path))
+    loaded = MmapVectorStore.load(str(tmp_path), store.embeddings)
+
+    expected = store.similarity_search("Nürburgring", k=2)
+    actual = loaded.similarity_search("Nürburgring", k=2)
+
+    assert [d.id for d in actual] == [d.id for d in expected]
+
+
+def test_mmap_get_by_ids(tmp_path, sample_documents):
+    save_mmap_index(_build_store(sample_documents), str(tmp_path))
+    loaded = MmapVectorStore.load(str(tmp_path), DeterministicFakeEmbedding(size=16))
+
+    docs = loaded.get_by_ids(["chunk-2", "missing", "chunk-0"])
+
+    assert [d.id for d in docs] == ["chunk-2", "chunk-0"]
+
+
+def test_mmap_store_rejects_writes(tmp_path, sample_documents):
+    save_mmap_index(_build_store(sample_documents), str(tmp_path))
+    loaded = MmapVectorStore.load(str(tmp_path), DeterministicFakeEmbedding(size=16))
+
+    with pytest.raises(TypeError, match="read-only"):
+        loaded.add_documents(sample_documents)
+    with pytest.raises(TypeError, match="read-only"):
+        MmapVectorStore.from_texts(["text"], DeterministicFakeEmbedding(size=16))
+
+
+def test_load_faiss_is_writable(tmp_path, sample_documents):
+    save_mmap_index(_build_store(sample_documents), str(tmp_path))
+
+    store = load_faiss(str(tmp_path), DeterministicFakeEmbedding(size=16))
+    store.delete(["chunk-1"])
+
+    assert store.index.ntotal == len(sample_documents) - 1
+    assert [d.id for d in store.get_by_ids(["chunk-0", "chunk-2"])] == ["chunk-0", "chunk-2"]
+
+
+def test_build_index_types_find_exact_neighbours():
+    vectors = np.random.default_rng(0).standard_normal((2000, 32)).astype("float32")
+    for index_type in INDEX_TYPES:
+        params = {"pq_m": 8} if index_type == "ivf_pq" else None
+        index = build_index(index_type, vectors, params)
+        apply_search_params(index, nprobe=16, ef_search=64)
+
+        _, ids = index.search(vectors[:10], 1)
+
+        assert index.ntotal == len(vectors)
+        if index_type != "ivf_pq":
+            assert list(ids[:, 0]) == list(range(10)), index_type
+
+    with pytest.raises(ValueError):
+        build_index("ivf_flat", vectors, {"M": 16})
+
+
+def test_filtered_search_only_returns_allowed_ids():
+    vectors = np.random.default_rng(0).standard_normal((2000, 32)).astype("float32")
+    allowed = np.arange(500, 600)
+    for index_type in INDEX_TYPES:
+        params = {"pq_m": 8} if index_type == "ivf_pq" else None
+        index = build_index(index_type, vectors, params)
+
+        _, ids = index.search(vectors[:5], 10, params=filtered_search_params(index, allowed))
+
+        assert np.isin(ids, allowed).all(), index_type
+        if index_type != "ivf_pq":
+            # Restrictive filters still find the nearest allowed vector exactly
+            _, nearest = index.search(vectors[550:551], 1, params=filtered_search_params(index, allowed))
+            assert nearest[0, 0] == 550, index_type
+
+    assert supports_removal(build_index("flat", vectors))
+    assert not supports_removal(build_index("ivf_flat", vectors))